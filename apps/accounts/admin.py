@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from .models import User, UserProfile, Team, Permission, RolePermission
 
 
@@ -41,6 +42,9 @@ class TeamAdmin(admin.ModelAdmin):
     filter_horizontal = ['members']
     raw_id_fields = ['leader']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('leader').annotate(num_members=Count('members', distinct=True))
+
 
 @admin.register(Permission)
 class PermissionAdmin(admin.ModelAdmin):
@@ -0,0 +1,120 @@
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.core.db import apply_user_pin
+from .models import CLAIM_FIELDS, ClaimsUser
+
+
+DENIED_TOKEN_KEY = 'jwt:denied:{jti}'
+CLAIMS_REVOKED_KEY = 'jwt:claims-revoked-at:{user_id}'
+
+
+def add_role_claims(token, user, issued_at=None):
+    """Embed the authorization-relevant user attributes into a token
+    
+    `issued_at` is when the user was read; it defaults to now and is compared
+    with the user's last revocation (see revoke_user_tokens).
+    """
+    token['claims_issued_at'] = time.time() if issued_at is None else issued_at
+    for name in CLAIM_FIELDS:
+        token[name] = getattr(user, name)
+    token['team_ids'] = list(user.teams.values_list('id', flat=True))
+    return token
+
+
+class RoleRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the user's role claims"""
+    
+    @classmethod
+    def for_user(cls, user):
+        return add_role_claims(super().for_user(user), user)
+
+
+def revoke_token(token):
+    """Deny a single token until it would have expired anyway"""
+    ttl = max(int(token['exp'] - time.time()), 1)
+    cache.set(DENIED_TOKEN_KEY.format(jti=token[api_settings.JTI_CLAIM]), True, timeout=ttl)
+
+
+def revoke_user_tokens(user_id):
+    """Deny every access token whose claims were read before now
+    
+    Records the revocation time; tokens with an older claims_issued_at are
+    rejected. The time only moves forward, and the entry lives one access
+    token lifetime from the latest revocation: by the time it expires every
+    token it cuts off has expired as well. Refresh tokens stay valid:
+    refreshing re-reads the user and embeds current claims, so clients
+    recover by refreshing.
+    """
+    key = CLAIMS_REVOKED_KEY.format(user_id=user_id)
+    ttl = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()) + 1
+    revoked_at = max(time.time(), cache.get(key, 0))
+    cache.set(key, revoked_at, timeout=ttl)
+
+
+def check_not_revoked(token, check_claims=True):
+    """Raise AuthenticationFailed if the token is on the deny-list (one cache round trip)"""
+    denied_key = DENIED_TOKEN_KEY.format(jti=token.get(api_settings.JTI_CLAIM))
+    revoked_key = CLAIMS_REVOKED_KEY.format(user_id=token.get(api_settings.USER_ID_CLAIM))
+    entries = cache.get_many([denied_key, revoked_key] if check_claims else [denied_key])
+    if entries.get(denied_key):
+        raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+    if revoked_key in entries and token.get('claims_issued_at', 0) < entries[revoked_key]:
+        raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """Default JWT authentication: honours the deny-list and loads the profile with the user"""
+    
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        check_not_revoked(validated_token, check_claims=False)
+        apply_user_pin(user_id)
+        
+        try:
+            user = self.user_model.objects.select_related('profile').get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Opt-in JWT authentication that builds request.user from token claims.
+    
+    Views reading only id/role/manager_id/team_ids never touch the users table;
+    any other attribute loads the full row on first access (see ClaimsUser).
+    
+    Trade-off: claims are trusted until the access token expires. Role, manager,
+    team and status changes revoke the user's outstanding access tokens through
+    a cache deny-list whose entries live no longer than an access token, forcing
+    a refresh that picks up current claims. With a per-process cache (no
+    CACHE_URL) revocations only reach the local process.
+    """
+    
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        
+        if 'role' not in validated_token:
+            # Issued before role claims were embedded
+            return super().get_user(validated_token)
+        check_not_revoked(validated_token)
+        apply_user_pin(validated_token[api_settings.USER_ID_CLAIM])
+        
+        user = ClaimsUser.from_claims(validated_token[api_settings.USER_ID_CLAIM], validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
@@ -0,0 +1,25 @@
+from django.contrib.auth.backends import BaseBackend
+
+from .permissions import get_role_permissions
+
+
+class RolePermissionBackend(BaseBackend):
+    """Authorization backend that answers CRM permission codenames from the role matrix.
+    
+    ``user.has_perm('view_customer')`` is resolved against the cached
+    RolePermission matrix, so it never issues a query once the matrix is warm.
+    Dotted Django permissions (``app_label.codename``) are left to ModelBackend.
+    """
+    
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(get_role_permissions(user_obj))
+    
+    def has_perm(self, user_obj, perm, obj=None):
+        if '.' in perm:
+            return False
+        return perm in self.get_all_permissions(user_obj, obj=obj)
+    
+    def has_module_perms(self, user_obj, app_label):
+        return False
@@ -0,0 +1,110 @@
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import User, UserHierarchy
+
+
+def subtree_user_ids(user, include_self=True):
+    """Subquery of the ids in the user's reporting subtree"""
+    links = UserHierarchy.objects.filter(ancestor=user)
+    if not include_self:
+        links = links.filter(depth__gt=0)
+    return links.values('descendant_id')
+
+
+def reporting_filter(user, field='assigned_to', include_self=True):
+    """Q matching rows whose `field` points at someone in the user's reporting subtree
+    
+    e.g. ``Deal.objects.filter(reporting_filter(director))`` for a "my team's pipeline" view.
+    """
+    return Q(**{f'{field}__in': subtree_user_ids(user, include_self=include_self)})
+
+
+def scope_to_user(queryset, user, field='assigned_to'):
+    """Rows the user may see: everything for admins, the reporting subtree's rows for managers, else their own"""
+    if user.role == 'admin' or user.is_superuser:
+        return queryset
+    if user.role == 'manager':
+        return queryset.filter(reporting_filter(user, field=field))
+    return queryset.filter(**{field: user.pk})
+
+
+def is_in_subtree(user_id, root_id):
+    """True if `user_id` reports (directly or indirectly) to `root_id`, or is `root_id`"""
+    return UserHierarchy.objects.filter(ancestor_id=root_id, descendant_id=user_id).exists()
+
+
+def validate_manager(user_id, manager_id):
+    """Reject manager assignments that would create a cycle"""
+    if manager_id is None or user_id is None:
+        return
+    if manager_id == user_id or is_in_subtree(manager_id, user_id):
+        raise ValidationError('A user cannot report to themselves or to one of their reports.')
+
+
+def add_node(user):
+    """Insert the closure rows for a newly created user"""
+    table = UserHierarchy._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (ancestor_id, descendant_id, depth) VALUES (%s, %s, 0)',
+            [user.pk, user.pk],
+        )
+        if user.manager_id:
+            cursor.execute(
+                f'INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+                f'SELECT ancestor_id, %s, depth + 1 FROM {table} WHERE descendant_id = %s',
+                [user.pk, user.manager_id],
+            )
+
+
+def move_subtree(user, new_manager_id):
+    """Re-hang the user's whole subtree under `new_manager_id` (or make it a root)
+    
+    Links from outside ancestors into the subtree are dropped, then the cross
+    product of the new manager's ancestors and the subtree is inserted, both as
+    single set-based statements.
+    """
+    table = UserHierarchy._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE descendant_id IN (SELECT descendant_id FROM {table} WHERE ancestor_id = %s) '
+            f'AND ancestor_id NOT IN (SELECT descendant_id FROM {table} WHERE ancestor_id = %s)',
+            [user.pk, user.pk],
+        )
+        if new_manager_id:
+            cursor.execute(
+                f'INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+                f'SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1 '
+                f'FROM {table} a CROSS JOIN {table} d '
+                f'WHERE a.descendant_id = %s AND d.ancestor_id = %s',
+                [new_manager_id, user.pk],
+            )
+
+
+def rebuild_hierarchy(using='default'):
+    """Recompute the closure table from User.manager, one INSERT ... SELECT per level"""
+    table = UserHierarchy._meta.db_table
+    users_table = User._meta.db_table
+    conn = transaction.get_connection(using)
+    with transaction.atomic(using=using), conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f'INSERT INTO {table} (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM {users_table}'
+        )
+        inserted = cursor.rowcount
+        # A valid tree can't be deeper than the number of users; the cap guards against cycles
+        max_depth = inserted
+        depth = 0
+        while inserted and depth < max_depth:
+            cursor.execute(
+                f'INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+                f'SELECT h.ancestor_id, u.id, h.depth + 1 '
+                f'FROM {table} h JOIN {users_table} u ON u.manager_id = h.descendant_id '
+                f'WHERE h.depth = %s AND u.id <> h.ancestor_id',
+                [depth],
+            )
+            inserted = cursor.rowcount
+            depth += 1
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from apps.accounts.models import User, RolePermission
+from apps.accounts.permissions import HasRolePermission, role_permission_matrix
+
+
+class BenchmarkView:
+    """Minimal stand-in for a list endpoint guarded by HasRolePermission"""
+    
+    action = 'list'
+    permission_model = 'customer'
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request query count and latency of role permission checks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Simulated requests per role')
+        parser.add_argument('--codename', default='view_customer', help='Permission codename to check')
+    
+    def handle(self, *args, **options):
+        iterations = options['requests']
+        codename = options['codename']
+        request = APIRequestFactory().get('/api/customers/')
+        view = BenchmarkView()
+        permission = HasRolePermission()
+        
+        self.stdout.write(f'{"role":<12}{"mode":<8}{"queries/req":>14}{"us/req":>12}')
+        for role, _ in User.ROLE_CHOICES:
+            request.user = User(role=role, is_active=True)
+            
+            def uncached():
+                return RolePermission.objects.filter(role=role, permission__codename=codename).exists()
+            
+            def cached():
+                return permission.has_permission(request, view)
+            
+            role_permission_matrix.clear()
+            for mode, check in (('before', uncached), ('after', cached)):
+                queries, elapsed = self.measure(check, iterations)
+                self.stdout.write(
+                    f'{role:<12}{mode:<8}{queries / iterations:>14.2f}{elapsed / iterations * 1e6:>12.1f}'
+                )
+    
+    def measure(self, check, iterations):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                check()
+            elapsed = time.perf_counter() - start
+        return len(context.captured_queries), elapsed
@@ -1,11 +1,14 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 
+from apps.core.db import pin_to_primary
+
 User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Create a superuser'
 
+    @pin_to_primary()
     def handle(self, *args, **options):
         if not User.objects.filter(username='admin').exists():
             User.objects.create_superuser(
@@ -1,126 +1,197 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from apps.accounts.models import UserProfile, Permission, RolePermission
+from django.db import transaction
+from apps.accounts.models import Permission, RolePermission
+from apps.accounts.permissions import role_permission_matrix
+from apps.core.db import pin_to_primary
 
 User = get_user_model()
 
 
+DEFAULT_PERMISSIONS = [
+    ('view_customer', 'View Customer', 'customers'),
+    ('add_customer', 'Add Customer', 'customers'),
+    ('change_customer', 'Change Customer', 'customers'),
+    ('delete_customer', 'Delete Customer', 'customers'),
+    ('view_lead', 'View Lead', 'leads'),
+    ('add_lead', 'Add Lead', 'leads'),
+    ('change_lead', 'Change Lead', 'leads'),
+    ('delete_lead', 'Delete Lead', 'leads'),
+    ('view_deal', 'View Deal', 'deals'),
+    ('add_deal', 'Add Deal', 'deals'),
+    ('change_deal', 'Change Deal', 'deals'),
+    ('delete_deal', 'Delete Deal', 'deals'),
+    ('view_analytics', 'View Analytics', 'analytics'),
+    ('view_reports', 'View Reports', 'reports'),
+    ('manage_users', 'Manage Users', 'accounts'),
+    ('manage_settings', 'Manage Settings', 'settings'),
+]
+
+DEFAULT_ROLE_PERMISSIONS = {
+    'admin': [
+        'view_customer', 'add_customer', 'change_customer', 'delete_customer',
+        'view_lead', 'add_lead', 'change_lead', 'delete_lead',
+        'view_deal', 'add_deal', 'change_deal', 'delete_deal',
+        'view_analytics', 'view_reports', 'manage_users', 'manage_settings'
+    ],
+    'manager': [
+        'view_customer', 'add_customer', 'change_customer',
+        'view_lead', 'add_lead', 'change_lead',
+        'view_deal', 'add_deal', 'change_deal',
+        'view_analytics', 'view_reports'
+    ],
+    'sales': [
+        'view_customer', 'add_customer', 'change_customer',
+        'view_lead', 'add_lead', 'change_lead',
+        'view_deal', 'add_deal', 'change_deal',
+        'view_analytics'
+    ],
+    'support': [
+        'view_customer', 'change_customer',
+        'view_lead', 'change_lead',
+        'view_deal'
+    ],
+    'marketing': [
+        'view_customer', 'view_lead', 'add_lead', 'change_lead',
+        'view_analytics'
+    ],
+}
+
+
 class Command(BaseCommand):
     help = 'Initialize the CRM system with default data'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report drift from the default data without writing; exits non-zero if anything differs'
+        )
+
+    @pin_to_primary()
     def handle(self, *args, **options):
-        self.stdout.write('Initializing CRM system...')
+        # Diff default permissions and role permissions against the database
+        permission_changes = self.diff_permissions()
+        role_permission_changes = self.diff_role_permissions()
         
-        # Create default permissions
-        self.create_default_permissions()
+        if options['check']:
+            # The default admin is bootstrap data, not managed state: operators may delete it
+            drift = self.report_drift(permission_changes, role_permission_changes)
+            if drift:
+                raise CommandError(f'CRM default data has drifted ({drift} difference(s))')
+            self.stdout.write(self.style.SUCCESS('CRM default data is up to date'))
+            return
         
-        # Create default role permissions
-        self.create_default_role_permissions()
+        self.stdout.write('Initializing CRM system...')
         
-        # Create default admin user if it doesn't exist
-        self.create_default_admin()
+        with transaction.atomic():
+            # Create default permissions
+            self.apply_permissions(*permission_changes)
+            
+            # Create default role permissions
+            self.apply_role_permissions(*role_permission_changes)
+        
+        # Create the default admin on first init only, so a deleted one stays deleted
+        if not User.objects.exists():
+            self.create_default_admin()
+        else:
+            self.stdout.write('Users already exist, not creating the default admin')
         
         self.stdout.write(
             self.style.SUCCESS('CRM system initialized successfully!')
         )
 
-    def create_default_permissions(self):
-        """Create default permissions for the CRM system"""
-        permissions = [
-            ('view_customer', 'View Customer', 'customers'),
-            ('add_customer', 'Add Customer', 'customers'),
-            ('change_customer', 'Change Customer', 'customers'),
-            ('delete_customer', 'Delete Customer', 'customers'),
-            ('view_lead', 'View Lead', 'leads'),
-            ('add_lead', 'Add Lead', 'leads'),
-            ('change_lead', 'Change Lead', 'leads'),
-            ('delete_lead', 'Delete Lead', 'leads'),
-            ('view_deal', 'View Deal', 'deals'),
-            ('add_deal', 'Add Deal', 'deals'),
-            ('change_deal', 'Change Deal', 'deals'),
-            ('delete_deal', 'Delete Deal', 'deals'),
-            ('view_analytics', 'View Analytics', 'analytics'),
-            ('view_reports', 'View Reports', 'reports'),
-            ('manage_users', 'Manage Users', 'accounts'),
-            ('manage_settings', 'Manage Settings', 'settings'),
-        ]
-        
-        for codename, name, module in permissions:
-            permission, created = Permission.objects.get_or_create(
-                codename=codename,
-                defaults={'name': name, 'module': module}
-            )
-            if created:
-                self.stdout.write(f'Created permission: {name}')
+    def diff_permissions(self):
+        """Return (missing, outdated) default permissions in one read"""
+        existing = {
+            permission.codename: permission
+            for permission in Permission.objects.filter(codename__in=[codename for codename, _, _ in DEFAULT_PERMISSIONS])
+        }
+        missing, outdated = [], []
+        for codename, name, module in DEFAULT_PERMISSIONS:
+            permission = existing.get(codename)
+            if permission is None:
+                missing.append(Permission(codename=codename, name=name, module=module))
+            elif (permission.name, permission.module) != (name, module):
+                permission.name, permission.module = name, module
+                outdated.append(permission)
+        return missing, outdated
 
-    def create_default_role_permissions(self):
-        """Create default role permissions"""
-        role_permissions = {
-            'admin': [
-                'view_customer', 'add_customer', 'change_customer', 'delete_customer',
-                'view_lead', 'add_lead', 'change_lead', 'delete_lead',
-                'view_deal', 'add_deal', 'change_deal', 'delete_deal',
-                'view_analytics', 'view_reports', 'manage_users', 'manage_settings'
-            ],
-            'manager': [
-                'view_customer', 'add_customer', 'change_customer',
-                'view_lead', 'add_lead', 'change_lead',
-                'view_deal', 'add_deal', 'change_deal',
-                'view_analytics', 'view_reports'
-            ],
-            'sales': [
-                'view_customer', 'add_customer', 'change_customer',
-                'view_lead', 'add_lead', 'change_lead',
-                'view_deal', 'add_deal', 'change_deal',
-                'view_analytics'
-            ],
-            'support': [
-                'view_customer', 'change_customer',
-                'view_lead', 'change_lead',
-                'view_deal'
-            ],
-            'marketing': [
-                'view_customer', 'view_lead', 'add_lead', 'change_lead',
-                'view_analytics'
-            ],
+    def diff_role_permissions(self):
+        """Return (missing, extra) (role, codename) pairs for the default permissions in one read"""
+        desired = {
+            (role, codename)
+            for role, codenames in DEFAULT_ROLE_PERMISSIONS.items()
+            for codename in codenames
         }
-        
-        for role, permission_codenames in role_permissions.items():
-            for codename in permission_codenames:
-                try:
-                    permission = Permission.objects.get(codename=codename)
-                    role_permission, created = RolePermission.objects.get_or_create(
-                        role=role,
-                        permission=permission
-                    )
-                    if created:
-                        self.stdout.write(f'Created role permission: {role} - {permission.name}')
-                except Permission.DoesNotExist:
-                    self.stdout.write(f'Warning: Permission {codename} not found')
+        managed = [codename for codename, _, _ in DEFAULT_PERMISSIONS]
+        current = set(
+            RolePermission.objects.filter(permission__codename__in=managed)
+            .values_list('role', 'permission__codename')
+        )
+        return sorted(desired - current), sorted(current - desired)
 
-    def create_default_admin(self):
-        """Create default admin user if it doesn't exist"""
-        if not User.objects.filter(email='admin@crm.com').exists():
-            admin_user = User.objects.create_user(
-                username='admin',
-                email='admin@crm.com',
-                password='admin123',
-                first_name='Admin',
-                last_name='User',
-                role='admin',
-                is_staff=True,
-                is_superuser=True
+    def report_drift(self, permission_changes, role_permission_changes):
+        missing_permissions, outdated_permissions = permission_changes
+        missing_links, extra_links = role_permission_changes
+        for permission in missing_permissions:
+            self.stdout.write(f'Missing permission: {permission.codename}')
+        for permission in outdated_permissions:
+            self.stdout.write(f'Outdated permission: {permission.codename}')
+        for role, codename in missing_links:
+            self.stdout.write(f'Missing role permission: {role} - {codename}')
+        for role, codename in extra_links:
+            self.stdout.write(f'Unexpected role permission: {role} - {codename}')
+        return len(missing_permissions) + len(outdated_permissions) + len(missing_links) + len(extra_links)
+
+    def apply_permissions(self, missing, outdated):
+        """Create and update default permissions in bulk"""
+        if missing:
+            Permission.objects.bulk_create(missing, ignore_conflicts=True)
+            self.stdout.write(f'Created {len(missing)} permission(s)')
+        if outdated:
+            Permission.objects.bulk_update(outdated, ['name', 'module'])
+            self.stdout.write(f'Updated {len(outdated)} permission(s)')
+        if missing or outdated:
+            transaction.on_commit(role_permission_matrix.invalidate)
+
+    def apply_role_permissions(self, missing, extra):
+        """Create and delete default role permissions in bulk"""
+        if missing:
+            permission_ids = dict(
+                Permission.objects.filter(codename__in={codename for _, codename in missing})
+                .values_list('codename', 'id')
             )
-            
-            # Create user profile
-            UserProfile.objects.create(
-                user=admin_user,
-                timezone='UTC',
-                language='en',
-                sales_target=0,
-                commission_rate=0
+            RolePermission.objects.bulk_create(
+                [RolePermission(role=role, permission_id=permission_ids[codename]) for role, codename in missing],
+                ignore_conflicts=True
             )
-            
-            self.stdout.write('Created default admin user: admin@crm.com / admin123')
-        else:
-            self.stdout.write('Default admin user already exists')
+            self.stdout.write(f'Created {len(missing)} role permission(s)')
+        if extra:
+            stale = RolePermission.objects.none()
+            for role, codenames in self.group_by_role(extra).items():
+                stale |= RolePermission.objects.filter(role=role, permission__codename__in=codenames)
+            RolePermission.objects.filter(pk__in=stale.values('pk')).delete()
+            self.stdout.write(f'Removed {len(extra)} role permission(s)')
+        if missing or extra:
+            transaction.on_commit(role_permission_matrix.invalidate)
+
+    def group_by_role(self, pairs):
+        grouped = {}
+        for role, codename in pairs:
+            grouped.setdefault(role, []).append(codename)
+        return grouped
+
+    def create_default_admin(self):
+        """Create default admin user (its profile is created by the post_save signal)"""
+        User.objects.create_user(
+            username='admin',
+            email='admin@crm.com',
+            password='admin123',
+            first_name='Admin',
+            last_name='User',
+            role='admin',
+            is_staff=True,
+            is_superuser=True
+        )
+        
+        self.stdout.write('Created default admin user: admin@crm.com / admin123')
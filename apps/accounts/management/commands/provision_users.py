@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from apps.accounts.hierarchy import move_subtree, validate_manager
+from apps.accounts.models import User, UserProfile, UserHierarchy
+from apps.core.db import pin_to_primary
+
+
+USER_FIELDS = ['username', 'first_name', 'last_name', 'role', 'department', 'phone']
+PROFILE_FIELDS = ['timezone', 'language', 'sales_target', 'commission_rate']
+
+
+def _init_worker():
+    # Spawned (non-forked) workers need their own app registry for the hashers
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _hash_password(raw_password):
+    return make_password(raw_password or None)
+
+
+def _ids_by_email(emails, batch_size=1000):
+    """{lowercased email: user id} for existing users, matching email case-insensitively"""
+    emails = sorted(emails)
+    ids = {}
+    for start in range(0, len(emails), batch_size):
+        users = User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails[start:start + batch_size])
+        ids.update(users.values_list('email_lower', 'id'))
+    return ids
+
+
+class Command(BaseCommand):
+    help = 'Bulk create users and profiles from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or NDJSON file, one user per row')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Password hashing processes')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('ndjson' if options['path'].endswith(('.ndjson', '.jsonl')) else 'csv')
+        chunk_size = options['chunk_size']
+        valid_roles = {role for role, _ in User.ROLE_CHOICES}
+        
+        created = skipped = 0
+        usernames = set()  # taken earlier in this run
+        manager_links = []  # (user id, manager email) resolved once every user exists
+        started = time.perf_counter()
+        
+        with open(options['path'], newline='', encoding='utf-8') as handle, \
+                ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            rows = self.read_rows(handle, fmt)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                chunk_created, chunk_skipped, links = self.provision_chunk(chunk, pool, valid_roles, usernames, options['workers'])
+                created += chunk_created
+                skipped += chunk_skipped
+                manager_links.extend(links)
+                
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{created} created, {skipped} skipped ({created / elapsed:.0f} users/s)')
+        
+        assigned = self.assign_managers(manager_links)
+        self.stdout.write(self.style.SUCCESS(
+            f'Provisioned {created} users ({skipped} skipped, {assigned} manager links) '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def read_rows(self, handle, fmt):
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+            return
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise CommandError(f'Line {line_number} is not valid JSON')
+
+    def provision_chunk(self, chunk, pool, valid_roles, usernames, workers):
+        rows = {}
+        for row in chunk:
+            email = (row.get('email') or '').strip().lower()
+            role = row.get('role') or 'sales'
+            if not email or role not in valid_roles:
+                self.stderr.write(f'Skipping invalid row: {row}')
+                continue
+            rows.setdefault(email, (email, role, row.get('username') or email, row))
+        rows = list(rows.values())
+        
+        # Existing users are left untouched, however their address is capitalised
+        existing = _ids_by_email([email for email, _, _, _ in rows])
+        rows = [(email, role, username, row) for email, role, username, row in rows if email not in existing]
+        
+        taken = set(User.objects.filter(username__in=[username for _, _, username, _ in rows]).values_list('username', flat=True))
+        unique = []
+        for email, role, username, row in rows:
+            if username in taken or username in usernames:
+                self.stderr.write(f'Skipping row with a username already in use: {row}')
+                continue
+            usernames.add(username)
+            unique.append((email, role, username, row))
+        rows = unique
+        skipped = len(chunk) - len(rows)
+        if not rows:
+            return 0, skipped, []
+        
+        passwords = [row.get('password') for _, _, _, row in rows]
+        hashes = pool.map(_hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+        
+        users = []
+        for (email, role, username, row), password in zip(rows, hashes):
+            values = {field: row.get(field) or '' for field in USER_FIELDS}
+            values['username'] = username
+            values['role'] = role
+            users.append(User(email=email, password=password, **values))
+        
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            ids = dict(User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'id'))
+            
+            profiles = []
+            for email, _, _, row in rows:
+                values = {field: row[field] for field in PROFILE_FIELDS if row.get(field) not in (None, '')}
+                profiles.append(UserProfile(user_id=ids[email], **values))
+            UserProfile.objects.bulk_create(profiles)
+            UserHierarchy.objects.bulk_create(
+                [UserHierarchy(ancestor_id=user_id, descendant_id=user_id, depth=0) for user_id in ids.values()]
+            )
+        
+        links = [(ids[email], row['manager_email'].strip().lower()) for email, _, _, row in rows if row.get('manager_email')]
+        return len(users), skipped, links
+
+    def assign_managers(self, manager_links):
+        """Second pass: point new users at their managers and hang their subtrees under them
+        
+        New users start as roots, so each link re-hangs one subtree in the
+        closure table; links that would form a cycle are skipped.
+        """
+        if not manager_links:
+            return 0
+        
+        managers = _ids_by_email({email for _, email in manager_links})
+        users = []
+        with transaction.atomic():
+            for user_id, manager_email in manager_links:
+                if manager_email not in managers:
+                    self.stderr.write(f'Unknown manager {manager_email} for user {user_id}')
+                    continue
+                user = User(id=user_id, manager_id=managers[manager_email])
+                try:
+                    validate_manager(user.pk, user.manager_id)
+                except ValidationError:
+                    self.stderr.write(f'Skipping manager {manager_email} for user {user_id}: it would create a cycle')
+                    continue
+                move_subtree(user, user.manager_id)
+                users.append(user)
+            User.objects.bulk_update(users, ['manager'], batch_size=1000)
+        return len(users)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.hierarchy import rebuild_hierarchy
+from apps.accounts.models import UserHierarchy
+from apps.core.db import pin_to_primary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserHierarchy closure table from User.manager'
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        rebuild_hierarchy()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt user hierarchy ({UserHierarchy.objects.count()} links)')
+        )
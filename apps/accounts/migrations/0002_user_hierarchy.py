@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:50
+
+import apps.accounts.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_user_hierarchy(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserHierarchy = apps.get_model('accounts', 'UserHierarchy')
+    table = UserHierarchy._meta.db_table
+    users_table = User._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM {users_table}'
+        )
+        inserted = max_depth = cursor.rowcount
+        depth = 0
+        while inserted and depth < max_depth:
+            cursor.execute(
+                f'INSERT INTO {table} (ancestor_id, descendant_id, depth) '
+                f'SELECT h.ancestor_id, u.id, h.depth + 1 '
+                f'FROM {table} h JOIN {users_table} u ON u.manager_id = h.descendant_id '
+                f'WHERE h.depth = %s AND u.id <> h.ancestor_id',
+                [depth],
+            )
+            inserted = cursor.rowcount
+            depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.accounts.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserHierarchy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Hierarchy',
+                'verbose_name_plural': 'User Hierarchy',
+                'db_table': 'user_hierarchy',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='user_hierarchy_desc_depth_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_user_hierarchy, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,32 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.core.validators import RegexValidator
 
 
+class UserQuerySet(models.QuerySet):
+    """QuerySet helpers for the management hierarchy"""
+    
+    def reporting_to(self, user, include_self=True, max_depth=None):
+        """Users in the reporting subtree of `user`, resolved with one join on the closure table"""
+        lookups = {'ancestor_links__ancestor': user}
+        if not include_self:
+            lookups['ancestor_links__depth__gt'] = 0
+        if max_depth is not None:
+            lookups['ancestor_links__depth__lte'] = max_depth
+        return self.filter(**lookups)
+    
+    def managers_of(self, user, include_self=False):
+        """Users in the management chain above `user`"""
+        lookups = {'descendant_links__descendant': user}
+        if not include_self:
+            lookups['descendant_links__depth__gt'] = 0
+        return self.filter(**lookups)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """Custom User model with additional CRM-specific fields"""
     
@@ -28,6 +52,8 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserManager()
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
@@ -47,6 +73,55 @@ class User(AbstractUser):
         return dict(self.ROLE_CHOICES)[self.role]
 
 
+# User columns embedded as JWT claims (apps.accounts.authentication); changing one revokes the user's tokens
+CLAIM_FIELDS = ['role', 'manager_id', 'is_active', 'is_staff', 'is_superuser']
+
+
+class ClaimsUser(User):
+    """User rebuilt from JWT claims by StatelessJWTAuthentication
+    
+    Only the claimed columns are populated; every other column is deferred and
+    the first access to any of them loads all of them in a single query.
+    """
+    
+    class Meta:
+        proxy = True
+    
+    @classmethod
+    def from_claims(cls, user_id, claims):
+        values = {'id': user_id, **{name: claims.get(name) for name in CLAIM_FIELDS}}
+        fields = [f.attname for f in cls._meta.concrete_fields if f.attname in values]
+        user = cls.from_db(None, fields, [values[name] for name in fields])
+        user.team_ids = claims.get('team_ids', [])
+        return user
+    
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
+
+
+class UserHierarchy(models.Model):
+    """Closure table for User.manager: one row per (ancestor, descendant) pair, including self"""
+    
+    ancestor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()  # 0 = self, 1 = direct report, ...
+    
+    class Meta:
+        db_table = 'user_hierarchy'
+        verbose_name = 'User Hierarchy'
+        verbose_name_plural = 'User Hierarchy'
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='user_hierarchy_desc_depth_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 class UserProfile(models.Model):
     """Extended user profile with CRM-specific settings"""
     
@@ -90,6 +165,9 @@ class Team(models.Model):
     
     @property
     def member_count(self):
+        # Querysets from TeamViewSet/TeamAdmin annotate the count up front
+        if hasattr(self, 'num_members'):
+            return self.num_members
         return self.members.count()
 
 
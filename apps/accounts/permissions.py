@@ -0,0 +1,133 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import permissions
+
+
+ROLE_PERMISSION_VERSION_KEY = 'accounts:role_permissions:version'
+
+
+class RolePermissionMatrix:
+    """Per-process cache of the role -> permission codename matrix.
+    
+    The whole matrix is loaded with a single query and kept in memory. A version
+    token stored in the shared cache tells every process when it has to reload;
+    the token is only re-read every ROLE_PERMISSION_VERSION_CHECK_INTERVAL seconds.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._version = None
+        self._checked_at = 0.0
+    
+    @property
+    def check_interval(self):
+        return getattr(settings, 'ROLE_PERMISSION_VERSION_CHECK_INTERVAL', 5)
+    
+    def _shared_version(self):
+        version = cache.get(ROLE_PERMISSION_VERSION_KEY)
+        if version is None:
+            cache.add(ROLE_PERMISSION_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(ROLE_PERMISSION_VERSION_KEY)
+        return version
+    
+    def _load(self):
+        from .models import RolePermission
+        
+        matrix = {}
+        for role, codename in RolePermission.objects.values_list('role', 'permission__codename'):
+            matrix.setdefault(role, set()).add(codename)
+        return {role: frozenset(codenames) for role, codenames in matrix.items()}
+    
+    def get(self):
+        """Return the cached {role: frozenset(codenames)} matrix, reloading it if stale"""
+        now = time.monotonic()
+        if self._matrix is not None and now - self._checked_at < self.check_interval:
+            return self._matrix
+        
+        with self._lock:
+            # Read the version before loading so a concurrent bump forces another reload
+            version = self._shared_version()
+            if self._matrix is None or version != self._version:
+                self._matrix = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._matrix
+    
+    def permissions_for_role(self, role):
+        return self.get().get(role, frozenset())
+    
+    def clear(self):
+        """Drop this process' copy without touching the shared version"""
+        self._matrix = None
+        self._version = None
+    
+    def invalidate(self):
+        """Drop this process' copy and tell every other process to reload"""
+        self.clear()
+        cache.set(ROLE_PERMISSION_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+role_permission_matrix = RolePermissionMatrix()
+
+
+def get_role_permissions(user):
+    """Return the permission codenames granted to the user's role"""
+    if not user or not user.is_active:
+        return frozenset()
+    return role_permission_matrix.permissions_for_role(getattr(user, 'role', None))
+
+
+def user_has_role_permissions(user, codenames):
+    """Check codenames against the cached matrix without hitting the database"""
+    if not user or not user.is_authenticated or not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    granted = get_role_permissions(user)
+    return all(codename in granted for codename in codenames)
+
+
+class HasRolePermission(permissions.BasePermission):
+    """DRF permission backed by the cached RolePermission matrix.
+    
+    Views declare what they need either explicitly::
+        
+        required_permissions = {'list': 'view_customer', 'export': ['view_customer', 'view_reports']}
+    
+    or through ``permission_model = 'customer'``, in which case the standard
+    actions map to ``view_``/``add_``/``change_``/``delete_`` codenames.
+    Actions without a requirement are left to the other permission classes.
+    """
+    
+    action_prefixes = {
+        'list': 'view',
+        'retrieve': 'view',
+        'export': 'view',
+        'create': 'add',
+        'update': 'change',
+        'partial_update': 'change',
+        'destroy': 'delete',
+    }
+    
+    def get_required_permissions(self, request, view):
+        action = getattr(view, 'action', None) or request.method.lower()
+        required = getattr(view, 'required_permissions', None) or {}
+        if action in required:
+            codenames = required[action]
+            return [codenames] if isinstance(codenames, str) else list(codenames)
+        
+        model = getattr(view, 'permission_model', None)
+        if model and action in self.action_prefixes:
+            return [f'{self.action_prefixes[action]}_{model}']
+        return []
+    
+    def has_permission(self, request, view):
+        codenames = self.get_required_permissions(request, view)
+        if not codenames:
+            return True
+        return user_has_role_permissions(request.user, codenames)
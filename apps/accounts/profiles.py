@@ -0,0 +1,32 @@
+from django.core.cache import cache
+
+from .models import UserProfile
+from .serializers import UserProfileSerializer
+
+
+PROFILE_CACHE_KEY = 'accounts:profile:{user_id}'
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
+
+def get_profile(user):
+    """Return the user's profile, normally already loaded through select_related('profile')"""
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        # Profiles are created with the user; this only covers rows created by raw imports
+        profile, _ = UserProfile.objects.get_or_create(user_id=user.pk)
+        return profile
+
+
+def get_profile_data(user):
+    """Serialized profile for the "me" screens, cached per user until the profile or user changes"""
+    key = PROFILE_CACHE_KEY.format(user_id=user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = UserProfileSerializer(get_profile(user)).data
+        cache.set(key, data, timeout=PROFILE_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_profile_data(user_id):
+    cache.delete(PROFILE_CACHE_KEY.format(user_id=user_id))
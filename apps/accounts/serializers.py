@@ -1,6 +1,14 @@
+import time
+
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from . import hierarchy
+from .authentication import RoleRefreshToken, add_role_claims, check_not_revoked
 from .models import User, UserProfile, Team, Permission, RolePermission
 
 
@@ -18,6 +26,14 @@ class UserSerializer(serializers.ModelSerializer):
             'is_active', 'date_joined', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'date_joined', 'created_at', 'updated_at']
+    
+    def validate_manager(self, value):
+        if self.instance is not None and value is not None:
+            try:
+                hierarchy.validate_manager(self.instance.pk, value.pk)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(exc.messages)
+        return value
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -35,8 +51,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class TeamMemberSummarySerializer(serializers.ModelSerializer):
+    """Compact member representation for team listings"""
+    
+    full_name = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = User
+        fields = ['id', 'full_name', 'email', 'role']
+        read_only_fields = fields
+
+
 class TeamSerializer(serializers.ModelSerializer):
-    """Serializer for Team model"""
+    """Serializer for Team model
+    
+    `members_mode` selects the member payload: 'full' (UserSerializer),
+    'summary' (TeamMemberSummarySerializer) or 'none' (field omitted).
+    """
+    
+    MEMBER_MODES = ['full', 'summary', 'none']
     
     member_count = serializers.ReadOnlyField()
     members = UserSerializer(many=True, read_only=True)
@@ -49,6 +82,31 @@ class TeamSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def __init__(self, *args, members_mode='full', **kwargs):
+        super().__init__(*args, **kwargs)
+        if members_mode == 'none':
+            self.fields.pop('members')
+        elif members_mode == 'summary':
+            self.fields['members'] = TeamMemberSummarySerializer(many=True, read_only=True)
+
+
+class TeamMembershipSerializer(serializers.Serializer):
+    """User ids for the bulk membership endpoints, validated in one query"""
+    
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    
+    def __init__(self, *args, allow_empty=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['user_ids'].allow_empty = allow_empty
+    
+    def validate_user_ids(self, value):
+        user_ids = sorted(set(value))
+        found = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            raise serializers.ValidationError(f"Users not found: {', '.join(map(str, missing))}")
+        return user_ids
 
 
 class PermissionSerializer(serializers.ModelSerializer):
@@ -136,3 +194,40 @@ class ChangePasswordSerializer(serializers.Serializer):
         if not user.check_password(value):
             raise serializers.ValidationError('Old password is incorrect.')
         return value
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair whose claims include role, manager_id and team_ids"""
+    
+    token_class = RoleRefreshToken
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that honours revocations and re-embeds the user's current role claims"""
+    
+    token_class = RoleRefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        check_not_revoked(refresh, check_claims=False)
+        
+        # Stamped before the read, so a revocation committed meanwhile still rejects these claims
+        issued_at = time.time()
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_not_found')
+        add_role_claims(refresh, user, issued_at)
+        
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import hierarchy
+from .authentication import revoke_user_tokens
+from .models import CLAIM_FIELDS, User, UserProfile, Team, Permission, RolePermission
+from .profiles import invalidate_profile_data
+from .permissions import role_permission_matrix
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def invalidate_role_permission_matrix(sender, **kwargs):
+    """Bump the shared matrix version once the write is committed"""
+    transaction.on_commit(role_permission_matrix.invalidate)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_claims(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Compare against the stored row so post_save knows whether the subtree or the claims changed"""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & {'manager', *CLAIM_FIELDS}:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*CLAIM_FIELDS).first()
+    if previous is None:
+        return
+    if previous['manager_id'] != instance.manager_id:
+        hierarchy.validate_manager(instance.pk, instance.manager_id)
+        instance._manager_changed = True
+    if any(previous[name] != getattr(instance, name) for name in CLAIM_FIELDS):
+        instance._claims_changed = True
+
+
+@receiver(post_save, sender=User)
+def maintain_user_hierarchy(sender, instance, created, raw=False, **kwargs):
+    """Keep the UserHierarchy closure table in step with User.manager"""
+    if raw:
+        return
+    manager_changed = instance.__dict__.pop('_manager_changed', False)
+    if created:
+        hierarchy.add_node(instance)
+    elif manager_changed:
+        hierarchy.move_subtree(instance, instance.manager_id)
+
+
+@receiver(pre_delete, sender=User)
+def detach_direct_reports(sender, instance, **kwargs):
+    """SET_NULL clears the reports' manager with a bulk UPDATE and no post_save, so detach their subtrees here"""
+    for report in User.objects.filter(manager=instance).only('pk'):
+        hierarchy.move_subtree(report, None)
+        # manager_id is one of their claims
+        transaction.on_commit(lambda user_id=report.pk: revoke_user_tokens(user_id))
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    """Every user gets a profile up front so reads never have to create one"""
+    if created and not raw:
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """The cached profile payload embeds the user, so both models invalidate it"""
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(lambda: invalidate_profile_data(user_id))
+
+
+@receiver(post_save, sender=User)
+def revoke_stale_claims(sender, instance, created, raw=False, **kwargs):
+    """Tokens embedding the old role/manager/status must not outlive the change"""
+    if raw or created:
+        return
+    if instance.__dict__.pop('_claims_changed', False):
+        transaction.on_commit(lambda: revoke_user_tokens(instance.pk))
+
+
+@receiver(m2m_changed, sender=Team.members.through)
+def revoke_stale_team_claims(sender, instance, action, reverse, pk_set, **kwargs):
+    """Membership changes invalidate the team_ids claim of the affected users"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(instance.members.values_list('id', flat=True))
+    else:
+        user_ids = list(pk_set or [])
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: revoke_user_tokens(user_id))
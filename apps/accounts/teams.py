@@ -0,0 +1,38 @@
+from django.db import transaction
+
+from .authentication import revoke_user_tokens
+from .models import Team
+
+
+def update_team_members(team, add=(), remove=(), replace=None):
+    """Apply a membership change as one diff on the through table
+    
+    ``replace`` sets the exact member list; otherwise ``add`` and ``remove``
+    are applied. Runs one bulk INSERT and one DELETE at most, and returns the
+    sorted added and removed user ids plus the resulting member count. Bulk writes bypass m2m_changed, so the
+    affected users' token claims are revoked here.
+    """
+    through = Team.members.through
+    with transaction.atomic():
+        # Serialize concurrent membership edits of the same team
+        Team.objects.select_for_update().filter(pk=team.pk).exists()
+        current = set(through.objects.filter(team_id=team.pk).values_list('user_id', flat=True))
+        
+        if replace is not None:
+            desired = set(replace)
+        else:
+            desired = (current | set(add)) - set(remove)
+        added = sorted(desired - current)
+        removed = sorted(current - desired)
+        
+        if added:
+            through.objects.bulk_create(
+                [through(team_id=team.pk, user_id=user_id) for user_id in added],
+                ignore_conflicts=True,
+            )
+        if removed:
+            through.objects.filter(team_id=team.pk, user_id__in=removed).delete()
+        
+        for user_id in added + removed:
+            transaction.on_commit(lambda user_id=user_id: revoke_user_tokens(user_id))
+    return added, removed, len(desired)
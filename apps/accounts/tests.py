@@ -0,0 +1,356 @@
+import io
+import json
+import os
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from .authentication import CLAIMS_REVOKED_KEY, RoleRefreshToken, StatelessJWTAuthentication, revoke_user_tokens
+from .hierarchy import rebuild_hierarchy, scope_to_user
+from .models import ClaimsUser, Permission, RolePermission, Team, User, UserHierarchy, UserProfile
+from .permissions import RolePermissionMatrix, role_permission_matrix, user_has_role_permissions
+from .profiles import PROFILE_CACHE_KEY
+
+
+def make_user(email, **fields):
+    username = email.split('@')[0]
+    return User.objects.create_user(email=email, username=username, password=None, **fields)
+
+
+class RolePermissionMatrixTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        role_permission_matrix.clear()
+        self.addCleanup(role_permission_matrix.clear)
+        self.view = Permission.objects.create(codename='view_customer', name='View Customer', module='customers')
+        self.change = Permission.objects.create(codename='change_customer', name='Change Customer', module='customers')
+        RolePermission.objects.create(role='sales', permission=self.view)
+        self.user = make_user('rep@example.com', role='sales')
+    
+    def test_warm_matrix_answers_without_queries(self):
+        self.assertTrue(user_has_role_permissions(self.user, ['view_customer']))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.user.has_perm('view_customer'))
+            self.assertFalse(user_has_role_permissions(self.user, ['view_customer', 'change_customer']))
+    
+    def test_committed_writes_reload_the_matrix(self):
+        self.assertFalse(user_has_role_permissions(self.user, ['change_customer']))
+        with self.captureOnCommitCallbacks(execute=True):
+            RolePermission.objects.create(role='sales', permission=self.change)
+        self.assertTrue(user_has_role_permissions(self.user, ['change_customer']))
+    
+    def test_other_processes_reload_on_the_shared_version(self):
+        other = RolePermissionMatrix()
+        self.assertEqual(other.permissions_for_role('sales'), {'view_customer'})
+        RolePermission.objects.create(role='sales', permission=self.change)
+        role_permission_matrix.invalidate()
+        
+        self.assertEqual(other.permissions_for_role('sales'), {'view_customer'})  # within the check interval
+        with override_settings(ROLE_PERMISSION_VERSION_CHECK_INTERVAL=0):
+            self.assertEqual(other.permissions_for_role('sales'), {'view_customer', 'change_customer'})
+
+
+class UserHierarchyTests(TestCase):
+    
+    def setUp(self):
+        self.director = make_user('director@example.com', role='manager')
+        self.manager = make_user('manager@example.com', role='manager', manager=self.director)
+        self.rep = make_user('rep@example.com', manager=self.manager)
+        self.other = make_user('other@example.com', role='manager')
+    
+    def closure(self):
+        return set(UserHierarchy.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+    
+    def assertClosureIsConsistent(self):
+        incremental = self.closure()
+        rebuild_hierarchy()
+        self.assertEqual(incremental, self.closure())
+    
+    def test_subtree_resolves_every_level(self):
+        self.assertEqual(set(User.objects.reporting_to(self.director)), {self.director, self.manager, self.rep})
+        self.assertEqual(set(User.objects.reporting_to(self.director, include_self=False, max_depth=1)), {self.manager})
+        self.assertEqual(set(User.objects.managers_of(self.rep)), {self.manager, self.director})
+        self.assertClosureIsConsistent()
+    
+    def test_manager_change_moves_the_whole_subtree(self):
+        self.manager.manager = self.other
+        self.manager.save()
+        self.assertEqual(set(User.objects.reporting_to(self.other)), {self.other, self.manager, self.rep})
+        self.assertEqual(set(User.objects.reporting_to(self.director)), {self.director})
+        self.assertClosureIsConsistent()
+    
+    def test_deleting_a_middle_manager_detaches_their_reports(self):
+        self.manager.delete()
+        self.rep.refresh_from_db()
+        self.assertIsNone(self.rep.manager_id)
+        self.assertEqual(set(User.objects.reporting_to(self.director)), {self.director})
+        self.assertEqual(set(scope_to_user(User.objects.all(), self.director, field='pk')), {self.director})
+        self.assertClosureIsConsistent()
+    
+    def test_cycles_are_rejected(self):
+        self.director.manager = self.rep
+        with self.assertRaises(ValidationError):
+            self.director.save()
+        self.assertClosureIsConsistent()
+    
+    def test_managers_are_scoped_to_their_reporting_line(self):
+        self.assertEqual(set(scope_to_user(User.objects.all(), self.director, field='pk')), {self.director, self.manager, self.rep})
+        self.assertEqual(set(scope_to_user(User.objects.all(), self.rep, field='pk')), {self.rep})
+
+
+class ProfileTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('ada@example.com', first_name='Ada', last_name='Lovelace')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_profile_is_created_with_the_user(self):
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+    
+    def test_cached_profile_is_refreshed_after_an_update(self):
+        self.client.get('/api/auth/profiles/my_profile/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profiles/my_profile/')
+        self.assertEqual(response.data['timezone'], 'UTC')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/auth/profiles/update_my_profile/', {'timezone': 'Europe/London'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/profiles/my_profile/').data['timezone'], 'Europe/London')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).get().save()  # user fields are embedded in the payload too
+        self.assertIsNone(cache.get(PROFILE_CACHE_KEY.format(user_id=self.user.pk)))
+
+
+class TokenRevocationTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('ada@example.com', first_name='Ada', last_name='Lovelace')
+        self.authentication = StatelessJWTAuthentication()
+        self.revoked_key = CLAIMS_REVOKED_KEY.format(user_id=self.user.pk)
+    
+    def access_token(self):
+        return RoleRefreshToken.for_user(self.user).access_token
+    
+    def test_tokens_read_before_a_revocation_are_rejected(self):
+        stale = self.access_token()
+        revoke_user_tokens(self.user.pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(stale)
+        self.assertEqual(self.authentication.get_user(self.access_token()).pk, self.user.pk)
+    
+    def test_revocation_time_never_moves_back(self):
+        later = time.time() + 60  # recorded by a node whose clock runs ahead
+        cache.set(self.revoked_key, later)
+        revoke_user_tokens(self.user.pk)
+        self.assertEqual(cache.get(self.revoked_key), later)
+    
+    def test_revocation_holds_after_an_earlier_entry_lapsed(self):
+        # With a version counter, a token minted at version 1 outlived the entry and passed the restarted count
+        revoke_user_tokens(self.user.pk)
+        stale = self.access_token()
+        cache.delete(self.revoked_key)
+        revoke_user_tokens(self.user.pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(stale)
+    
+    
+    def test_claims_user_is_built_without_queries(self):
+        team = Team.objects.create(name='North', leader=self.user)
+        team.members.add(self.user)
+        token = self.access_token()
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(token)
+            self.assertEqual((user.pk, user.role, user.manager_id, user.team_ids), (self.user.pk, 'sales', None, [team.pk]))
+            self.assertTrue(user.is_active)
+    
+    def test_other_columns_load_together_on_first_use(self):
+        user = ClaimsUser.from_claims(self.user.pk, self.access_token())
+        with self.assertNumQueries(1):
+            self.assertEqual((user.email, user.first_name, user.last_name), ('ada@example.com', 'Ada', 'Lovelace'))
+        self.assertEqual(user.get_deferred_fields(), set())
+    
+    def test_logout_revokes_the_access_and_refresh_tokens(self):
+        refresh = RoleRefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.assertEqual(client.get('/api/auth/users/me/').status_code, 200)
+        response = client.post('/api/auth/users/logout/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        
+        self.assertEqual(client.get('/api/auth/users/me/').status_code, 401)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': str(refresh)}, format='json').status_code, 401)
+
+class TeamListQueryTests(TestCase):
+    """The team list costs the same number of queries however many teams and members it shows"""
+    
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def add_teams(self, count):
+        for _ in range(count):
+            team = Team.objects.create(name=f'Team {Team.objects.count()}', leader=self.admin)
+            team.members.set([make_user(f'member{team.pk}-{n}@example.com', role='sales') for n in range(3)])
+    
+    def assertListQueries(self, mode, expected):
+        for teams in (1, 4):
+            self.add_teams(teams)
+            with self.assertNumQueries(expected):
+                response = self.client.get('/api/auth/teams/', {'members': mode})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], Team.objects.count())
+        return response.data['results']
+    
+    def test_full_members(self):
+        # COUNT for the page, the teams with leader and member count, the members
+        results = self.assertListQueries('full', 3)
+        self.assertEqual(len(results[0]['members']), 3)
+        self.assertIn('phone', results[0]['members'][0])
+    
+    def test_member_summaries(self):
+        results = self.assertListQueries('summary', 3)
+        self.assertEqual(set(results[0]['members'][0]), {'id', 'full_name', 'email', 'role'})
+    
+    def test_no_members(self):
+        results = self.assertListQueries('none', 2)
+        self.assertNotIn('members', results[0])
+        self.assertEqual(results[0]['member_count'], 3)
+
+
+class TeamMembershipTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('admin@example.com', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.team = Team.objects.create(name='Sales', leader=self.admin)
+        self.users = [make_user(f'rep{n}@example.com') for n in range(6)]
+        self.ids = [user.pk for user in self.users]
+    
+    def change(self, method, action, user_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(f'/api/auth/teams/{self.team.pk}/{action}/', {'user_ids': user_ids}, format='json')
+    
+    def members(self):
+        return set(self.team.members.values_list('id', flat=True))
+    
+    def test_add_remove_and_replace(self):
+        response = self.change('post', 'add_members', self.ids[:4])
+        self.assertEqual(response.data, {'added': self.ids[:4], 'removed': [], 'member_count': 4})
+        
+        response = self.change('post', 'remove_members', self.ids[:2])
+        self.assertEqual(response.data, {'added': [], 'removed': self.ids[:2], 'member_count': 2})
+        
+        response = self.change('put', 'set_members', self.ids[3:])
+        self.assertEqual(response.data, {'added': self.ids[4:], 'removed': [self.ids[2]], 'member_count': 3})
+        self.assertEqual(self.members(), set(self.ids[3:]))
+        
+        self.assertEqual(self.change('put', 'set_members', []).data['removed'], self.ids[3:])
+    
+    def test_unknown_users_reject_the_whole_change(self):
+        response = self.change('post', 'add_members', [self.ids[0], 999999])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', str(response.data['user_ids']))
+        self.assertEqual(self.members(), set())
+    
+    def test_query_count_does_not_grow_with_the_change(self):
+        self.team.members.set(self.ids[:3])
+        many = self.ids[4:] + [make_user(f'new{n}@example.com').pk for n in range(20)]
+        with CaptureQueriesContext(connection) as small:
+            self.change('put', 'set_members', self.ids[1:4])
+        with CaptureQueriesContext(connection) as large:
+            self.change('put', 'set_members', many)
+        self.assertEqual(len(small), len(large))
+    
+    def test_affected_users_tokens_are_revoked(self):
+        self.change('post', 'add_members', self.ids[:1])
+        self.assertIsNotNone(cache.get(CLAIMS_REVOKED_KEY.format(user_id=self.ids[0])))
+        self.assertIsNone(cache.get(CLAIMS_REVOKED_KEY.format(user_id=self.ids[1])))
+
+
+class ProvisionUsersTests(TestCase):
+    
+    def provision(self, *rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(row) for row in rows))
+        self.addCleanup(os.remove, handle.name)
+        stderr = io.StringIO()
+        call_command('provision_users', handle.name, workers=1, stdout=io.StringIO(), stderr=stderr)
+        return stderr.getvalue()
+    
+    def closure(self):
+        return set(UserHierarchy.objects.values_list('ancestor__email', 'descendant__email', 'depth'))
+    
+    def test_existing_email_in_another_case_is_skipped(self):
+        make_user('ADA@example.com')
+        self.provision({'email': 'ada@example.com', 'username': 'ada2'}, {'email': 'grace@example.com'})
+        self.assertEqual(sorted(User.objects.values_list('email', flat=True)), ['ADA@example.com', 'grace@example.com'])
+    
+    def test_taken_usernames_are_skipped(self):
+        make_user('ada@example.com')
+        stderr = self.provision(
+            {'email': 'one@example.com', 'username': 'dup'},
+            {'email': 'two@example.com', 'username': 'dup'},
+            {'email': 'three@example.com', 'username': 'ada'},
+            {'email': 'four@example.com', 'username': 'four'},
+        )
+        self.assertEqual(dict(User.objects.values_list('email', 'username')),
+                         {'ada@example.com': 'ada', 'one@example.com': 'dup', 'four@example.com': 'four'})
+        self.assertEqual(stderr.count('username already in use'), 2)
+    
+    def test_manager_links_extend_the_closure_table(self):
+        make_user('Boss@example.com')
+        self.provision(
+            {'email': 'c@example.com', 'manager_email': 'b@example.com'},
+            {'email': 'b@example.com', 'manager_email': 'boss@example.com'},
+            {'email': 'x@example.com', 'manager_email': 'y@example.com'},
+            {'email': 'y@example.com', 'manager_email': 'x@example.com'},
+        )
+        managers = dict(User.objects.values_list('email', 'manager__email'))
+        self.assertEqual(managers['c@example.com'], 'b@example.com')
+        self.assertEqual(managers['b@example.com'], 'Boss@example.com')
+        self.assertEqual(managers['x@example.com'], 'y@example.com')
+        self.assertIsNone(managers['y@example.com'])  # would have closed a cycle
+        
+        incremental = self.closure()
+        rebuild_hierarchy()
+        self.assertEqual(incremental, self.closure())
+        self.assertIn(('Boss@example.com', 'c@example.com', 2), incremental)
+
+
+class InitCrmTests(TestCase):
+    
+    def init_crm(self, *args):
+        call_command('init_crm', *args, stdout=io.StringIO())
+    
+    def test_default_admin_is_only_created_on_first_init(self):
+        self.init_crm()
+        self.init_crm('--check')
+        
+        make_user('ops@example.com', role='admin')  # the operator's own admin replaces the default one
+        User.objects.filter(email='admin@crm.com').delete()
+        self.init_crm('--check')
+        self.init_crm()
+        self.assertFalse(User.objects.filter(email='admin@crm.com').exists())
+    
+    def test_check_reports_permission_drift(self):
+        self.init_crm()
+        RolePermission.objects.filter(role='sales').delete()
+        with self.assertRaises(CommandError):
+            self.init_crm('--check')
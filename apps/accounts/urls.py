@@ -1,9 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet
+from .views import UserViewSet, UserProfileViewSet, TeamViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
+router.register(r'profiles', UserProfileViewSet)
+router.register(r'teams', TeamViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,12 +1,16 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import login
-from django.db.models import Q
+from django.db.models import Count, Prefetch
+from .authentication import RoleRefreshToken, revoke_token
 from .models import User, UserProfile, Team, Permission, RolePermission
+from .profiles import get_profile, get_profile_data
+from .teams import update_team_members
 from .serializers import (
-    UserSerializer, UserProfileSerializer, TeamSerializer,
+    UserSerializer, UserProfileSerializer, TeamSerializer, TeamMembershipSerializer,
     PermissionSerializer, RolePermissionSerializer,
     LoginSerializer, RegisterSerializer, ChangePasswordSerializer
 )
@@ -29,7 +33,8 @@ class UserViewSet(viewsets.ModelViewSet):
         if user.role == 'admin':
             return User.objects.all()
         elif user.role == 'manager':
-            return User.objects.filter(Q(manager=user) | Q(id=user.id))
+            # Whole reporting subtree (and the manager) via the closure table
+            return User.objects.reporting_to(user)
         else:
             return User.objects.filter(id=user.id)
     
@@ -39,7 +44,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = RoleRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'tokens': {
@@ -56,7 +61,7 @@ class UserViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             login(request, user)
-            refresh = RefreshToken.for_user(user)
+            refresh = RoleRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'tokens': {
@@ -66,6 +71,18 @@ class UserViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def logout(self, request):
+        """Revoke the access token used for this request and, if given, the refresh token"""
+        if request.auth is not None:
+            revoke_token(request.auth)
+        if request.data.get('refresh'):
+            try:
+                revoke_token(RoleRefreshToken(request.data['refresh']))
+            except TokenError:
+                return Response({'error': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': 'Logged out successfully'})
+    
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get current user profile"""
@@ -104,21 +121,19 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         """Filter queryset based on user permissions"""
         user = self.request.user
         if user.role == 'admin':
-            return UserProfile.objects.all()
+            return UserProfile.objects.select_related('user')
         else:
-            return UserProfile.objects.filter(user=user)
+            return UserProfile.objects.select_related('user').filter(user=user)
     
     @action(detail=False, methods=['get'])
     def my_profile(self, request):
         """Get current user's profile"""
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
-        serializer = UserProfileSerializer(profile)
-        return Response(serializer.data)
+        return Response(get_profile_data(request.user))
     
     @action(detail=False, methods=['put'])
     def update_my_profile(self, request):
         """Update current user's profile"""
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
+        profile = get_profile(request.user)
         serializer = UserProfileSerializer(profile, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -136,14 +151,39 @@ class TeamViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    MEMBERSHIP_ACTIONS = ['add_members', 'remove_members', 'set_members']
+    
+    def get_members_mode(self):
+        """Member payload requested via ?members=full|summary|none"""
+        mode = self.request.query_params.get('members', 'full')
+        if mode not in TeamSerializer.MEMBER_MODES:
+            raise ValidationError({'members': f"Must be one of: {', '.join(TeamSerializer.MEMBER_MODES)}."})
+        return mode
     
     def get_queryset(self):
         """Filter queryset based on user permissions"""
         user = self.request.user
+        # Annotate before filtering on members so the count uses its own join
+        queryset = Team.objects.select_related('leader').annotate(num_members=Count('members', distinct=True))
+        
+        # The membership actions don't serialize the team
+        mode = 'none' if self.action in self.MEMBERSHIP_ACTIONS else self.get_members_mode()
+        if mode == 'full':
+            queryset = queryset.prefetch_related('members')
+        elif mode == 'summary':
+            queryset = queryset.prefetch_related(Prefetch(
+                'members', queryset=User.objects.only('id', 'first_name', 'last_name', 'email', 'role')
+            ))
+        
         if user.role in ['admin', 'manager']:
-            return Team.objects.all()
+            return queryset
         else:
-            return Team.objects.filter(members=user)
+            return queryset.filter(members=user)
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is TeamSerializer:
+            kwargs.setdefault('members_mode', self.get_members_mode())
+        return super().get_serializer(*args, **kwargs)
     
     @action(detail=True, methods=['post'])
     def add_member(self, request, pk=None):
@@ -172,6 +212,34 @@ class TeamViewSet(viewsets.ModelViewSet):
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    
+    def update_members(self, request, change):
+        """Validate `user_ids` and apply them as `change` ('add', 'remove' or 'replace')"""
+        team = self.get_object()
+        serializer = TeamMembershipSerializer(data=request.data, allow_empty=change == 'replace')
+        serializer.is_valid(raise_exception=True)
+        added, removed, member_count = update_team_members(team, **{change: serializer.validated_data['user_ids']})
+        return Response({
+            'added': added,
+            'removed': removed,
+            'member_count': member_count,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def add_members(self, request, pk=None):
+        """Add many members to team"""
+        return self.update_members(request, 'add')
+    
+    @action(detail=True, methods=['post'])
+    def remove_members(self, request, pk=None):
+        """Remove many members from team"""
+        return self.update_members(request, 'remove')
+    
+    @action(detail=True, methods=['put'])
+    def set_members(self, request, pk=None):
+        """Replace the team's members with exactly the given users"""
+        return self.update_members(request, 'replace')
 
 
 class PermissionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='notification_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='task_customer_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automation', '0004_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='automationlog',
+            index=models.Index(fields=['rule', '-created_at'], name='automation_log_rule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='automationlog',
+            index=models.Index(fields=['-created_at'], name='automation_log_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_owner_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', ['completed', 'cancelled']), _negated=True), fields=['assigned_to', 'due_date'], name='task_open_owner_due_idx'),
+        ),
+    ]
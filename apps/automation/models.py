@@ -217,6 +217,14 @@ class Task(models.Model):
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
         ordering = ['due_date']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='task_customer_timeline_idx'),
+            models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_owner_status_due_idx'),
+            models.Index(
+                fields=['assigned_to', 'due_date'], name='task_open_owner_due_idx',
+                condition=~models.Q(status__in=['completed', 'cancelled']),
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -277,6 +285,14 @@ class Notification(models.Model):
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='notification_timeline_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+            models.Index(
+                fields=['recipient', '-created_at'], name='notification_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.recipient}"
@@ -337,6 +353,10 @@ class AutomationLog(models.Model):
         verbose_name = 'Automation Log'
         verbose_name_plural = 'Automation Logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['rule', '-created_at'], name='automation_log_rule_idx'),
+            models.Index(fields=['-created_at'], name='automation_log_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.rule.name} - {self.status} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
@@ -0,0 +1,111 @@
+from django.db import connection
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+
+
+ACTIVITY_ROLLUPS = []
+
+
+class ActivityRollup:
+    """A parent's "last activity" date and activity counter, kept current from inserts into a child table
+    
+    Each insert costs one UPDATE of the parent row: the counter is bumped with
+    an F() expression and the date only moves forward (CASE WHEN last IS NULL
+    OR last < new), so concurrent or out-of-order writers never lose updates
+    and never rewind the date. Writes that bypass post_save (bulk_create,
+    raw loads, archival) are caught up by refresh().
+    """
+    
+    def __init__(self, model, parent_field, date_field, counter_field, on_update=None):
+        self.model = model
+        self.parent_field = parent_field
+        self.date_field = date_field
+        self.counter_field = counter_field
+        self.on_update = on_update  # called with the touched parent ids
+    
+    @property
+    def parent_model(self):
+        return self.model._meta.get_field(self.parent_field).related_model
+    
+    @property
+    def parent_attname(self):
+        return self.model._meta.get_field(self.parent_field).attname
+    
+    def touch(self, parent_id, latest):
+        """Count one new child row and move the date forward to `latest`"""
+        date, counter = self.date_field, self.counter_field
+        changes = {counter: F(counter) + 1}
+        if latest is not None:
+            changes[date] = Case(
+                When(Q(**{f'{date}__isnull': True}) | Q(**{f'{date}__lt': latest}), then=Value(latest)),
+                default=F(date),
+            )
+        return self.parent_model._base_manager.filter(pk=parent_id).update(**changes)
+    
+    def forget(self, parent_id):
+        """Undo one insert's count; the date stays until the next refresh()"""
+        counter = self.counter_field
+        return self.parent_model._base_manager.filter(pk=parent_id, **{f'{counter}__gt': 0}).update(
+            **{counter: F(counter) - 1}
+        )
+    
+    def _totals_sql(self):
+        parents, children = self.parent_model._meta.db_table, self.model._meta.db_table
+        column = self.model._meta.get_field(self.parent_field).column
+        return (
+            f'SELECT p.id AS id, COUNT(c.id) AS total, MAX(c.created_at) AS latest '
+            f'FROM {parents} p LEFT JOIN {children} c ON c.{column} = p.id GROUP BY p.id'
+        )
+    
+    def _drifted_sql(self, table):
+        date, counter = self.parent_model._meta.get_field(self.date_field).column, self.counter_field
+        return (
+            f'w.id = {table}.id AND ({table}.{counter} < w.total OR (w.latest IS NOT NULL AND '
+            f'({table}.{date} IS NULL OR {table}.{date} < w.latest)))'
+        )
+    
+    def drift(self):
+        """How many parents lag behind their child table"""
+        table = self.parent_model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}, ({self._totals_sql()}) w WHERE {self._drifted_sql(table)}')
+            return cursor.fetchone()[0]
+    
+    def refresh(self):
+        """Catch every lagging parent up with the child table in one grouped UPDATE ... FROM
+        
+        Counters and dates only move up: dates may also have been set by hand
+        or by an import, and archived activities (apps.core.partitions) have
+        left the child table but still count.
+        """
+        table = self.parent_model._meta.db_table
+        date = self.parent_model._meta.get_field(self.date_field).column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {self.counter_field} = CASE WHEN w.total > {table}.{self.counter_field} '
+                f'THEN w.total ELSE {table}.{self.counter_field} END, '
+                f'{date} = CASE WHEN w.latest IS NOT NULL AND ({table}.{date} IS NULL OR {table}.{date} < w.latest) '
+                f'THEN w.latest ELSE {table}.{date} END '
+                f'FROM ({self._totals_sql()}) w WHERE {self._drifted_sql(table)}'
+            )
+            return cursor.rowcount
+    
+    def connect(self):
+        """Register the rollup and hook it to the child model's saves and deletes"""
+        ACTIVITY_ROLLUPS.append(self)
+        uid = f'activity-rollup:{self.model._meta.label}'
+        post_save.connect(self._saved, sender=self.model, dispatch_uid=uid)
+        post_delete.connect(self._deleted, sender=self.model, dispatch_uid=uid)
+        return self
+    
+    def _saved(self, sender, instance, created, raw=False, **kwargs):
+        parent_id = getattr(instance, self.parent_attname)
+        if created and not raw and parent_id is not None:
+            self.touch(parent_id, instance.created_at)
+            if self.on_update:
+                self.on_update([parent_id])
+    
+    def _deleted(self, sender, instance, **kwargs):
+        parent_id = getattr(instance, self.parent_attname)
+        if parent_id is not None:
+            self.forget(parent_id)
@@ -0,0 +1,96 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+USER_PIN_KEY = 'db:pin:user:{user_id}'
+
+
+class _Scope:
+    """Per-request routing state: whether reads are pinned and whether anything was written"""
+    
+    __slots__ = ('pinned', 'wrote')
+    
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_scope = ContextVar('db_routing_scope', default=None)
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """Track writes for the duration of a request (see ReadYourWritesMiddleware)"""
+    scope = _Scope(pinned)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    """Send every read in the block to the primary, e.g. in a task that must see its own writes"""
+    scope = _scope.get()
+    if scope is None:
+        with routing_scope(pinned=True):
+            yield
+        return
+    previous, scope.pinned = scope.pinned, True
+    try:
+        yield
+    finally:
+        scope.pinned = previous
+
+
+def pin_user(user_id):
+    """Keep the user's reads on the primary for REPLICA_PIN_SECONDS, whichever client they use next"""
+    cache.set(USER_PIN_KEY.format(user_id=user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def apply_user_pin(user_id):
+    """Pin the rest of the current request if the user wrote recently; called once the user is known"""
+    scope = _scope.get()
+    if scope is None or scope.pinned or not settings.DATABASE_REPLICAS:
+        return
+    if cache.get(USER_PIN_KEY.format(user_id=user_id)):
+        scope.pinned = True
+
+
+class ReplicaRouter:
+    """Route reads to a random replica in settings.DATABASE_REPLICAS and writes to the primary
+    
+    Reads stay on the primary while pinned (pin_to_primary, a recent write by
+    the same client, or an earlier write in the same request) and inside
+    transactions on the primary, so code never reads behind its own writes.
+    """
+    
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        scope = _scope.get()
+        if scope is not None and (scope.pinned or scope.wrote):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+    
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.wrote = True
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
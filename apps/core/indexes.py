@@ -0,0 +1,20 @@
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.db.models.sql import Query
+
+
+def partial_index_predicate(model, name):
+    """A filter() expression for the rows covered by the model's partial index `name`
+    
+    The index condition is rendered with its values inlined, exactly as in
+    CREATE INDEX. SQLite only picks a partial index when the query repeats
+    the index's WHERE terms with literal values; ~Q(stage__in=[...]) binds
+    them as parameters and falls back to a full index range plus a sort.
+    """
+    index = next(index for index in model._meta.indexes if index.name == name)
+    query = Query(model)
+    where = query.build_where(index.condition)
+    sql, params = where.as_sql(query.get_compiler(connection=connection), connection)
+    editor = connection.SchemaEditorClass(connection)
+    return RawSQL(sql % tuple(editor.quote_value(param) for param in params), (), output_field=BooleanField())
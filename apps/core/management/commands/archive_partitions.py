@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.core.db import pin_to_primary
+from apps.core.partitions import PARTITIONED_MODELS, add_months, month_start, partitioned_tables
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions and archive months past retention to gzipped CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=settings.ARCHIVE_RETENTION_MONTHS,
+                            help='Months to keep in the live tables, the current one included')
+        parser.add_argument('--ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD,
+                            help='Months of empty partitions to keep ready (PostgreSQL)')
+        parser.add_argument('--table', action='append', dest='tables',
+                            help='Only this model, e.g. customers.CustomerInteraction (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would be archived')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+        unknown = set(options['tables'] or []) - set(PARTITIONED_MODELS)
+        if unknown:
+            raise CommandError(f'Not a partitioned model: {", ".join(sorted(unknown))}')
+        
+        cutoff = add_months(month_start(timezone.now()), 1 - options['months'])
+        for table in partitioned_tables():
+            if options['tables'] and table.model._meta.label not in options['tables']:
+                continue
+            if connection.vendor == 'postgresql' and not options['dry_run']:
+                with connection.cursor() as cursor:
+                    if table.is_partitioned(cursor):
+                        for month in table.ensure_partitions(cursor, options['ahead']):
+                            self.stdout.write(f'{table.table}: created partition {table.partition_name(month)}')
+            
+            for month in table.archivable_months(cutoff):
+                if options['dry_run']:
+                    self.stdout.write(f'{table.table}: would archive {month:%Y-%m}')
+                    continue
+                path, rows = table.archive_month(month)
+                self.stdout.write(self.style.SUCCESS(f'{table.table}: archived {month:%Y-%m}, {rows} row(s) to {path}'))
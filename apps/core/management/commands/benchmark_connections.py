@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from apps.accounts.authentication import RoleRefreshToken
+
+User = get_user_model()
+
+# SQLite's own defaults, to compare the tuned pragmas against
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 0}
+
+
+class Command(BaseCommand):
+    help = 'Compare requests per second across database connection settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and setting')
+        parser.add_argument('--email', default='admin@crm.com', help='User the requests authenticate as')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']} (run init_crm first)")
+        token = str(RoleRefreshToken.for_user(user).access_token)
+        iterations = options['requests']
+        
+        # Requests go through the real WSGI handler (unlike the test client) so
+        # request_finished closes connections exactly as under gunicorn
+        handler = WSGIHandler()
+        factory = RequestFactory(HTTP_AUTHORIZATION=f'Bearer {token}')
+        endpoints = [
+            ('read', lambda: factory.get('/api/auth/users/me/')),
+            ('write', lambda: factory.put(
+                '/api/auth/profiles/update_my_profile/', {'bio': 'benchmark'}, content_type='application/json'
+            )),
+        ]
+        
+        self.stdout.write(f'{"setting":<28}' + ''.join(f'{name + " req/s":>14}' for name, _ in endpoints))
+        for name, conn_max_age, health_checks, pragmas in self.settings_matrix():
+            rates = []
+            with override_settings(ALLOWED_HOSTS=['testserver'], SQLITE_PRAGMAS=pragmas):
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+                connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+                for _, build_request in endpoints:
+                    rates.append(self.measure(handler, build_request, iterations))
+            self.stdout.write(f'{name:<28}' + ''.join(f'{rate:>14.0f}' for rate in rates))
+        connection.close()
+
+    def settings_matrix(self):
+        """(label, CONN_MAX_AGE, CONN_HEALTH_CHECKS, SQLITE_PRAGMAS) per run"""
+        tuned = settings.SQLITE_PRAGMAS
+        matrix = []
+        if connection.vendor == 'sqlite':
+            # Runs first: journal_mode persists in the file, and the tuned runs restore WAL
+            matrix.append(('persistent, default pragmas', 60, True, SQLITE_DEFAULT_PRAGMAS))
+        return matrix + [
+            ('new connection per request', 0, False, tuned),
+            ('persistent', 60, False, tuned),
+            ('persistent + health checks', 60, True, tuned),
+        ]
+
+    def measure(self, handler, build_request, iterations):
+        def start_response(status, headers):
+            if not status.startswith('2'):
+                raise CommandError(f'Benchmark request failed: {status}')
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            response = handler(build_request().environ, start_response)
+            response.close()  # fires request_finished
+        return iterations / (time.perf_counter() - start)
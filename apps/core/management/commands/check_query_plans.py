@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.automation.models import AutomationLog, Notification, Task
+from apps.core.indexes import partial_index_predicate
+from apps.core.pagination import CursorPagination
+from apps.core.query_plans import PlanCheck
+from apps.customers.models import Customer, CustomerInteraction
+from apps.deals.models import Deal
+from apps.integrations.models import IntegrationLog
+from apps.leads.models import Lead
+from apps.notifications.models import NotificationDelivery, NotificationQueue
+
+
+PAGE = 25
+
+
+def keyset_page(queryset, position):
+    """A deep page as ?pagination=cursor fetches it"""
+    paginator = CursorPagination()
+    paginator.keys = paginator.get_ordering_keys(queryset)
+    return paginator.keyset_queryset(queryset, position)[:PAGE + 1]
+
+
+def hot_queries(owner_id=1):
+    """The list and filter queries behind the main screens, as the API and workers issue them"""
+    now = timezone.now()
+    return [
+        PlanCheck('customers: list', Customer.objects.all()[:PAGE], 'customer_name_idx'),
+        PlanCheck('customers: by owner', Customer.objects.filter(assigned_to=owner_id)[:PAGE], 'customer_owner_name_idx'),
+        PlanCheck('customers: by owner and status',
+                  Customer.objects.filter(assigned_to=owner_id, status='active')[:PAGE], 'customer_owner_status_idx'),
+        PlanCheck('customers: by status', Customer.objects.filter(status='active')[:PAGE], 'customer_status_name_idx'),
+        PlanCheck('customers: no contact in 30 days',
+                  Customer.objects.filter(last_contact_date__lt=now - timedelta(days=30)).order_by('last_contact_date')[:PAGE]),
+        PlanCheck('customers: keyset page', keyset_page(Customer.objects.all(), ['Smith', 'Anna', 1000]), 'customer_name_idx'),
+        PlanCheck('customers: interactions',
+                  CustomerInteraction.objects.filter(customer=1).order_by('-created_at', '-id')[:PAGE],
+                  'cust_interaction_timeline_idx'),
+        
+        PlanCheck('leads: list', Lead.objects.all()[:PAGE], 'lead_created_idx'),
+        PlanCheck('leads: keyset page', keyset_page(Lead.objects.all(), [now, 1000]), 'lead_created_idx'),
+        PlanCheck('leads: by owner', Lead.objects.filter(assigned_to=owner_id)[:PAGE], 'lead_owner_created_idx'),
+        PlanCheck('leads: by owner and status',
+                  Lead.objects.filter(assigned_to=owner_id, status='new')[:PAGE], 'lead_owner_status_idx'),
+        PlanCheck('leads: by status', Lead.objects.filter(status='qualified')[:PAGE], 'lead_status_created_idx'),
+        PlanCheck('leads: follow-ups due',
+                  Lead.objects.filter(assigned_to=owner_id, next_follow_up__isnull=False, next_follow_up__lte=now)
+                  .order_by('next_follow_up')[:PAGE], 'lead_owner_follow_up_idx'),
+        
+        PlanCheck('deals: list', Deal.objects.all()[:PAGE], 'deal_created_idx'),
+        PlanCheck('deals: keyset page by owner',
+                  keyset_page(Deal.objects.filter(assigned_to=owner_id), [now, 1000]), 'deal_owner_created_idx'),
+        PlanCheck('deals: by owner', Deal.objects.filter(assigned_to=owner_id)[:PAGE], 'deal_owner_created_idx'),
+        PlanCheck('deals: by owner and stage',
+                  Deal.objects.filter(assigned_to=owner_id, stage='proposal')[:PAGE], 'deal_owner_stage_idx'),
+        PlanCheck('deals: by stage', Deal.objects.filter(stage='negotiation')[:PAGE], 'deal_stage_created_idx'),
+        PlanCheck('deals: open pipeline by close date',
+                  Deal.objects.filter(partial_index_predicate(Deal, 'deal_open_owner_close_idx'), assigned_to=owner_id)
+                  .order_by('expected_close_date')[:PAGE], 'deal_open_owner_close_idx'),
+        
+        PlanCheck('tasks: by owner and status',
+                  Task.objects.filter(assigned_to=owner_id, status='pending')[:PAGE], 'task_owner_status_due_idx'),
+        PlanCheck('tasks: open by due date',
+                  Task.objects.filter(partial_index_predicate(Task, 'task_open_owner_due_idx'), assigned_to=owner_id)[:PAGE],
+                  'task_open_owner_due_idx'),
+        PlanCheck('notifications: inbox', Notification.objects.filter(recipient=owner_id)[:PAGE], 'notification_recipient_idx'),
+        PlanCheck('notifications: unread', Notification.objects.filter(recipient=owner_id, is_read=False)[:PAGE],
+                  'notification_unread_idx'),
+        PlanCheck('notification queue: pending', NotificationQueue.objects.filter(status='pending')[:PAGE],
+                  'notif_queue_pending_idx'),
+        PlanCheck('notification deliveries: by status',
+                  NotificationDelivery.objects.filter(status='failed')[:PAGE], 'notif_delivery_status_idx'),
+        PlanCheck('automation logs: recent', AutomationLog.objects.all()[:PAGE], 'automation_log_created_idx'),
+        PlanCheck('integration logs: per integration',
+                  IntegrationLog.objects.filter(integration=1)[:PAGE], 'integration_log_idx'),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot list and filter queries and fail if any of them is not served by an index scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        failures = 0
+        for check in hot_queries():
+            plan, problems = check.run()
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'FAIL {check.label}: {"; ".join(problems)}'))
+            else:
+                self.stdout.write(f'ok   {check.label}')
+            if problems or options['verbose_plans']:
+                self.stdout.write('\n'.join(f'       {line}' for line in plan.splitlines()))
+        if failures:
+            raise CommandError(f'{failures} quer{"y" if failures == 1 else "ies"} not served by an index')
+        self.stdout.write(self.style.SUCCESS('All hot queries use index scans'))
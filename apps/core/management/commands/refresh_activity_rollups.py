@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.activity import ACTIVITY_ROLLUPS
+from apps.core.db import pin_to_primary
+
+
+class Command(BaseCommand):
+    help = 'Backfill and repair last contact/activity dates and activity counters from the activity tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        for rollup in ACTIVITY_ROLLUPS:
+            started = time.perf_counter()
+            label = f'{rollup.parent_model._meta.verbose_name_plural} <- {rollup.model._meta.verbose_name_plural}'
+            drifted = rollup.drift()
+            self.stdout.write(f'{label}: {drifted} drifted')
+            if drifted and not options['dry_run']:
+                with transaction.atomic():
+                    fixed = rollup.refresh()
+                self.stdout.write(self.style.SUCCESS(
+                    f'  refreshed {fixed} row(s) in {time.perf_counter() - started:.1f}s'
+                ))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core import signing
+
+from .db import pin_user, routing_scope
+
+
+PIN_COOKIE_SALT = 'apps.core.read-your-writes'
+
+
+class ReadYourWritesMiddleware:
+    """Keep a client on the primary database for a while after it writes
+    
+    Unsafe requests always read from the primary. Any request that writes sets
+    a signed cookie for settings.REPLICA_PIN_SECONDS, during which the client's
+    reads also go to the primary, so it never sees replica lag on its own
+    changes. Token clients may not keep cookies, so the pin is also recorded
+    against the authenticated user and picked up by the JWT authentication
+    classes (apply_user_pin) before they read anything.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or self.has_pin(request)
+        with routing_scope(pinned=pinned) as scope:
+            response = self.get_response(request)
+        
+        if scope.wrote:
+            response.set_signed_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', salt=PIN_COOKIE_SALT,
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+            # DRF sets request.user on the underlying request once it authenticates
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_user(user.pk)
+        return response
+    
+    def has_pin(self, request):
+        try:
+            request.get_signed_cookie(
+                settings.REPLICA_PIN_COOKIE, salt=PIN_COOKIE_SALT, max_age=settings.REPLICA_PIN_SECONDS
+            )
+        except (KeyError, signing.BadSignature):
+            return False
+        return True
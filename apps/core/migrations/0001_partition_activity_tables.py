@@ -0,0 +1,48 @@
+from django.db import migrations
+
+from apps.core.partitions import PartitionedTable
+
+
+# Frozen copy of PARTITIONED_MODELS at the time of this migration
+PARTITIONED_MODELS = [
+    'customers.CustomerInteraction',
+    'leads.LeadActivity',
+    'deals.DealActivity',
+    'automation.AutomationLog',
+    'integrations.IntegrationLog',
+    'notifications.NotificationDelivery',
+]
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return  # elsewhere the tables stay plain and months are archived by deleting rows
+    with schema_editor.connection.cursor() as cursor:
+        for label in PARTITIONED_MODELS:
+            PartitionedTable(apps.get_model(label)).partition(cursor)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for label in PARTITIONED_MODELS:
+            PartitionedTable(apps.get_model(label)).unpartition(cursor)
+
+
+class Migration(migrations.Migration):
+    
+    initial = True
+    
+    dependencies = [
+        ('customers', '0008_keyset_tiebreak_indexes'),
+        ('leads', '0006_keyset_tiebreak_indexes'),
+        ('deals', '0006_keyset_tiebreak_indexes'),
+        ('automation', '0005_hot_path_indexes'),
+        ('integrations', '0002_hot_path_indexes'),
+        ('notifications', '0002_hot_path_indexes'),
+    ]
+    
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
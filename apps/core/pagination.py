@@ -0,0 +1,210 @@
+import base64
+import binascii
+import datetime
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OrderingKey:
+    """One column of a keyset: the model field behind an ordering term and its direction"""
+    
+    def __init__(self, path, field, descending):
+        self.path = path
+        self.field = field
+        self.descending = descending
+    
+    @property
+    def nullable(self):
+        return self.field.null
+    
+    def order_by(self):
+        expression = F(self.path)
+        # NULLs last in both directions, whatever the database's default
+        if self.descending:
+            return expression.desc(nulls_last=True) if self.nullable else expression.desc()
+        return expression.asc(nulls_last=True) if self.nullable else expression.asc()
+    
+    def beyond(self, value):
+        """Rows strictly after `value` on this column"""
+        if value is None:
+            return None  # NULLs sort last; nothing follows them on this column
+        q = Q(**{f"{self.path}__{'lt' if self.descending else 'gt'}": value})
+        return q | Q(**{f'{self.path}__isnull': True}) if self.nullable else q
+    
+    def equal(self, value):
+        return Q(**{f'{self.path}__isnull': True}) if value is None else Q(**{self.path: value})
+    
+    def value_of(self, instance):
+        try:
+            return attrgetter(self.path.replace('__', '.'))(instance)
+        except AttributeError:
+            return None  # through a null relation
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but keeping microseconds; a truncated timestamp would skip or repeat rows"""
+    
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def resolve_field(model, path):
+    field = None
+    for name in path.split('__'):
+        if field is not None:
+            model = field.related_model
+            if model is None:
+                raise FieldDoesNotExist(path)
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    if not field.concrete:
+        raise FieldDoesNotExist(path)
+    return field
+
+
+class CursorPagination(PageNumberPagination):
+    """Page numbers by default; keyset pages on request
+    
+    ?pagination=cursor (or any ?cursor=) switches to keyset mode: pages follow
+    the list's ordering (?ordering=, the view's default or the model's
+    Meta.ordering) with the primary key as tiebreaker, and each page is one
+    index range scan from the last row of the previous one, however deep.
+    There is no COUNT(*); ?count=estimate adds the planner's row estimate.
+    """
+    
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        
+        self.request = request
+        self.keys = self.get_ordering_keys(queryset)
+        size = self.get_page_size(request) or self.page_size
+        count_estimate = request.query_params.get(self.count_query_param) == 'estimate'
+        self.count_estimate = estimate_count(queryset) if count_estimate else False
+        
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        rows = list(self.keyset_queryset(queryset, position)[:size + 1])
+        self.next_position = [key.value_of(rows[size - 1]) for key in self.keys] if len(rows) > size else None
+        return rows[:size]
+    
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        body = {'next': self.get_next_link(), 'results': data}
+        if self.count_estimate is not False:
+            body['count_estimate'] = self.count_estimate
+        return Response(body)
+    
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+    
+    def get_ordering_keys(self, queryset):
+        model = queryset.model
+        ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+        keys = []
+        for term in ordering:
+            if not isinstance(term, str) or term == '?':
+                raise ValidationError({self.cursor_query_param: 'Cursor pagination needs a plain field ordering.'})
+            path = term.lstrip('-')
+            try:
+                field = resolve_field(model, path)
+            except FieldDoesNotExist:
+                # e.g. search_rank, which only exists for the one query
+                raise ValidationError({self.cursor_query_param: f'Cursor pagination cannot order by {path!r}; pass ?ordering=.'})
+            if field.is_relation:
+                # Order by the key itself, not by the related model's Meta.ordering
+                path = path[:len(path) - len(field.name)] + field.attname
+                field = field.target_field
+            keys.append(OrderingKey(path, field, term.startswith('-')))
+        if not any(key.field == model._meta.pk for key in keys):
+            descending = keys[-1].descending if keys else False
+            keys.append(OrderingKey('pk', model._meta.pk, descending))
+        return keys
+    
+    def keyset_queryset(self, queryset, position=None):
+        """The queryset in keyset order, from just after `position` (a value per key) if given"""
+        queryset = queryset.order_by(*[key.order_by() for key in self.keys])
+        return queryset if position is None else queryset.filter(self.after(position))
+    
+    def after(self, position):
+        """Rows after the position: (k1 beyond v1) OR (k1 = v1 AND k2 beyond v2) OR ..."""
+        q, prefix = Q(), Q()
+        for key, value in zip(self.keys, position):
+            beyond = key.beyond(value)
+            if beyond is not None:
+                q = beyond & prefix if not q else q | (beyond & prefix)
+            prefix &= key.equal(value)
+        if not q:
+            return Q(pk__in=[])
+        first, value = self.keys[0], position[0]
+        if value is not None and not first.nullable:
+            # The leading range bound on its own, so the planner starts the scan at the cursor
+            q &= Q(**{f"{first.path}__{'lte' if first.descending else 'gte'}": value})
+        return q
+    
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position, cls=CursorEncoder).encode()).decode()
+    
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError
+            return [None if value is None else key.field.to_python(value) for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, binascii.Error, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+
+def estimate_count(queryset):
+    """The planner's estimate of the queryset's row count, or None where there is none
+    
+    PostgreSQL: the top row estimate of EXPLAIN, which comes from the table
+    statistics ANALYZE keeps. SQLite has no row estimates; the table size
+    recorded by ANALYZE in sqlite_stat1 is used when the list is unfiltered.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of every stat row is the table's row count
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0].split()[0]) if row else None
+    return None
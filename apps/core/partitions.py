@@ -0,0 +1,335 @@
+import csv
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+
+# Append-only tables split by month of created_at
+PARTITIONED_MODELS = [
+    'customers.CustomerInteraction',
+    'leads.LeadActivity',
+    'deals.DealActivity',
+    'automation.AutomationLog',
+    'integrations.IntegrationLog',
+    'notifications.NotificationDelivery',
+]
+
+NULL = '\\N'
+PARTITION_SUFFIX = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return month.replace(year=month.year + years, month=index + 1)
+
+
+class PartitionedTable:
+    """One append-only table kept as monthly partitions of `column`
+    
+    On PostgreSQL the table is natively range-partitioned (see the core
+    migration that converts it); queries bounded on created_at are pruned to
+    the matching months, and a month is retired by detaching its partition.
+    Elsewhere the table stays a plain table and a month is retired by moving
+    its rows out. Either way the retired month ends up as one gzipped CSV
+    under ARCHIVE_ROOT, readable with ArchiveReader.
+    """
+    
+    def __init__(self, model, column='created_at'):
+        self.model = model
+        self.column = column
+    
+    @property
+    def table(self):
+        return self.model._meta.db_table
+    
+    def partition_name(self, month):
+        return f'{self.table}_p{month:%Y_%m}'
+    
+    def archive_path(self, month, root=None):
+        return os.path.join(root or settings.ARCHIVE_ROOT, self.table, f'{self.table}_{month:%Y_%m}.csv.gz')
+    
+    def columns(self):
+        return [field.column for field in self.model._meta.concrete_fields]
+    
+    # PostgreSQL partitions
+    
+    def is_partitioned(self, cursor):
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [self.table],
+        )
+        return cursor.fetchone() is not None
+    
+    def partitions(self, cursor):
+        """{month: partition name} of the monthly partitions currently attached"""
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s',
+            [self.table],
+        )
+        found = {}
+        for (name,) in cursor.fetchall():
+            match = PARTITION_SUFFIX.search(name)
+            if match:
+                found[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+        return found
+    
+    def create_partition(self, cursor, month):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.partition_name(month)} PARTITION OF {self.table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+    
+    def ensure_partitions(self, cursor, ahead=None):
+        """Create the partitions from the current month to `ahead` months out; returns the months created"""
+        ahead = settings.PARTITION_MONTHS_AHEAD if ahead is None else ahead
+        existing = self.partitions(cursor)
+        current = month_start(timezone.now())
+        created = []
+        for offset in range(ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                self.create_partition(cursor, month)
+                created.append(month)
+        return created
+    
+    def _definitions(self, cursor, table):
+        """(index definitions, [(name, foreign key definition)], primary key index name) of `table`"""
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid), indisprimary, indexrelid::regclass::text '
+            'FROM pg_index WHERE indrelid = %s::regclass',
+            [table],
+        )
+        indexes, primary_key = [], None
+        for definition, primary, name in cursor.fetchall():
+            if primary:
+                primary_key = name
+            else:
+                # A partitioned parent reports ON ONLY, which would skip the partitions
+                indexes.append(definition.replace(' ON ONLY ', ' ON ', 1))
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        return indexes, cursor.fetchall(), primary_key
+    
+    def _set_aside(self, cursor, table, renamed, foreign_keys, primary_key):
+        """Rename the table and strip the indexes and keys whose names the replacement reuses"""
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {renamed}')
+        cursor.execute(
+            'SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary', [renamed]
+        )
+        for (name,) in cursor.fetchall():
+            cursor.execute(f'DROP INDEX {name}')
+        for name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {renamed} DROP CONSTRAINT {name}')
+        if primary_key:
+            cursor.execute(f'ALTER INDEX {primary_key} RENAME TO {renamed}_pkey')
+    
+    def _restore(self, cursor, table, indexes, foreign_keys):
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    
+    def partition(self, cursor, ahead=None):
+        """Convert the plain table into a partitioned one, in place, keeping rows, indexes and keys
+        
+        PostgreSQL requires the partition key in the primary key, so it
+        becomes (id, created_at); ids keep coming from the same sequence.
+        """
+        table, legacy = self.table, f'{self.table}_unpartitioned'
+        if self.is_partitioned(cursor):
+            return
+        indexes, foreign_keys, primary_key = self._definitions(cursor, table)
+        cursor.execute(f'SELECT MIN({self.column}) FROM {table}')
+        oldest = cursor.fetchone()[0]
+        
+        self._set_aside(cursor, table, legacy, foreign_keys, primary_key)
+        # Identity columns can't live on a partitioned table before PostgreSQL 17; use a plain owned sequence
+        cursor.execute(f'ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ({self.column})'
+        )
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, {self.column})')
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {table}_id_seq')
+        cursor.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+        self._restore(cursor, table, indexes, foreign_keys)
+        
+        month = month_start(oldest) if oldest else month_start(timezone.now())
+        while month < month_start(timezone.now()):
+            self.create_partition(cursor, month)
+            month = add_months(month, 1)
+        self.ensure_partitions(cursor, ahead)
+        # Rows outside every monthly range (clock skew, hand-written timestamps) still need a home
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+        cursor.execute(f"SELECT setval('{table}_id_seq', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+        cursor.execute(f'DROP TABLE {legacy}')
+    
+    def unpartition(self, cursor):
+        """Turn the partitioned table back into a plain one with every row still attached"""
+        table, partitioned = self.table, f'{self.table}_partitioned'
+        if not self.is_partitioned(cursor):
+            return
+        indexes, foreign_keys, primary_key = self._definitions(cursor, table)
+        
+        self._set_aside(cursor, table, partitioned, foreign_keys, primary_key)
+        cursor.execute(f'CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+        cursor.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        self._restore(cursor, table, indexes, foreign_keys)
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {partitioned}')
+        cursor.execute(f'DROP TABLE {partitioned}')
+    
+    # Archival
+    
+    def archivable_months(self, before):
+        """Months wholly before `before` that still have live rows (or, on PostgreSQL, a partition)"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                if self.is_partitioned(cursor):
+                    return sorted(month for month in self.partitions(cursor) if month < before)
+        months = self.model._base_manager.filter(**{f'{self.column}__lt': before}).datetimes(
+            self.column, 'month', tzinfo=dt_timezone.utc
+        )
+        return list(months)
+    
+    def archive_month(self, month, root=None):
+        """Move one month out of the live table into its archive file; returns (path, rows)
+        
+        The file is written inside the same transaction that detaches the
+        partition or deletes the rows, so a failed write leaves the month live.
+        Deleting is a plain DELETE: no signals, so rollups keep their totals.
+        """
+        path = self.archive_path(month, root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = self.columns()
+        # 'x': an existing archive is never overwritten
+        archive = gzip.open(path, 'xt', newline='')
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    with archive:
+                        if connection.vendor == 'postgresql' and self.is_partitioned(cursor):
+                            rows = self._detach_to(cursor, month, columns, archive)
+                        else:
+                            rows = self._delete_to(cursor, month, columns, archive)
+        except BaseException:
+            archive.close()
+            os.remove(path)
+            raise
+        return path, rows
+    
+    def _detach_to(self, cursor, month, columns, archive):
+        partition = self.partition_name(month)
+        cursor.execute(f'ALTER TABLE {self.table} DETACH PARTITION {partition}')
+        cursor.execute(f'SELECT COUNT(*) FROM {partition}')
+        rows = cursor.fetchone()[0]
+        cursor.cursor.copy_expert(
+            f"COPY (SELECT {', '.join(columns)} FROM {partition} ORDER BY {self.column}, id) "
+            f"TO STDOUT WITH (FORMAT csv, HEADER, NULL '{NULL}')",
+            archive,
+        )
+        cursor.execute(f'DROP TABLE {partition}')
+        return rows
+    
+    def _delete_to(self, cursor, month, columns, archive):
+        fields = self.model._meta.concrete_fields
+        bounds = {f'{self.column}__gte': month, f'{self.column}__lt': add_months(month, 1)}
+        queryset = self.model._base_manager.filter(**bounds).order_by(self.column, 'pk')
+        writer = csv.writer(archive)
+        writer.writerow(columns)
+        rows = 0
+        for values in queryset.values_list(*[field.attname for field in fields]).iterator(chunk_size=5000):
+            writer.writerow([archive_value(field, value) for field, value in zip(fields, values)])
+            rows += 1
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'DELETE FROM {self.table} WHERE id IN ({sql})', params)
+        return rows
+
+
+def archive_value(field, value):
+    if value is None:
+        return NULL
+    if isinstance(field, models.JSONField):
+        return json.dumps(value)
+    if isinstance(field, models.BooleanField):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def partitioned_tables():
+    return [PartitionedTable(apps.get_model(label)) for label in PARTITIONED_MODELS]
+
+
+class ArchiveReader:
+    """Read archived months of a partitioned model back as dicts or unsaved instances"""
+    
+    def __init__(self, model, root=None):
+        self.partitioned = PartitionedTable(model)
+        self.model = model
+        self.root = root or settings.ARCHIVE_ROOT
+        self.fields = {field.column: field for field in model._meta.concrete_fields}
+    
+    def months(self):
+        directory = os.path.join(self.root, self.partitioned.table)
+        if not os.path.isdir(directory):
+            return []
+        pattern = re.compile(rf'^{re.escape(self.partitioned.table)}_(\d{{4}})_(\d{{2}})\.csv\.gz$')
+        found = []
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                found.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc))
+        return sorted(found)
+    
+    def rows(self, start=None, end=None, **equals):
+        """Archived rows with created_at in [start, end), oldest first, as {attname: value}
+        
+        Only the monthly files overlapping the range are opened. Keyword
+        arguments filter on equality, e.g. customer_id=42.
+        """
+        column = self.partitioned.column
+        for month in self.months():
+            if (end is not None and month >= end) or (start is not None and add_months(month, 1) <= start):
+                continue
+            with gzip.open(self.partitioned.archive_path(month, self.root), 'rt', newline='') as archive:
+                reader = csv.reader(archive)
+                header = [self.fields[name] for name in next(reader)]
+                for values in reader:
+                    row = {field.attname: self.to_python(field, value) for field, value in zip(header, values)}
+                    if (start is not None and row[column] < start) or (end is not None and row[column] >= end):
+                        continue
+                    if all(row.get(name) == value for name, value in equals.items()):
+                        yield row
+    
+    def instances(self, start=None, end=None, **equals):
+        for row in self.rows(start, end, **equals):
+            yield self.model(**row)
+    
+    def to_python(self, field, value):
+        if value == NULL:
+            return None
+        if isinstance(field, models.JSONField):
+            return json.loads(value)
+        value = field.to_python(value)
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value, dt_timezone.utc)
+        return value
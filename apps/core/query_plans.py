@@ -0,0 +1,56 @@
+import re
+
+from django.db import connection, transaction
+
+
+# Plan lines that mean rows are read without an index or sorted after the fact
+BAD_PLAN_LINES = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (\w+)$'), 'full table scan of {0}'),
+        (re.compile(r'USE TEMP B-TREE FOR (ORDER BY|RIGHT PART OF ORDER BY)'), 'sorts rows instead of reading them in index order'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan on (\w+)'), 'sequential scan of {0}'),
+        (re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b'), 'sorts rows instead of reading them in index order'),
+    ],
+}
+
+
+class PlanCheck:
+    """A hot query and the index its plan is expected to use"""
+    
+    def __init__(self, label, queryset, index=None):
+        self.label = label
+        self.queryset = queryset
+        self.index = index
+    
+    def explain(self):
+        """EXPLAIN the query; on PostgreSQL with seq scans and sorts priced out
+        
+        An empty or tiny development table makes the planner prefer a seq scan
+        whatever indexes exist, so the question asked there is whether an index
+        *can* serve the query, not whether it would win on this data.
+        """
+        if connection.vendor != 'postgresql':
+            return self.queryset.explain()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+            return self.queryset.explain()
+    
+    def problems(self, plan):
+        found = []
+        for line in plan.splitlines():
+            for pattern, message in BAD_PLAN_LINES.get(connection.vendor, []):
+                match = pattern.search(line.strip() if connection.vendor == 'sqlite' else line)
+                if match:
+                    found.append(message.format(*match.groups()))
+        if self.index and self.index not in plan:
+            found.append(f'does not use {self.index}')
+        return found
+    
+    def run(self):
+        """(plan, [problems]); no problems means the query is served by an index scan in index order"""
+        plan = self.explain()
+        return plan, self.problems(plan)
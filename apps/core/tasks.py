@@ -0,0 +1,8 @@
+from celery import shared_task
+from django.core.management import call_command
+
+
+@shared_task
+def archive_partitions():
+    """Nightly: keep future partitions ready and move months past retention to the archive"""
+    call_command('archive_partitions')
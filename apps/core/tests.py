@@ -0,0 +1,409 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.authentication import JWTAuthentication, RoleRefreshToken
+from apps.accounts.models import User
+from apps.customers.models import Customer, CustomerInteraction
+from apps.deals.models import Deal, DealActivity
+from apps.deals.signals import deal_activity_rollup
+from apps.tags.models import Tag
+from .activity import ACTIVITY_ROLLUPS
+from .db import pin_to_primary
+from .management.commands.check_query_plans import hot_queries
+from .middleware import ReadYourWritesMiddleware
+from .partitions import ArchiveReader, PartitionedTable, add_months, month_start
+from .query_plans import PlanCheck
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Two SQLite databases: the test database as primary and an empty file standing in for a lagging replica"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.mkdtemp()
+        replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3')}
+        configured = connections.configure_settings({'default': replica, 'replica': replica})
+        connections.settings['replica'] = configured['replica']
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Tag)
+    
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        os.remove(os.path.join(cls.replica_dir, 'replica.sqlite3'))
+        os.rmdir(cls.replica_dir)
+        super().tearDownClass()
+    
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        Tag.objects.create(name='vip')  # on the primary only
+    
+    def sees_write(self):
+        return Tag.objects.filter(name='vip').exists()
+    
+    def run_request(self, request, view):
+        return ReadYourWritesMiddleware(view)(request)
+    
+    def test_reads_outside_a_request_go_to_the_replica_unless_pinned(self):
+        self.assertFalse(self.sees_write())
+        with pin_to_primary():
+            self.assertTrue(self.sees_write())
+    
+    def test_writes_in_a_request_pin_its_later_reads(self):
+        seen = []
+        
+        def view(request):
+            seen.append(self.sees_write())
+            Tag.objects.create(name='new')
+            seen.append(self.sees_write())
+            return HttpResponse()
+        
+        self.run_request(self.factory.get('/'), view)
+        self.assertEqual(seen, [False, True])
+    
+    def test_cookie_pins_the_client_after_a_write(self):
+        def write(request):
+            Tag.objects.create(name='new')
+            return HttpResponse()
+        
+        def read(request):
+            return HttpResponse(str(self.sees_write()))
+        
+        response = self.run_request(self.factory.post('/'), write)
+        self.assertEqual(self.run_request(self.factory.get('/'), read).content, b'False')
+        request = self.factory.get('/')
+        request.COOKIES.update({name: morsel.value for name, morsel in response.cookies.items()})
+        self.assertEqual(self.run_request(request, read).content, b'True')
+    
+    def test_token_clients_are_pinned_by_user(self):
+        with pin_to_primary():
+            user = User.objects.create_user(email='ada@example.com', username='ada', password=None)
+            token = RoleRefreshToken.for_user(user).access_token
+        
+        def write(request):
+            request.user = user  # as DRF leaves it after authenticating
+            Tag.objects.create(name='new')
+            return HttpResponse()
+        
+        def read(request):
+            JWTAuthentication().authenticate(request)  # reads the user from the primary only because of the pin
+            return HttpResponse(str(self.sees_write()))
+        
+        self.run_request(self.factory.post('/'), write)
+        response = self.run_request(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'), read)
+        self.assertEqual(response.content, b'True')
+
+
+class SqliteConnectionTests(SimpleTestCase):
+    
+    def test_new_connections_get_the_pragmas(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory.name, 'tuned.sqlite3')}
+        settings_dict = connections.configure_settings({'default': database})['default']
+        connection = connections['default'].__class__(settings_dict, alias='tuned')
+        self.addCleanup(connection.close)
+        
+        with connection.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout']})
+
+
+class ExportTests(TestCase):
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        for n, status in enumerate(['active', 'active', 'prospect']):
+            Customer.objects.create(first_name='Ada', last_name=f'Number{n}', email=f'ada{n}@example.com', status=status, tags=['vip'])
+    
+    def export(self, **params):
+        response = self.client.get('/api/customers/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def test_csv_follows_the_list_filters(self):
+        response, body = self.export(status='active', ordering='-last_name')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['email'] for row in rows], ['ada1@example.com', 'ada0@example.com'])
+        self.assertEqual(rows[0]['tags'], '["vip"]')
+    
+    def test_gzipped_ndjson(self):
+        response, body = self.export(output='ndjson', gzip='1')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['tags'], ['vip'])
+    
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/customers/export/', {'output': 'xml'}).status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    """The plans check_query_plans reports on, enforced on every test run"""
+    
+    def test_hot_queries_are_served_by_their_indexes(self):
+        for check in hot_queries():
+            with self.subTest(check.label):
+                plan, problems = check.run()
+                self.assertEqual(problems, [], plan)
+    
+    def test_unindexed_sort_is_reported(self):
+        _, problems = PlanCheck('customers: by notes', Customer.objects.order_by('general_notes')[:25], 'customer_name_idx').run()
+        self.assertIn('does not use customer_name_idx', problems)
+        self.assertIn('sorts rows instead of reading them in index order', problems)
+
+
+class CursorPaginationTests(TestCase):
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        now = timezone.now()
+        for n in range(7):
+            # Repeated names and NULL dates, so the keyset has to fall back on its tiebreakers
+            Customer.objects.create(first_name='Ada', last_name=f'Name{n % 3}', email=f'ada{n}@example.com',
+                                    last_contact_date=now - timedelta(days=n) if n % 2 else None)
+    
+    def walk(self, **params):
+        emails, url, params = [], '/api/customers/', {'pagination': 'cursor', 'page_size': 2, **params}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            emails += [row['email'] for row in response.data['results']]
+            url, params = response.data['next'], {}
+        return emails
+    
+    def expected(self, *ordering):
+        return list(Customer.objects.order_by(*ordering).values_list('email', flat=True))
+    
+    def test_pages_follow_the_default_ordering(self):
+        self.assertEqual(self.walk(), self.expected('last_name', 'first_name', 'pk'))
+    
+    def test_pages_handle_nulls_in_either_direction(self):
+        self.assertEqual(self.walk(ordering='-last_contact_date'),
+                         self.expected(F('last_contact_date').desc(nulls_last=True), '-pk'))
+        self.assertEqual(self.walk(ordering='last_contact_date'),
+                         self.expected(F('last_contact_date').asc(nulls_last=True), 'pk'))
+    
+    def test_search_rank_ordering_is_refused(self):
+        response = self.client.get('/api/customers/', {'pagination': 'cursor', 'search': 'ada'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+    
+    def test_estimated_total_is_opt_in(self):
+        response = self.client.get('/api/customers/', {'pagination': 'cursor', 'count': 'estimate'})
+        self.assertIn('count_estimate', response.data)  # None on SQLite until ANALYZE has run
+    
+    def test_bad_cursor_is_refused(self):
+        self.assertEqual(self.client.get('/api/customers/', {'cursor': 'not-a-cursor'}).status_code, 400)
+    
+    def test_page_numbers_stay_the_default(self):
+        response = self.client.get('/api/customers/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 7)
+
+
+class ActivityRollupTests(TestCase):
+    
+    def setUp(self):
+        customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.deal = Deal.objects.create(name='Engines', customer=customer, value=1000, expected_close_date=timezone.now())
+        self.activities = [
+            DealActivity.objects.create(deal=self.deal, activity_type='call', subject=f'Call {n}', description='Notes')
+            for n in range(3)
+        ]
+    
+    def test_inserts_and_deletes_keep_the_rollup_current(self):
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.activity_count, 3)
+        self.assertEqual(self.deal.last_activity_date, self.activities[-1].created_at)
+        self.activities[0].delete()
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.activity_count, 2)
+        self.assertEqual(deal_activity_rollup.drift(), 0)
+    
+    def test_refresh_repairs_drifted_counters_and_dates(self):
+        Deal.objects.filter(pk=self.deal.pk).update(activity_count=1, last_activity_date=None)
+        self.assertEqual(deal_activity_rollup.drift(), 1)
+        self.assertEqual(deal_activity_rollup.refresh(), 1)
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.activity_count, 3)
+        self.assertEqual(self.deal.last_activity_date, self.activities[-1].created_at)
+        self.assertEqual(deal_activity_rollup.drift(), 0)
+    
+    def test_refresh_never_lowers_a_counter(self):
+        Deal.objects.filter(pk=self.deal.pk).update(activity_count=10)
+        self.assertEqual(deal_activity_rollup.drift(), 0)
+        self.assertEqual(deal_activity_rollup.refresh(), 0)
+        self.assertEqual(Deal.objects.values_list('activity_count', flat=True).get(), 10)
+    
+    def test_command_reports_then_repairs_drift(self):
+        Deal.objects.filter(pk=self.deal.pk).update(last_activity_date=self.activities[0].created_at - timedelta(days=1))
+        self.assertIn(deal_activity_rollup, ACTIVITY_ROLLUPS)
+        out = io.StringIO()
+        call_command('refresh_activity_rollups', '--dry-run', stdout=out)
+        self.assertIn('deals <- deal activities: 1 drifted', out.getvalue().lower())
+        self.assertEqual(deal_activity_rollup.drift(), 1)
+        
+        out = io.StringIO()
+        call_command('refresh_activity_rollups', stdout=out)
+        self.assertIn('refreshed 1 row(s)', out.getvalue())
+        self.assertEqual(Deal.objects.values_list('last_activity_date', flat=True).get(), self.activities[-1].created_at)
+
+
+class ArchivalTests(TestCase):
+    """Archiving by deleting rows, as on SQLite, and reading the months back"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.other = Customer.objects.create(first_name='Bob', last_name='Babbage', email='bob@example.com')
+        self.old = datetime(2020, 3, 1, tzinfo=dt_timezone.utc)
+        for n, customer in enumerate([self.customer, self.customer, self.other]):
+            interaction = CustomerInteraction.objects.create(
+                customer=customer, interaction_type='call', subject=f'Call {n}', description='Notes',
+                follow_up_required=bool(n % 2),
+            )
+            CustomerInteraction.objects.filter(pk=interaction.pk).update(created_at=self.old + timedelta(days=n))
+        self.recent = CustomerInteraction.objects.create(
+            customer=self.customer, interaction_type='email', subject='Recent', description='Notes'
+        )
+        self.table = PartitionedTable(CustomerInteraction)
+    
+    def test_old_months_move_to_their_archive_file(self):
+        self.assertEqual(self.table.archivable_months(month_start(timezone.now())), [self.old])
+        path, rows = self.table.archive_month(self.old, root=self.root)
+        self.assertEqual(rows, 3)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(list(CustomerInteraction.objects.values_list('pk', flat=True)), [self.recent.pk])
+        # A raw DELETE: the rollups keep counting the archived interactions
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.interaction_count, 3)
+    
+    def test_an_archived_month_is_never_overwritten(self):
+        self.table.archive_month(self.old, root=self.root)
+        with self.assertRaises(FileExistsError):
+            self.table.archive_month(self.old, root=self.root)
+    
+    def test_reader_filters_by_range_and_equality(self):
+        self.table.archive_month(self.old, root=self.root)
+        reader = ArchiveReader(CustomerInteraction, root=self.root)
+        self.assertEqual(reader.months(), [self.old])
+        rows = list(reader.rows(customer_id=self.customer.pk))
+        self.assertEqual([row['subject'] for row in rows], ['Call 0', 'Call 1'])
+        self.assertEqual([row['follow_up_required'] for row in rows], [False, True])
+        self.assertIsNone(rows[0]['follow_up_date'])
+        later = list(reader.instances(start=self.old + timedelta(days=1), end=self.old + timedelta(days=2)))
+        self.assertEqual([(row.subject, row.created_at) for row in later], [('Call 1', self.old + timedelta(days=1))])
+        self.assertEqual(list(reader.rows(end=self.old)), [])
+    
+    def test_command_dry_run_leaves_rows_in_place(self):
+        out = io.StringIO()
+        with override_settings(ARCHIVE_ROOT=self.root):
+            call_command('archive_partitions', '--dry-run', '--table', 'customers.CustomerInteraction', stdout=out)
+        self.assertIn('customer_interactions: would archive 2020-03', out.getvalue())
+        self.assertEqual(CustomerInteraction.objects.count(), 4)
+        self.assertEqual(os.listdir(self.root), [])
+    
+    def test_command_archives_past_retention(self):
+        out = io.StringIO()
+        with override_settings(ARCHIVE_ROOT=self.root):
+            call_command('archive_partitions', '--table', 'customers.CustomerInteraction', stdout=out)
+        self.assertIn('archived 2020-03, 3 row(s)', out.getvalue())
+        self.assertEqual(ArchiveReader(CustomerInteraction, root=self.root).months(), [self.old])
+    
+    def test_command_refuses_unknown_tables(self):
+        with self.assertRaisesMessage(CommandError, 'customers.Customer'):
+            call_command('archive_partitions', '--table', 'customers.Customer')
+        with self.assertRaises(CommandError):
+            call_command('archive_partitions', '--months', '0')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'monthly partitions are PostgreSQL only')
+class PartitionTests(TestCase):
+    """Converting a table to monthly partitions and detaching a month into the archive"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.table = PartitionedTable(CustomerInteraction)
+        self.old = add_months(month_start(timezone.now()), -14)
+        with connection.cursor() as cursor:
+            # Test databases are migrated, so start from the plain table the migration converted
+            self.table.unpartition(cursor)
+        interaction = CustomerInteraction.objects.create(
+            customer=self.customer, interaction_type='call', subject='Old', description='Notes'
+        )
+        CustomerInteraction.objects.filter(pk=interaction.pk).update(created_at=self.old + timedelta(days=2))
+    
+    def test_partition_keeps_rows_and_covers_the_months(self):
+        with connection.cursor() as cursor:
+            self.table.partition(cursor, ahead=2)
+            self.assertTrue(self.table.is_partitioned(cursor))
+            months = self.table.partitions(cursor)
+            self.assertIn(self.old, months)
+            self.assertIn(add_months(month_start(timezone.now()), 2), months)
+            self.assertEqual(self.table.ensure_partitions(cursor, ahead=3), [add_months(month_start(timezone.now()), 3)])
+            # Converting twice is a no-op
+            self.table.partition(cursor)
+        self.assertEqual(list(CustomerInteraction.objects.values_list('subject', flat=True)), ['Old'])
+        added = CustomerInteraction.objects.create(
+            customer=self.customer, interaction_type='email', subject='New', description='Notes'
+        )
+        self.assertGreater(added.pk, CustomerInteraction.objects.get(subject='Old').pk)
+    
+    def test_archiving_detaches_the_partition(self):
+        with connection.cursor() as cursor:
+            self.table.partition(cursor)
+        self.assertIn(self.old, self.table.archivable_months(month_start(timezone.now())))
+        path, rows = self.table.archive_month(self.old, root=self.root)
+        self.assertEqual(rows, 1)
+        with connection.cursor() as cursor:
+            self.assertNotIn(self.old, self.table.partitions(cursor))
+        self.assertFalse(CustomerInteraction.objects.exists())
+        archived = list(ArchiveReader(CustomerInteraction, root=self.root).instances(customer_id=self.customer.pk))
+        self.assertEqual([row.subject for row in archived], ['Old'])
+    
+    def test_unpartition_keeps_rows(self):
+        with connection.cursor() as cursor:
+            self.table.partition(cursor)
+            self.table.unpartition(cursor)
+            self.assertFalse(self.table.is_partitioned(cursor))
+        self.assertEqual(CustomerInteraction.objects.count(), 1)
@@ -7,7 +7,7 @@ class CustomerAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'email', 'company_name', 'status', 'created_at')
     list_filter = ('status', 'customer_type', 'industry', 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'company_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'interaction_count')
     fieldsets = (
         ('Basic Information', {
             'fields': ('first_name', 'last_name', 'email', 'phone')
@@ -32,7 +32,7 @@ class CustomerAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at', 'last_contact_date'),
+            'fields': ('created_at', 'updated_at', 'last_contact_date', 'interaction_count'),
             'classes': ('collapse',)
         }),
     )
@@ -0,0 +1,128 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CustomerSegment
+
+
+SEGMENT_BITMAP_KEY = 'customers:segment-bitmap:{segment_id}'
+# Incremental updates are read-modify-write on the cache; the timeout bounds
+# how long a lost update between concurrent writers can survive
+SEGMENT_BITMAP_TIMEOUT = 60 * 60
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def popcount(value):
+    return bin(value).count('1')
+
+
+class Bitmap:
+    """Compressed set of customer ids: one int bitset per 65536-id chunk, empty chunks omitted
+    
+    The same split roaring bitmaps use, so sparse segments stay small while
+    intersections only touch the chunks both sides populate.
+    """
+    
+    __slots__ = ('chunks',)
+    
+    def __init__(self, ids=()):
+        self.chunks = {}
+        self.update(ids)
+    
+    def update(self, ids):
+        chunks = self.chunks
+        for value in ids:
+            key = value >> CHUNK_BITS
+            chunks[key] = chunks.get(key, 0) | (1 << (value & CHUNK_MASK))
+    
+    def add(self, value):
+        self.update([value])
+    
+    def discard(self, value):
+        key = value >> CHUNK_BITS
+        chunk = self.chunks.get(key, 0) & ~(1 << (value & CHUNK_MASK))
+        if chunk:
+            self.chunks[key] = chunk
+        else:
+            self.chunks.pop(key, None)
+    
+    def __contains__(self, value):
+        return bool(self.chunks.get(value >> CHUNK_BITS, 0) >> (value & CHUNK_MASK) & 1)
+    
+    def __len__(self):
+        return sum(map(popcount, self.chunks.values()))
+    
+    def intersection_count(self, other):
+        small, large = sorted((self.chunks, other.chunks), key=len)
+        return sum(popcount(chunk & large[key]) for key, chunk in small.items() if key in large)
+
+
+def _build_bitmaps(segment_ids):
+    """Bitmaps for `segment_ids` from the membership table, in one streamed query"""
+    members = {segment_id: [] for segment_id in segment_ids}
+    memberships = (
+        CustomerSegment.customers.through.objects.filter(customersegment_id__in=list(segment_ids))
+        .values_list('customersegment_id', 'customer_id')
+    )
+    for segment_id, customer_id in memberships.iterator(chunk_size=10000):
+        members[segment_id].append(customer_id)
+    return {segment_id: Bitmap(ids) for segment_id, ids in members.items()}
+
+
+def get_segment_bitmaps(segment_ids):
+    """{segment id: Bitmap}, from the cache where possible; misses are built together and cached"""
+    keys = {SEGMENT_BITMAP_KEY.format(segment_id=segment_id): segment_id for segment_id in segment_ids}
+    cached = cache.get_many(list(keys))
+    bitmaps = {keys[key]: bitmap for key, bitmap in cached.items()}
+    missing = [segment_id for segment_id in segment_ids if segment_id not in bitmaps]
+    if missing:
+        built = _build_bitmaps(missing)
+        cache.set_many(
+            {SEGMENT_BITMAP_KEY.format(segment_id=segment_id): bitmap for segment_id, bitmap in built.items()},
+            timeout=SEGMENT_BITMAP_TIMEOUT,
+        )
+        bitmaps.update(built)
+    return bitmaps
+
+
+def segment_overlaps(segment_ids):
+    """Sizes and pairwise overlaps of the segments, computed from their bitmaps
+    
+    Returns ({id: size}, {(id, other id): overlap}) with each unordered pair
+    once; no SQL beyond building uncached bitmaps.
+    """
+    segment_ids = list(dict.fromkeys(segment_ids))
+    bitmaps = get_segment_bitmaps(segment_ids)
+    sizes = {segment_id: len(bitmaps[segment_id]) for segment_id in segment_ids}
+    overlaps = {}
+    for index, segment_id in enumerate(segment_ids):
+        for other_id in segment_ids[index + 1:]:
+            overlaps[(segment_id, other_id)] = bitmaps[segment_id].intersection_count(bitmaps[other_id])
+    return sizes, overlaps
+
+
+def _apply_changes(customer_id, added, removed):
+    keys = {SEGMENT_BITMAP_KEY.format(segment_id=segment_id): segment_id for segment_id in [*added, *removed]}
+    bitmaps = cache.get_many(list(keys))
+    if not bitmaps:
+        return
+    for key, bitmap in bitmaps.items():
+        if keys[key] in added:
+            bitmap.add(customer_id)
+        else:
+            bitmap.discard(customer_id)
+    cache.set_many(bitmaps, timeout=SEGMENT_BITMAP_TIMEOUT)
+
+
+def apply_membership_changes(customer_id, added=(), removed=()):
+    """Patch the cached bitmaps once the customer's membership changes commit"""
+    if added or removed:
+        transaction.on_commit(lambda: _apply_changes(customer_id, set(added), set(removed)))
+
+
+def invalidate_segment_bitmaps(segment_ids):
+    """Drop cached bitmaps after bulk membership changes; they are rebuilt on next use"""
+    keys = [SEGMENT_BITMAP_KEY.format(segment_id=segment_id) for segment_id in segment_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,264 @@
+import csv
+import io
+import json
+import logging
+import os
+
+import pandas as pd
+from django.core.validators import RegexValidator
+from django.db import connection, models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.dedupe.keys import KEY_FIELDS, blocking_keys
+from .models import Customer, CustomerSegment
+from .segments import EVALUATION_ERRORS, refresh_segment
+from .signals import customers_imported
+
+
+IMPORT_FIELDS = [
+    'first_name', 'last_name', 'email', 'phone', 'customer_type', 'status',
+    'company_name', 'job_title', 'industry', 'company_size',
+    'address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country',
+    'source', 'tags', 'general_notes', 'credit_limit', 'payment_terms',
+    'website', 'linkedin_url', 'twitter_handle', 'preferred_contact_method', 'last_contact_date',
+]
+# Maintained from the interactions (apps.customers.signals); an import only sets it on new customers
+INSERT_ONLY_FIELDS = ['last_contact_date']
+# Not a model field: resolved to `assigned_to` by user email
+OWNER_COLUMN = 'assigned_to_email'
+REQUIRED_FIELDS = ['first_name', 'last_name', 'email']
+TAG_SEPARATOR = ';'
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+URL_PATTERN = r'^https?://[^\s/$.?#][^\s]*$'
+PHONE_PATTERN = next(
+    validator.regex.pattern for validator in Customer._meta.get_field('phone').validators
+    if isinstance(validator, RegexValidator)
+)
+
+
+def _field(name):
+    return Customer._meta.get_field(name)
+
+
+def _decimal_limit(field):
+    return 10 ** (field.max_digits - field.decimal_places)
+
+
+class CustomerImporter:
+    """Stream a CSV of customers into the table in chunks, upserting on email
+    
+    Each chunk is validated and normalized column-wise with pandas, bad rows
+    are appended to the reject file with the reason, and the good ones are
+    upserted in one statement (COPY into a staging table plus INSERT ... ON
+    CONFLICT on PostgreSQL, bulk_create(update_conflicts=True) elsewhere).
+    Memory stays bounded by one chunk whatever the file size.
+    """
+    
+    def __init__(self, path, reject_path, chunk_size=10000, use_copy=True, progress=None):
+        self.path = path
+        self.reject_path = reject_path
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.progress = progress  # called with the running stats after every chunk
+        self.stats = {'processed': 0, 'created': 0, 'updated': 0, 'rejected': 0}
+    
+    def run(self):
+        if os.path.exists(self.reject_path):
+            os.remove(self.reject_path)
+        chunks = pd.read_csv(
+            self.path, dtype=str, keep_default_na=False, chunksize=self.chunk_size, skipinitialspace=True,
+        )
+        first_row = 1
+        for chunk in chunks:
+            # Row numbers as in the file (line 1 is the header)
+            chunk.index = range(first_row + 1, first_row + 1 + len(chunk))
+            first_row += len(chunk)
+            self.import_chunk(chunk)
+        self.refresh_segments()
+        return self.stats
+    
+    def import_chunk(self, chunk):
+        chunk.columns = [column.strip().lower() for column in chunk.columns]
+        missing = [field for field in REQUIRED_FIELDS if field not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+        columns = [field for field in IMPORT_FIELDS if field in chunk.columns]
+        
+        valid, errors = self.clean(chunk, columns)
+        self.reject(chunk, errors)
+        if len(valid):
+            with transaction.atomic():
+                valid = self.match_existing(valid)
+                created, updated, ids = (self.upsert_copy if self.use_copy else self.upsert_orm)(valid, columns)
+                customers_imported.send(sender=Customer, customer_ids=ids)
+            self.stats['created'] += created
+            self.stats['updated'] += updated
+        self.stats['processed'] += len(chunk)
+        self.stats['rejected'] += int(errors.ne('').sum())
+        if self.progress:
+            self.progress(dict(self.stats))
+    
+    def clean(self, chunk, columns):
+        """Normalize the chunk and return (valid rows, error per row with '' for good rows)"""
+        data = pd.DataFrame(index=chunk.index)
+        errors = pd.Series('', index=chunk.index)
+        
+        def fail(mask, message):
+            errors.loc[mask & errors.eq('')] = message
+        
+        for name in columns:
+            values = chunk[name].str.strip()
+            field = _field(name)
+            if name == 'email':
+                values = values.str.lower()
+                fail(~values.str.match(EMAIL_PATTERN), 'invalid email')
+            elif name == 'phone':
+                values = values.str.replace(r'[\s().-]', '', regex=True)
+                fail(values.ne('') & ~values.str.match(PHONE_PATTERN), 'invalid phone')
+            elif name == 'tags':
+                values = values.map(lambda value: [tag.strip() for tag in value.split(TAG_SEPARATOR) if tag.strip()])
+            elif field.choices:
+                values = values.str.lower().replace('', field.get_default())
+                fail(~values.isin([choice for choice, _ in field.choices]), f'invalid {name}')
+            elif isinstance(field, models.DecimalField):
+                values = pd.to_numeric(values.replace('', '0').str.replace(',', '', regex=False), errors='coerce')
+                fail(values.isna() | values.abs().ge(_decimal_limit(field)), f'invalid {name}')
+                values = values.round(field.decimal_places).where(values.notna(), 0)
+            elif isinstance(field, models.DateTimeField):
+                parsed = pd.to_datetime(values.replace('', None), errors='coerce', utc=True, format='ISO8601')
+                fail(values.ne('') & parsed.isna(), f'invalid {name}')
+                values = parsed.astype(object).where(parsed.notna(), None)
+            elif isinstance(field, models.URLField):
+                fail(values.ne('') & ~values.str.match(URL_PATTERN), f'invalid {name}')
+            
+            if isinstance(field, models.CharField):
+                fail(values.astype(str).str.len().gt(field.max_length), f'{name} too long')
+            data[name] = values
+        
+        for name in REQUIRED_FIELDS:
+            fail(data[name].eq(''), f'missing {name}')
+        
+        if OWNER_COLUMN in chunk.columns:
+            emails = chunk[OWNER_COLUMN].str.strip().str.lower()
+            owners = dict(User.objects.filter(email__in=set(emails) - {''}).values_list('email', 'id'))
+            owner_ids = emails.map(owners).astype('Int64')
+            fail(emails.ne('') & owner_ids.isna(), 'unknown owner')
+            data['assigned_to_id'] = owner_ids.astype(object).where(owner_ids.notna(), None)
+        
+        # The upsert can only touch each email once; the last row in the file wins
+        fail(data['email'].where(errors.eq('')).duplicated(keep='last'), 'superseded by a later row with the same email')
+        return data[errors.eq('')], errors
+    
+    def reject(self, chunk, errors):
+        rejected = chunk[errors.ne('')]
+        if not len(rejected):
+            return
+        rejected = rejected.assign(_error=errors[errors.ne('')])
+        rejected.insert(0, '_row', rejected.index)
+        header = not os.path.exists(self.reject_path)
+        rejected.to_csv(self.reject_path, mode='a', header=header, index=False, quoting=csv.QUOTE_MINIMAL)
+    
+    def match_existing(self, valid):
+        """Spell each email as its existing customer does, so the upsert's conflict on email finds them
+        
+        Incoming emails are lower-cased but stored ones may not be; where two
+        stored customers differ only in case, the older one is updated.
+        """
+        stored = {}
+        customers = Customer.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=valid['email'].tolist())
+        for email_lower, email in customers.order_by('-pk').values_list('email_lower', 'email'):
+            stored[email_lower] = email
+        if not stored:
+            return valid
+        return valid.assign(email=valid['email'].map(lambda email: stored.get(email, email)))
+    
+    def build(self, valid, columns):
+        """Customer instances for the rows, with the dedupe keys bulk writes would otherwise skip"""
+        fields = columns + (['assigned_to_id'] if 'assigned_to_id' in valid.columns else [])
+        now = timezone.now()
+        customers = []
+        for row in valid[fields].itertuples(index=False, name=None):
+            customer = Customer(**dict(zip(fields, row)), created_at=now, updated_at=now)
+            for key, value in blocking_keys(customer).items():
+                setattr(customer, key, value)
+            customers.append(customer)
+        return customers
+    
+    def update_fields(self, valid, columns):
+        fields = [column for column in columns if column != 'email' and column not in INSERT_ONLY_FIELDS]
+        fields += KEY_FIELDS + ['updated_at']
+        if 'assigned_to_id' in valid.columns:
+            fields.append('assigned_to')
+        return fields
+    
+    def upsert_orm(self, valid, columns):
+        customers = self.build(valid, columns)
+        emails = [customer.email for customer in customers]
+        updated = Customer.objects.filter(email__in=emails).count()
+        Customer.objects.bulk_create(
+            customers, update_conflicts=True, unique_fields=['email'],
+            update_fields=self.update_fields(valid, columns),
+        )
+        ids = list(Customer.objects.filter(email__in=emails).values_list('pk', flat=True))
+        return len(customers) - updated, updated, ids
+    
+    def upsert_copy(self, valid, columns):
+        """COPY the chunk into a temporary staging table, then one INSERT ... ON CONFLICT from it"""
+        customers = self.build(valid, columns)
+        table = Customer._meta.db_table
+        fields = [field for field in Customer._meta.concrete_fields if not field.primary_key]
+        names = [field.column for field in fields]
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for customer in customers:
+            writer.writerow([self.copy_value(field, getattr(customer, field.attname)) for field in fields])
+        buffer.seek(0)
+        
+        update = [_field(name).column for name in self.update_fields(valid, columns)]
+        with connection.cursor() as cursor:
+            # ON COMMIT DROP only fires on a real commit; inside an outer transaction the previous chunk's table is still there
+            cursor.execute("DROP TABLE IF EXISTS customer_import_staging")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE customer_import_staging ON COMMIT DROP AS "
+                f"SELECT {', '.join(names)} FROM {table} WITH NO DATA"
+            )
+            cursor.cursor.copy_expert(
+                f"COPY customer_import_staging ({', '.join(names)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(names)}) "
+                f"SELECT {', '.join(names)} FROM customer_import_staging "
+                f"ON CONFLICT (email) DO UPDATE SET {', '.join(f'{column} = EXCLUDED.{column}' for column in update)} "
+                f"RETURNING id, (xmax = 0)"
+            )
+            rows = cursor.fetchall()
+        created = sum(1 for _, inserted in rows if inserted)
+        return created, len(rows) - created, [pk for pk, _ in rows]
+    
+    def copy_value(self, field, value):
+        if value is None:
+            return '\\N'
+        if isinstance(field, models.JSONField):
+            return json.dumps(value)
+        if isinstance(field, models.BooleanField):
+            return 't' if value else 'f'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+    
+    def refresh_segments(self):
+        """Bulk writes skip the per-customer segment hook; recompute the rule-based segments once"""
+        for segment in CustomerSegment.objects.all():
+            if not segment.criteria:
+                continue
+            try:
+                refresh_segment(segment)
+            except EVALUATION_ERRORS:
+                logger.exception('Import %s: could not refresh segment %s', self.path, segment.pk)
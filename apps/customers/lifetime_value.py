@@ -0,0 +1,62 @@
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Customer
+from .segments import resegment_customers
+
+
+WON_STAGE = 'closed_won'
+
+
+def won_value(stage, value):
+    """What a deal contributes to its customer's lifetime value"""
+    return value if stage == WON_STAGE else 0
+
+
+def apply_lifetime_value_delta(customer_id, delta):
+    """Shift one customer's lifetime value with an atomic UPDATE ... SET lifetime_value = lifetime_value + delta"""
+    if customer_id is None or not delta:
+        return 0
+    updated = Customer.objects.filter(pk=customer_id).update(lifetime_value=F('lifetime_value') + delta)
+    if updated:
+        # The UPDATE sends no post_save; after commit, since the customer may yet be deleted in this transaction
+        transaction.on_commit(lambda: resegment_customers([customer_id], ('lifetime_value',)))
+    return updated
+
+
+def _totals_sql():
+    customers = Customer._meta.db_table
+    deals = Customer._meta.get_field('deals').related_model._meta.db_table
+    return (
+        f'SELECT c.id AS id, c.lifetime_value AS stored, ROUND(COALESCE(SUM(d.value), 0), 2) AS total '
+        f'FROM {customers} c LEFT JOIN {deals} d ON d.customer_id = c.id AND d.stage = %s '
+        f'GROUP BY c.id, c.lifetime_value'
+    )
+
+
+def lifetime_value_drift(limit=20):
+    """(drifted customers, summed absolute drift, [(id, stored, recomputed)] largest first)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(ABS(total - stored)), 0) FROM ({_totals_sql()}) w WHERE w.total <> w.stored',
+            [WON_STAGE],
+        )
+        count, drift = cursor.fetchone()
+        cursor.execute(
+            f'SELECT id, stored, total FROM ({_totals_sql()}) w WHERE w.total <> w.stored '
+            f'ORDER BY ABS(w.total - w.stored) DESC LIMIT %s',
+            [WON_STAGE, limit],
+        )
+        return count, drift, cursor.fetchall()
+
+
+def reconcile_lifetime_values():
+    """Recompute every drifted customer's lifetime value from its won deals in one grouped UPDATE ... FROM"""
+    customers = Customer._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {customers} SET lifetime_value = w.total FROM ({_totals_sql()}) w '
+            f'WHERE w.id = {customers}.id AND w.total <> w.stored',
+            [WON_STAGE],
+        )
+        return cursor.rowcount
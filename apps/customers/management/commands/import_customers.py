@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.db import pin_to_primary
+from apps.customers.imports import CustomerImporter
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV of customers into the database, upserting on email'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row (may be gzip/zip/bz2 compressed)')
+        parser.add_argument('--rejects', help='Where to write rejected rows (default: <path>.rejects.csv)')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        rejects = options['rejects'] or f"{options['path']}.rejects.csv"
+        started = time.perf_counter()
+        
+        def progress(stats):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{stats['processed']} rows: {stats['created']} created, {stats['updated']} updated, "
+                f"{stats['rejected']} rejected ({stats['processed'] / elapsed:.0f} rows/s)"
+            )
+        
+        importer = CustomerImporter(
+            options['path'], rejects, chunk_size=options['chunk_size'], use_copy=not options['no_copy'], progress=progress,
+        )
+        try:
+            stats = importer.run()
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        
+        if stats['rejected']:
+            self.stdout.write(f"Rejected rows written to {rejects}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created'] + stats['updated']} customers in {time.perf_counter() - started:.1f}s"
+        ))
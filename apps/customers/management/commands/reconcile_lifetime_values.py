@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.db import pin_to_primary
+from apps.customers.lifetime_value import lifetime_value_drift, reconcile_lifetime_values
+
+
+class Command(BaseCommand):
+    help = 'Report and fix customers whose lifetime value differs from the sum of their won deals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift')
+        parser.add_argument('--show', type=int, default=10, help='How many of the largest drifts to list')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count, drift, samples = lifetime_value_drift(limit=options['show'])
+        self.stdout.write(f'{count} customer(s) drifted, {drift} in total')
+        for customer_id, stored, total in samples:
+            self.stdout.write(f'  customer {customer_id}: stored {stored}, won deals {total}')
+        
+        if count and not options['dry_run']:
+            with transaction.atomic():
+                fixed = reconcile_lifetime_values()
+            self.stdout.write(self.style.SUCCESS(
+                f'Reconciled {fixed} customer(s) in {time.perf_counter() - started:.1f}s'
+            ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.db import pin_to_primary
+from apps.customers.models import CustomerSegment
+from apps.customers.segments import is_time_relative, refresh_segment
+
+
+class Command(BaseCommand):
+    help = 'Recompute the membership of rule-based customer segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segment', action='append', help='Only refresh these segments, by name (repeatable)')
+        parser.add_argument('--time-relative', action='store_true',
+                            help='Only refresh segments whose rules depend on the current date (for a periodic job)')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        segments = CustomerSegment.objects.order_by('name')
+        if options['segment']:
+            segments = segments.filter(name__in=options['segment'])
+            missing = set(options['segment']) - set(segments.values_list('name', flat=True))
+            if missing:
+                raise CommandError(f"Unknown segment(s): {', '.join(sorted(missing))}")
+        
+        refreshed = 0
+        for segment in segments:
+            if not segment.criteria or (options['time_relative'] and not is_time_relative(segment.criteria)):
+                continue
+            started = time.perf_counter()
+            try:
+                added, removed = refresh_segment(segment)
+            except ValidationError as exc:
+                self.stderr.write(f'{segment.name}: invalid criteria ({"; ".join(exc.messages)})')
+                continue
+            refreshed += 1
+            self.stdout.write(
+                f'{segment.name}: {added} added, {removed} removed in {time.perf_counter() - started:.2f}s'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} segment(s)'))
@@ -0,0 +1,89 @@
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Customer
+from .signals import customer_merged
+
+
+def related_fields(model=Customer):
+    """(model, field name) for every foreign key pointing at `model`, including M2M through tables"""
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            yield relation.through, relation.field.m2m_reverse_field_name()
+        else:
+            yield relation.related_model, relation.field.name
+
+
+def unique_sets(model, field_name):
+    """Unique field sets of `model` that include `field_name`"""
+    sets = [tuple(fields) for fields in model._meta.unique_together]
+    sets += [
+        tuple(constraint.fields) for constraint in model._meta.constraints
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields and constraint.condition is None
+    ]
+    if model._meta.get_field(field_name).unique:
+        sets.append((field_name,))
+    return [fields for fields in sets if field_name in fields]
+
+
+def resolve_unique_conflicts(model, field_name, target, source):
+    """Delete the source's rows that would collide with a target row once reparented (the target's row wins)"""
+    deleted = 0
+    for fields in unique_sets(model, field_name):
+        others = [field for field in fields if field != field_name]
+        clash = model._base_manager.filter(**{field_name: target.pk}, **{field: OuterRef(field) for field in others})
+        conflicting = model._base_manager.filter(**{field_name: source.pk}).filter(Exists(clash))
+        deleted += conflicting.delete()[0]
+    return deleted
+
+
+def merge_fields(target, source):
+    """Fold the source's attributes into the target"""
+    for field in Customer._meta.concrete_fields:
+        if isinstance(field, (models.CharField, models.TextField)) and field.editable and not getattr(target, field.attname):
+            setattr(target, field.attname, getattr(source, field.attname))
+    if target.assigned_to_id is None:
+        target.assigned_to_id = source.assigned_to_id
+    target.tags = list(dict.fromkeys(list(target.tags or []) + list(source.tags or [])))
+    # Denormalized values: the source's deals and history now belong to the target
+    target.lifetime_value += source.lifetime_value
+    target.interaction_count += source.interaction_count
+    target.created_at = min(target.created_at, source.created_at)
+    contact_dates = [date for date in (target.last_contact_date, source.last_contact_date) if date]
+    target.last_contact_date = max(contact_dates) if contact_dates else None
+
+
+def merge_customers(target, source):
+    """Merge `source` into `target` in one transaction and delete `source`
+    
+    Every row referencing the source (contacts, interactions, notes, deals,
+    tasks, notifications, insights, segment memberships, ...) is moved with one
+    set-based UPDATE per relation; nothing is loaded into Python except rows
+    that clash with a unique constraint on the target. Returns the number of
+    rows moved per related model.
+    """
+    if target.pk == source.pk:
+        raise ValidationError('A customer cannot be merged into itself.')
+    
+    with transaction.atomic():
+        # Lock both rows in a stable order so concurrent merges can't deadlock
+        locked = Customer.objects.select_for_update().filter(pk__in=[target.pk, source.pk]).order_by('pk')
+        locked = {customer.pk: customer for customer in locked}
+        if len(locked) != 2:
+            raise ValidationError('Both customers must exist.')
+        target, source = locked[target.pk], locked[source.pk]
+        
+        moved = {}
+        for model, field_name in related_fields():
+            resolve_unique_conflicts(model, field_name, target, source)
+            count = model._base_manager.filter(**{field_name: source.pk}).update(**{field_name: target.pk})
+            if count:
+                moved[model._meta.label] = count
+        
+        merge_fields(target, source)
+        source_id = source.pk
+        source.delete()
+        target.save()
+        customer_merged.send(sender=Customer, target=target, source_id=source_id)
+    return target, moved
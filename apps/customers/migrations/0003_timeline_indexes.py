@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_dedupe_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerinteraction',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='cust_interaction_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customernote',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='cust_note_timeline_idx'),
+        ),
+    ]
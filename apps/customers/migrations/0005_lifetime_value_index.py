@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_customer_imports'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='lifetime_value',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
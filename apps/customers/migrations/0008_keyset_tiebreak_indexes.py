@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_owner_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_owner_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_status_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='customer_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['assigned_to', 'last_name', 'first_name', 'id'], name='customer_owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['assigned_to', 'status', 'last_name', 'first_name', 'id'], name='customer_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['status', 'last_name', 'first_name', 'id'], name='customer_status_name_idx'),
+        ),
+    ]
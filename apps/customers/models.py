@@ -1,9 +1,11 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import RegexValidator
 from apps.accounts.models import User
+from apps.dedupe.keys import BlockingKeysMixin
 
 
-class Customer(models.Model):
+class Customer(BlockingKeysMixin, models.Model):
     """Main Customer model"""
     
     CUSTOMER_TYPE_CHOICES = [
@@ -55,7 +57,8 @@ class Customer(models.Model):
     general_notes = models.TextField(blank=True)
     
     # Financial Information
-    lifetime_value = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Sum of won deal values, kept current by apps.deals.signals
+    lifetime_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, db_index=True)
     credit_limit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_terms = models.CharField(max_length=50, blank=True)
     
@@ -73,13 +76,28 @@ class Customer(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    last_contact_date = models.DateTimeField(null=True, blank=True)
+    # Latest interaction and number of interactions, kept current by apps.customers.signals
+    last_contact_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    interaction_count = models.PositiveIntegerField(default=0)
+    
+    # Duplicate detection blocking keys (maintained by apps.dedupe)
+    email_canonical = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+    phone_e164 = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    name_key = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
     
     class Meta:
         db_table = 'customers'
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='customer_name_idx'),
+            models.Index(fields=['assigned_to', 'last_name', 'first_name', 'id'], name='customer_owner_name_idx'),
+            models.Index(fields=['assigned_to', 'status', 'last_name', 'first_name', 'id'], name='customer_owner_status_idx'),
+            models.Index(fields=['status', 'last_name', 'first_name', 'id'], name='customer_status_name_idx'),
+            # Imports match existing customers on the address whatever its case
+            models.Index(Lower('email'), name='customer_email_lower_idx'),
+        ]
     
     def __str__(self):
         if self.company_name:
@@ -151,6 +169,9 @@ class CustomerInteraction(models.Model):
         verbose_name = 'Customer Interaction'
         verbose_name_plural = 'Customer Interactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='cust_interaction_timeline_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.full_name} - {self.get_interaction_type_display()} - {self.subject}"
@@ -175,9 +196,15 @@ class CustomerSegment(models.Model):
     def __str__(self):
         return self.name
     
+    def clean(self):
+        from .segments import check_criteria
+        if self.criteria:
+            check_criteria(self.criteria)
+    
     @property
     def customer_count(self):
-        return self.customers.count()
+        from .bitmaps import get_segment_bitmaps
+        return len(get_segment_bitmaps([self.pk])[self.pk])
 
 
 class CustomerNote(models.Model):
@@ -196,6 +223,42 @@ class CustomerNote(models.Model):
         verbose_name = 'Customer Note'
         verbose_name_plural = 'Customer Notes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='cust_note_timeline_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.full_name} - {self.title}"
+
+
+class CustomerImport(models.Model):
+    """A bulk customer import run in the background, with its progress and rejected rows"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    file = models.FileField(upload_to='imports/customers/')
+    rejects = models.FileField(upload_to='imports/customers/rejects/', blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='customer_imports')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'customer_imports'
+        verbose_name = 'Customer Import'
+        verbose_name_plural = 'Customer Imports'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file.name} ({self.get_status_display()})"
@@ -0,0 +1,299 @@
+import logging
+from datetime import datetime, timedelta
+
+from django.core.exceptions import FieldError, ValidationError
+from django.db import DatabaseError, connection, models, transaction
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.utils import timezone
+
+from apps.tags.index import normalize_tag, sync_tags
+from apps.tags.models import TaggedItem
+from .bitmaps import apply_membership_changes, invalidate_segment_bitmaps
+from .models import Customer, CustomerSegment
+
+
+TEXT_OPS = {'eq', 'ne', 'in', 'not_in', 'contains', 'icontains', 'startswith', 'isnull'}
+ORDERED_OPS = {'eq', 'ne', 'in', 'not_in', 'gt', 'gte', 'lt', 'lte', 'between', 'isnull'}
+DATE_OPS = ORDERED_OPS | {'within_days', 'older_than_days'}
+TAG_OPS = {'has_tag', 'has_any_tag', 'has_all_tags'}
+LOOKUPS = {
+    'eq': 'exact', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte', 'in': 'in',
+    'contains': 'contains', 'icontains': 'icontains', 'startswith': 'startswith', 'between': 'range',
+}
+
+# Only predicates on these depend on the clock; membership drifts without the customer changing
+TIME_RELATIVE_OPS = {'within_days', 'older_than_days'}
+COMBINATORS = ('all', 'any', 'not')
+
+# What evaluating a stored rule can raise; one broken segment is skipped, never the save
+EVALUATION_ERRORS = (ValidationError, FieldError, DatabaseError, TypeError, ValueError)
+
+logger = logging.getLogger(__name__)
+
+
+def _segment_fields():
+    fields = {}
+    for field in Customer._meta.concrete_fields:
+        if field.primary_key or not field.editable or isinstance(field, models.JSONField):
+            continue
+        if isinstance(field, (models.DateTimeField, models.DateField)):
+            fields[field.name] = DATE_OPS
+        elif isinstance(field, (models.CharField, models.TextField)):
+            fields[field.name] = TEXT_OPS
+        else:
+            fields[field.name] = ORDERED_OPS
+    fields['tags'] = TAG_OPS
+    return fields
+
+
+SEGMENT_FIELDS = _segment_fields()
+
+
+def _tagged(names):
+    return TaggedItem.objects.filter(kind='customer', tag__name__in=names).values('object_id')
+
+
+def _coerce(field, value):
+    """The value as the field stores it, so a wrongly typed rule fails when compiled, not when run"""
+    target = Customer._meta.get_field(field)
+    try:
+        value = target.to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        raise ValidationError(f'{value!r} is not a valid value for {field!r}.')
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _compile_condition(condition):
+    field, op, value = condition.get('field'), condition.get('op'), condition.get('value')
+    if field not in SEGMENT_FIELDS:
+        raise ValidationError(f'Unknown segment field: {field!r}.')
+    if op not in SEGMENT_FIELDS[field]:
+        raise ValidationError(f'Operator {op!r} is not supported for {field!r}.')
+    
+    if op in TAG_OPS:
+        names = [value] if op == 'has_tag' else value
+        if not isinstance(names, list) or not names:
+            raise ValidationError(f'{op!r} needs a tag or a non-empty list of tags.')
+        names = [normalize_tag(name) for name in names]
+        if op == 'has_all_tags':
+            q = Q()
+            for name in names:
+                q &= Q(pk__in=_tagged([name]))
+            return q
+        return Q(pk__in=_tagged(names))
+    if op == 'isnull':
+        target = Customer._meta.get_field(field)
+        empty = Q(**{f'{field}__isnull': True})
+        if isinstance(target, (models.CharField, models.TextField)):
+            empty |= Q(**{field: ''})
+        return empty if value in (True, None) else ~empty
+    if op in TIME_RELATIVE_OPS:
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValidationError(f'{op!r} needs a non-negative number of days.')
+        cutoff = timezone.now() - timedelta(days=value)
+        return Q(**{f'{field}__gte': cutoff}) if op == 'within_days' else Q(**{f'{field}__lt': cutoff})
+    if op in ('in', 'not_in') and not isinstance(value, list):
+        raise ValidationError(f'{op!r} needs a list.')
+    if op == 'between' and not (isinstance(value, list) and len(value) == 2):
+        raise ValidationError("'between' needs a [low, high] pair.")
+    value = [_coerce(field, item) for item in value] if isinstance(value, list) else _coerce(field, value)
+    if op == 'ne':
+        return ~Q(**{field: value})
+    if op == 'not_in':
+        return ~Q(**{f'{field}__in': value})
+    return Q(**{f'{field}__{LOOKUPS[op]}': value})
+
+
+def compile_criteria(criteria):
+    """Compile a criteria dict to a Q over Customer, raising ValidationError on malformed rules
+    
+    Conditions nest with "all", "any" and "not"; leaves name a field, an
+    operator and a value::
+        
+        {"all": [
+            {"field": "status", "op": "in", "value": ["active", "prospect"]},
+            {"field": "lifetime_value", "op": "gte", "value": 10000},
+            {"any": [
+                {"field": "tags", "op": "has_tag", "value": "enterprise"},
+                {"not": {"field": "industry", "op": "isnull", "value": true}}
+            ]}
+        ]}
+    """
+    if not isinstance(criteria, dict) or not criteria:
+        raise ValidationError('Segment criteria must be a non-empty object.')
+    combinators = [key for key in COMBINATORS if key in criteria]
+    if len(combinators) > 1 or (combinators and 'field' in criteria):
+        raise ValidationError('A condition must be exactly one of "all", "any", "not" or a field rule.')
+    if 'all' in criteria or 'any' in criteria:
+        key = 'all' if 'all' in criteria else 'any'
+        children = criteria[key]
+        if not isinstance(children, list) or not children:
+            raise ValidationError(f'{key!r} needs a non-empty list of conditions.')
+        q = None
+        for child in map(compile_criteria, children):
+            q = child if q is None else (q & child if key == 'all' else q | child)
+        return q
+    if 'not' in criteria:
+        return ~compile_criteria(criteria['not'])
+    return _compile_condition(criteria)
+
+
+def check_criteria(criteria):
+    """Compile the criteria and run them once, so a rule is only stored if it can be evaluated"""
+    q = compile_criteria(criteria)
+    try:
+        with transaction.atomic():
+            Customer.objects.filter(q).exists()
+    except EVALUATION_ERRORS:
+        logger.info('Rejected segment criteria %r', criteria, exc_info=True)
+        raise ValidationError('These criteria cannot be evaluated.')
+    return q
+
+
+def uses_fields(criteria, names):
+    if isinstance(criteria, dict):
+        return criteria.get('field') in names or any(uses_fields(value, names) for value in criteria.values())
+    if isinstance(criteria, list):
+        return any(uses_fields(value, names) for value in criteria)
+    return False
+
+
+def uses_tags(criteria):
+    return uses_fields(criteria, ('tags',))
+
+
+def is_time_relative(criteria):
+    if isinstance(criteria, dict):
+        return criteria.get('op') in TIME_RELATIVE_OPS or any(is_time_relative(value) for value in criteria.values())
+    if isinstance(criteria, list):
+        return any(is_time_relative(value) for value in criteria)
+    return False
+
+
+def rule_segments(segments=None):
+    """(id, criteria) of the segments whose membership is computed from criteria
+    
+    Segments with empty criteria are curated by hand and left alone.
+    """
+    if segments is None:
+        segments = CustomerSegment.objects.values_list('id', 'criteria')
+    return [(segment_id, criteria) for segment_id, criteria in segments if criteria]
+
+
+def _matching(customer_id, predicates):
+    """Ids of the segments in `predicates` ({segment id: CASE}) the customer matches, or None if it is gone"""
+    # In a savepoint: on PostgreSQL a failed query would otherwise abort the caller's transaction
+    with transaction.atomic():
+        row = (
+            Customer.objects.filter(pk=customer_id)
+            .annotate(**{f'segment_{segment_id}': case for segment_id, case in predicates.items()})
+            .values(*[f'segment_{segment_id}' for segment_id in predicates])
+            .first()
+        )
+    if row is None:
+        return None
+    return {int(key[len('segment_'):]) for key, matched in row.items() if matched}
+
+
+def update_customer_segments(customer, segments=None):
+    """Re-evaluate one customer against the rule-based segments and fix its memberships
+    
+    `segments` limits the work to those (id, criteria) pairs; by default every
+    rule-based segment is evaluated.
+    All predicates are evaluated in a single SELECT (one CASE per segment) and
+    the current memberships read in another; only the difference is written.
+    A segment whose rule fails to compile or to run is logged and left as it
+    is. Returns (added segment ids, removed segment ids).
+    """
+    segments = rule_segments(segments)
+    if not segments:
+        return [], []
+    if any(uses_tags(criteria) for _, criteria in segments):
+        # Tag predicates read the tag index, which may not have seen this save yet
+        sync_tags('customer', [(customer.pk, customer.tags)])
+    
+    predicates = {}
+    for segment_id, criteria in segments:
+        try:
+            predicates[segment_id] = Case(
+                When(compile_criteria(criteria), then=Value(True)), default=Value(False), output_field=BooleanField()
+            )
+        except ValidationError as exc:
+            logger.warning('Skipping segment %s, invalid criteria: %s', segment_id, '; '.join(exc.messages))
+    if not predicates:
+        return [], []
+    evaluated = list(predicates)
+    try:
+        matching = _matching(customer.pk, predicates)
+    except EVALUATION_ERRORS:
+        # Evaluate one segment at a time to leave out the broken ones
+        matching, evaluated = set(), []
+        for segment_id, predicate in predicates.items():
+            try:
+                matched = _matching(customer.pk, {segment_id: predicate})
+            except EVALUATION_ERRORS:
+                logger.exception('Skipping segment %s, its criteria failed to evaluate', segment_id)
+                continue
+            if matched is None:
+                return [], []
+            matching |= matched
+            evaluated.append(segment_id)
+    if matching is None:
+        return [], []
+    
+    Membership = CustomerSegment.customers.through
+    current = set(
+        Membership.objects.filter(customer_id=customer.pk, customersegment_id__in=evaluated)
+        .values_list('customersegment_id', flat=True)
+    )
+    added, removed = sorted(matching - current), sorted(current - matching)
+    if added:
+        Membership.objects.bulk_create(
+            [Membership(customersegment_id=segment_id, customer_id=customer.pk) for segment_id in added],
+            ignore_conflicts=True,
+        )
+    if removed:
+        Membership.objects.filter(customer_id=customer.pk, customersegment_id__in=removed).delete()
+    apply_membership_changes(customer.pk, added, removed)
+    return added, removed
+
+
+def resegment_customers(customer_ids, fields):
+    """Re-evaluate only the segments whose rules read `fields`, for those of the customers that still exist
+    
+    For writes that send no post_save, such as UPDATEs with F() expressions.
+    """
+    segments = [(segment_id, criteria) for segment_id, criteria in rule_segments() if uses_fields(criteria, fields)]
+    if not segments:
+        return
+    for customer in Customer.objects.only('id', 'tags').filter(pk__in=customer_ids):
+        update_customer_segments(customer, segments)
+
+
+def refresh_segment(segment):
+    """Recompute a rule-based segment's membership with two set-based statements
+    
+    Members that no longer match are deleted and new matches inserted with
+    INSERT ... SELECT, so the customers never travel to Python however big the
+    segment is. Returns (added, removed).
+    """
+    matches = Customer.objects.filter(compile_criteria(segment.criteria))
+    Membership = CustomerSegment.customers.through
+    members = Membership.objects.filter(customersegment_id=segment.pk)
+    
+    with transaction.atomic():
+        removed, _ = members.exclude(customer_id__in=matches.values('pk')).delete()
+        new = matches.exclude(pk__in=members.values('customer_id')).values('pk')
+        sql, params = new.query.get_compiler(connection=connection).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {Membership._meta.db_table} (customersegment_id, customer_id) '
+                f'SELECT %s, matched.id FROM ({sql}) matched',
+                [segment.pk, *params],
+            )
+            added = cursor.rowcount
+    if added or removed:
+        invalidate_segment_bitmaps([segment.pk])
+    return added, removed
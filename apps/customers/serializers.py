@@ -0,0 +1,67 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from .models import Customer, CustomerImport, CustomerSegment
+from .segments import check_criteria
+
+
+class CustomerSerializer(serializers.ModelSerializer):
+    """Serializer for Customer model"""
+    
+    full_name = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Customer
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
+            'customer_type', 'status', 'company_name', 'job_title', 'industry', 'company_size',
+            'address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country',
+            'assigned_to', 'source', 'tags', 'general_notes',
+            'lifetime_value', 'credit_limit', 'payment_terms',
+            'website', 'linkedin_url', 'twitter_handle', 'preferred_contact_method',
+            'created_at', 'updated_at', 'last_contact_date', 'interaction_count'
+        ]
+        # lifetime_value is maintained from won deals (see apps.customers.lifetime_value),
+        # interaction_count from the interactions themselves
+        read_only_fields = ['id', 'created_at', 'updated_at', 'lifetime_value', 'interaction_count']
+
+
+class CustomerMergeSerializer(serializers.Serializer):
+    """Customer to merge into the one addressed by the URL"""
+    
+    source_id = serializers.IntegerField(min_value=1)
+
+
+class CustomerSegmentSerializer(serializers.ModelSerializer):
+    """Serializer for CustomerSegment model; empty criteria make a hand-curated segment"""
+    
+    customer_count = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = CustomerSegment
+        fields = ['id', 'name', 'description', 'criteria', 'customer_count', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+    
+    def get_customer_count(self, segment):
+        # A list page passes every row's size in, from one batch of bitmaps
+        sizes = self.context.get('segment_sizes') or {}
+        return sizes[segment.pk] if segment.pk in sizes else segment.customer_count
+    
+    def validate_criteria(self, value):
+        if value:
+            try:
+                check_criteria(value)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(exc.messages)
+        return value
+
+
+class CustomerImportSerializer(serializers.ModelSerializer):
+    """Serializer for CustomerImport model; only the file is writable"""
+    
+    class Meta:
+        model = CustomerImport
+        fields = [
+            'id', 'file', 'status', 'processed', 'created', 'updated', 'rejected', 'error',
+            'created_by', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [field for field in fields if field != 'file']
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from apps.core.activity import ActivityRollup
+from .bitmaps import apply_membership_changes, invalidate_segment_bitmaps
+from .models import Customer, CustomerInteraction, CustomerSegment
+from .segments import refresh_segment, resegment_customers, update_customer_segments
+
+
+# Sent inside the merge transaction once `source_id` has been merged into
+# `target` and deleted; receivers fix up data that refers to customers
+# without a foreign key
+customer_merged = Signal()
+
+# Sent inside each import chunk's transaction with the ids of the customers
+# that chunk created or updated in bulk (no post_save is sent for them)
+customers_imported = Signal()
+
+
+@receiver(post_save, sender=Customer)
+def update_segment_memberships(sender, instance, raw=False, **kwargs):
+    """Re-evaluate the saved customer against the rule-based segments"""
+    if not raw:
+        update_customer_segments(instance)
+
+
+@receiver(post_save, sender=CustomerSegment)
+def refresh_segment_members(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Recompute a rule-based segment's members whenever it is saved"""
+    if raw or not instance.criteria or (update_fields is not None and 'criteria' not in update_fields):
+        return
+    transaction.on_commit(lambda: refresh_segment(instance))
+
+
+@receiver(m2m_changed, sender=CustomerSegment.customers.through)
+def invalidate_changed_segment_bitmaps(sender, instance, action, reverse, pk_set, **kwargs):
+    """Hand-edited memberships (admin, segment.customers.add(), ...)"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_segment_bitmaps([instance.pk])
+    elif pk_set:
+        invalidate_segment_bitmaps(pk_set)
+    else:
+        # customer.segments.clear(): the affected segments are already gone from the table
+        invalidate_segment_bitmaps(CustomerSegment.objects.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Customer)
+def drop_deleted_customer_from_bitmaps(sender, instance, **kwargs):
+    apply_membership_changes(instance.pk, removed=list(instance.segments.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=CustomerSegment)
+def drop_deleted_segment_bitmap(sender, instance, **kwargs):
+    invalidate_segment_bitmaps([instance.pk])
+
+
+@receiver(customer_merged)
+def invalidate_merged_segment_bitmaps(sender, target, source_id, **kwargs):
+    """The source's memberships were moved to the target by a bulk UPDATE"""
+    invalidate_segment_bitmaps(target.segments.values_list('pk', flat=True))
+
+
+def resegment_contacted_customers(customer_ids):
+    """The rollup's UPDATE sends no post_save; once committed, re-evaluate the segments that filter on what it changed"""
+    transaction.on_commit(lambda: resegment_customers(customer_ids, ('last_contact_date', 'interaction_count')))
+
+
+interaction_rollup = ActivityRollup(
+    CustomerInteraction, 'customer', 'last_contact_date', 'interaction_count',
+    on_update=resegment_contacted_customers,
+).connect()
@@ -0,0 +1,36 @@
+import logging
+import os
+
+from celery import shared_task
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from apps.core.db import pin_to_primary
+from .imports import CustomerImporter
+from .models import CustomerImport
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+@pin_to_primary()
+def run_customer_import(import_id):
+    """Run a queued CustomerImport, recording progress on the row after every chunk"""
+    customer_import = CustomerImport.objects.get(pk=import_id)
+    imports = CustomerImport.objects.filter(pk=import_id)
+    imports.update(status='running', started_at=timezone.now())
+    
+    rejects_name = f'imports/customers/rejects/{import_id}.csv'
+    rejects_path = default_storage.path(rejects_name)
+    os.makedirs(os.path.dirname(rejects_path), exist_ok=True)
+    importer = CustomerImporter(customer_import.file.path, rejects_path, progress=lambda stats: imports.update(**stats))
+    try:
+        importer.run()
+    except Exception as exc:
+        logger.exception('Customer import %s failed', import_id)
+        imports.update(status='failed', error=str(exc), finished_at=timezone.now())
+        return
+    imports.update(
+        status='completed', finished_at=timezone.now(),
+        rejects=rejects_name if os.path.exists(rejects_path) else '',
+    )
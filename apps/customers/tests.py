@@ -0,0 +1,351 @@
+import csv
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.automation.models import Notification
+from apps.core.query_plans import PlanCheck
+from apps.deals.models import Deal, DealActivity
+from apps.leads.models import Lead, LeadActivity
+from . import bitmaps, segments
+from .imports import CustomerImporter, _field
+from .merge import merge_customers
+from .models import Customer, CustomerContact, CustomerInteraction, CustomerSegment
+from .segments import compile_criteria
+from .timeline import TIMELINE_SOURCES, TIMELINE_SOURCES_BY_KIND, customer_timeline
+
+
+def make_customer(email='ada@example.com', **fields):
+    return Customer.objects.create(first_name='Ada', last_name='Lovelace', email=email, **fields)
+
+
+def api_client():
+    admin = User.objects.create_superuser(
+        email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+    return client
+
+
+class CompileCriteriaTests(TestCase):
+    """Malformed rules are rejected when compiled, before they reach a query"""
+    
+    def test_wrongly_typed_value_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            compile_criteria({'field': 'lifetime_value', 'op': 'gte', 'value': 'abc'})
+    
+    def test_list_values_are_coerced_one_by_one(self):
+        with self.assertRaises(ValidationError):
+            compile_criteria({'field': 'lifetime_value', 'op': 'between', 'value': [1, 'z']})
+        compile_criteria({'field': 'lifetime_value', 'op': 'between', 'value': ['1', '2.5']})
+    
+    def test_all_and_any_together_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            compile_criteria({
+                'all': [{'field': 'status', 'op': 'eq', 'value': 'active'}],
+                'any': [{'field': 'status', 'op': 'eq', 'value': 'prospect'}],
+            })
+    
+    def test_combinator_next_to_a_field_rule_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            compile_criteria({'field': 'status', 'op': 'eq', 'value': 'active', 'not': {'field': 'city', 'op': 'isnull'}})
+
+
+class SegmentMembershipTests(TestCase):
+    
+    def setUp(self):
+        # Stored without validation, as a rule saved before it was checked would be
+        self.bad = CustomerSegment.objects.bulk_create([
+            CustomerSegment(name='Broken', criteria={'field': 'lifetime_value', 'op': 'gte', 'value': 'abc'}),
+        ])[0]
+        self.active = CustomerSegment.objects.create(
+            name='Active', criteria={'field': 'status', 'op': 'eq', 'value': 'active'}
+        )
+    
+    def test_bad_segment_does_not_block_saving_customers(self):
+        with self.assertLogs('apps.customers.segments', 'WARNING'):
+            customer = make_customer(status='active')
+        self.assertEqual(list(customer.segments.all()), [self.active])
+        
+        customer.status = 'inactive'
+        with self.assertLogs('apps.customers.segments', 'WARNING'):
+            customer.save()
+        self.assertFalse(customer.segments.exists())
+    
+    def test_segment_failing_at_query_time_is_skipped(self):
+        broken = CustomerSegment.objects.create(name='Prospects', criteria={'field': 'status', 'op': 'eq', 'value': 'prospect'})
+        matching = segments._matching
+        
+        def fail_on_broken(customer_id, predicates):
+            if broken.pk in predicates:
+                raise DatabaseError('boom')
+            return matching(customer_id, predicates)
+        
+        with mock.patch.object(segments, '_matching', side_effect=fail_on_broken), self.assertLogs('apps.customers.segments'):
+            customer = make_customer(status='active')
+        self.assertEqual(list(customer.segments.all()), [self.active])
+
+
+class CustomerSegmentApiTests(TestCase):
+    
+    def setUp(self):
+        self.client = api_client()
+        cache.clear()  # cached bitmaps outlive the test database rows
+    
+    def test_criteria_that_cannot_be_evaluated_are_rejected(self):
+        response = self.client.post('/api/customer-segments/', {
+            'name': 'Big spenders', 'criteria': {'field': 'lifetime_value', 'op': 'gte', 'value': 'abc'},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('criteria', response.data)
+        self.assertFalse(CustomerSegment.objects.exists())
+    
+    def test_list_builds_the_page_bitmaps_once(self):
+        make_customer(status='active')
+        for status in ('active', 'prospect', 'inactive'):
+            with self.captureOnCommitCallbacks(execute=True):
+                CustomerSegment.objects.create(name=status, criteria={'field': 'status', 'op': 'eq', 'value': status})
+        
+        build = bitmaps._build_bitmaps
+        with mock.patch.object(bitmaps, '_build_bitmaps', side_effect=build) as built:
+            response = self.client.get('/api/customer-segments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(built.call_count, 1)
+        self.assertEqual({row['name']: row['customer_count'] for row in response.data['results']},
+                         {'active': 1, 'inactive': 0, 'prospect': 0})
+
+
+class CustomerMergeTests(TestCase):
+    
+    def setUp(self):
+        self.target = make_customer('ada@example.com', tags=['vip'])
+        self.source = make_customer('ada.l@example.com', tags=['trial'], general_notes='Prefers email')
+        self.segment = CustomerSegment.objects.create(name='Hand-picked')
+        self.segment.customers.add(self.target, self.source)
+    
+    def test_related_rows_move_and_clashes_keep_the_target_row(self):
+        CustomerContact.objects.create(customer=self.target, first_name='Kept', last_name='Contact', email='same@example.com')
+        CustomerContact.objects.create(customer=self.source, first_name='Dropped', last_name='Contact', email='same@example.com')
+        CustomerContact.objects.create(customer=self.source, first_name='Moved', last_name='Contact', email='other@example.com')
+        for _ in range(3):
+            CustomerInteraction.objects.create(customer=self.source, interaction_type='call', subject='Call', description='')
+        Deal.objects.create(customer=self.source, name='Licence', value=Decimal('250.00'), stage='closed_won',
+                            expected_close_date=timezone.now())
+        
+        target, moved = merge_customers(self.target, self.source)
+        self.assertEqual(moved['customers.CustomerInteraction'], 3)
+        self.assertFalse(Customer.objects.filter(pk=self.source.pk).exists())
+        self.assertEqual(set(target.contacts.values_list('first_name', flat=True)), {'Kept', 'Moved'})
+        self.assertEqual(list(self.segment.customers.all()), [target])
+        
+        target.refresh_from_db()
+        self.assertEqual(target.interaction_count, 3)
+        self.assertEqual(target.lifetime_value, Decimal('250.00'))
+        self.assertEqual(target.tags, ['vip', 'trial'])
+        self.assertEqual(target.general_notes, 'Prefers email')
+    
+    def test_customer_cannot_be_merged_into_itself(self):
+        with self.assertRaises(ValidationError):
+            merge_customers(self.target, self.target)
+    
+    def test_merge_endpoint(self):
+        client = api_client()
+        response = client.post(f'/api/customers/{self.target.pk}/merge/', {'source_id': self.source.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['customer']['id'], self.target.pk)
+        response = client.post(f'/api/customers/{self.target.pk}/merge/', {'source_id': self.source.pk}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class CustomerTimelineTests(TestCase):
+    
+    def setUp(self):
+        self.customer = make_customer()
+        self.user = User.objects.create_user(email='rep@example.com', username='rep', password=None)
+        self.other = User.objects.create_user(email='other@example.com', username='other', password=None)
+        self.start = timezone.now() - timedelta(days=30)
+    
+    def at(self, obj, days):
+        type(obj)._base_manager.filter(pk=obj.pk).update(created_at=self.start + timedelta(days=days))
+        return obj
+    
+    def deal_activity(self, deal, days):
+        return self.at(DealActivity.objects.create(deal=deal, activity_type='call', subject=f'{deal.name} day {days}', description=''), days)
+    
+    def test_deal_activities_are_merged_across_deals_and_pages(self):
+        deals = [Deal.objects.create(customer=self.customer, name=name, value=0, expected_close_date=timezone.now()) for name in ('A', 'B')]
+        for days in range(6):
+            self.deal_activity(deals[days % 2], days)
+        lead = Lead.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com', converted_to_customer=self.customer)
+        self.at(LeadActivity.objects.create(lead=lead, activity_type='email', subject='lead day 2.5', description=''), 2.5)
+        
+        subjects, after = [], None
+        while True:
+            entries, after = customer_timeline(self.customer, self.user, 3, after=after, kinds={'deal_activity', 'lead_activity'})
+            subjects += [entry['title'] for entry in entries]
+            if after is None:
+                break
+        self.assertEqual(subjects, ['B day 5', 'A day 4', 'B day 3', 'lead day 2.5', 'A day 2', 'B day 1', 'A day 0'])
+    
+    def test_activity_queries_use_the_per_parent_index(self):
+        for kind, index in (('deal_activity', 'deal_activity_timeline_idx'), ('lead_activity', 'lead_activity_timeline_idx')):
+            source = TIMELINE_SOURCES_BY_KIND[kind]
+            queryset = source.queryset({source.customer_field: self.customer.pk}, self.user,
+                                       after=(timezone.now(), kind, 10))[:21]
+            plan, problems = PlanCheck(f'timeline: {kind}', queryset, index).run()
+            # Joined through the parent, the customer's activities are sorted rather than read in order
+            self.assertNotIn(f'does not use {index}', problems, plan)
+            self.assertFalse([problem for problem in problems if problem.startswith(('full table scan', 'sequential scan'))], plan)
+    
+    def test_a_page_costs_one_query_per_source(self):
+        for n in range(5):
+            deal = Deal.objects.create(customer=self.customer, name=f'Deal {n}', value=0, expected_close_date=timezone.now())
+            self.deal_activity(deal, n)
+            lead = Lead.objects.create(first_name='Ada', last_name=f'Lead {n}', email=f'ada{n}@example.com', converted_to_customer=self.customer)
+            LeadActivity.objects.create(lead=lead, activity_type='email', subject=f'lead {n}', description='')
+        with self.assertNumQueries(len(TIMELINE_SOURCES)):
+            entries, after = customer_timeline(self.customer, self.user, 4)
+        self.assertEqual(len(entries), 4)
+        self.assertIsNotNone(after)
+    
+    def test_only_the_users_own_notifications_are_shown(self):
+        for recipient in (self.user, self.other):
+            Notification.objects.create(customer=self.customer, recipient=recipient, title=f'For {recipient.username}',
+                                        message='', notification_type='info', channel='in_app')
+        entries, _ = customer_timeline(self.customer, self.user, 10, kinds={'notification'})
+        self.assertEqual([entry['title'] for entry in entries], ['For rep'])
+
+
+class CustomerImportTests(TestCase):
+    
+    HEADER = 'first_name,last_name,email,phone,status,tags,credit_limit,assigned_to_email\n'
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.owner = User.objects.create_user(email='rep@example.com', username='rep', password=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.active = CustomerSegment.objects.create(name='Active', criteria={'field': 'status', 'op': 'eq', 'value': 'active'})
+    
+    def run_import(self, rows, **options):
+        path = os.path.join(self.directory.name, 'customers.csv')
+        with open(path, 'w') as handle:
+            handle.write(self.HEADER + ''.join(f'{row}\n' for row in rows))
+        rejects = os.path.join(self.directory.name, 'rejects.csv')
+        stats = CustomerImporter(path, rejects, **options).run()
+        rejected = {}
+        if os.path.exists(rejects):
+            with open(rejects, newline='') as handle:
+                rejected = {int(row['_row']): row['_error'] for row in csv.DictReader(handle)}
+        return stats, rejected
+    
+    def test_valid_rows_are_upserted_and_bad_ones_rejected(self):
+        stats, rejected = self.run_import([
+            'Ada,Lovelace, ADA@Example.com ,+44 (20) 7946-0958,Active,vip; founder,"1,500.50",rep@example.com',
+            'Bad,Email,not-an-email,,active,,,',
+            'Grace,Hopper,grace@example.com,,retired,,,',
+            'Alan,Turing,alan@example.com,,,,,nobody@example.com',
+            'Old,Row,mary@example.com,,,,,',
+            'Mary,Somerville,mary@example.com,,prospect,,,',
+        ], chunk_size=2, use_copy=False)
+        self.assertEqual(stats, {'processed': 6, 'created': 2, 'updated': 0, 'rejected': 4})
+        self.assertEqual(rejected, {
+            3: 'invalid email', 4: 'invalid status', 5: 'unknown owner',
+            6: 'superseded by a later row with the same email',
+        })
+        
+        ada = Customer.objects.get(email='ada@example.com')
+        self.assertEqual((ada.phone, ada.tags, ada.credit_limit, ada.assigned_to), ('+442079460958', ['vip', 'founder'], Decimal('1500.50'), self.owner))
+        self.assertEqual(ada.email_canonical, 'ada@example.com')  # dedupe keys are filled in
+        self.assertEqual(list(self.active.customers.all()), [ada])
+    
+    def test_rerun_updates_existing_customers(self):
+        self.run_import(['Ada,Lovelace,ada@example.com,,prospect,,,'], use_copy=False)
+        stats, _ = self.run_import(['Ada,King,ada@example.com,,active,,,'], use_copy=False)
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        ada = Customer.objects.get()
+        self.assertEqual(ada.last_name, 'King')
+        self.assertTrue(self.active.customers.filter(pk=ada.pk).exists())
+    
+    def test_existing_email_in_another_case_is_updated(self):
+        ada = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='Ada@Example.com')
+        stats, _ = self.run_import(['Ada,King,ADA@example.com,,active,,,'], use_copy=False)
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        ada.refresh_from_db()
+        self.assertEqual((ada.email, ada.last_name), ('Ada@Example.com', 'King'))
+        self.assertEqual(Customer.objects.count(), 1)
+    
+    def test_rerun_leaves_the_last_contact_date_alone(self):
+        self.HEADER = 'first_name,last_name,email,last_contact_date\n'
+        self.run_import(['Ada,Lovelace,ada@example.com,2024-01-02'], use_copy=False)
+        ada = Customer.objects.get()
+        self.assertEqual(ada.last_contact_date, datetime(2024, 1, 2, tzinfo=dt_timezone.utc))
+        contacted = datetime(2024, 6, 1, tzinfo=dt_timezone.utc)
+        Customer.objects.filter(pk=ada.pk).update(last_contact_date=contacted)
+        self.run_import(['Ada,King,ada@example.com,2023-01-01'], use_copy=False)
+        ada.refresh_from_db()
+        self.assertEqual((ada.last_name, ada.last_contact_date), ('King', contacted))
+    
+    def test_copy_values(self):
+        importer = CustomerImporter('unused.csv', 'unused.rejects.csv')
+        self.assertEqual(importer.copy_value(_field('tags'), ['a', 'b']), '["a", "b"]')
+        self.assertEqual(importer.copy_value(_field('email'), None), '\\N')
+        self.assertEqual(importer.copy_value(_field('last_contact_date'), datetime(2024, 1, 2, tzinfo=dt_timezone.utc)),
+                         '2024-01-02T00:00:00+00:00')
+    
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is PostgreSQL only')
+    def test_copy_path_matches_the_orm_path(self):
+        self.run_import(['Ada,Lovelace,ada@example.com,,prospect,,,'])
+        stats, rejected = self.run_import([
+            'Ada,King,ada@example.com,,active,vip;founder,10,rep@example.com',
+            'Grace,Hopper,grace@example.com,,,,,',
+            'Bad,Email,not-an-email,,,,,',
+        ], chunk_size=2)
+        self.assertEqual(stats, {'processed': 3, 'created': 1, 'updated': 1, 'rejected': 1})
+        self.assertEqual(rejected, {4: 'invalid email'})
+        ada = Customer.objects.get(email='ada@example.com')
+        self.assertEqual((ada.last_name, ada.tags, ada.assigned_to), ('King', ['vip', 'founder'], self.owner))
+        self.assertEqual(list(self.active.customers.all()), [ada])
+
+
+class InteractionRollupSegmentTests(TestCase):
+    
+    def setUp(self):
+        self.customer = make_customer(status='active')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contacted = CustomerSegment.objects.create(
+                name='Contacted', criteria={'field': 'interaction_count', 'op': 'gte', 'value': 1}
+            )
+            self.active = CustomerSegment.objects.create(name='Active', criteria={'field': 'status', 'op': 'eq', 'value': 'active'})
+    
+    def log_call(self):
+        return CustomerInteraction.objects.create(customer=self.customer, interaction_type='call', subject='Call', description='')
+    
+    def test_only_segments_on_rollup_columns_are_reevaluated_after_commit(self):
+        with mock.patch.object(segments, 'update_customer_segments', wraps=segments.update_customer_segments) as update:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.log_call()
+            update.assert_not_called()
+            self.assertFalse(self.contacted.customers.exists())
+            
+            for callback in callbacks:
+                callback()
+        update.assert_called_once_with(mock.ANY, [(self.contacted.pk, self.contacted.criteria)])
+        self.assertTrue(self.contacted.customers.filter(pk=self.customer.pk).exists())
+    
+    def test_nothing_is_reevaluated_without_such_segments(self):
+        self.contacted.delete()
+        with mock.patch.object(segments, 'update_customer_segments') as update, self.captureOnCommitCallbacks(execute=True):
+            self.log_call()
+        update.assert_not_called()
@@ -0,0 +1,114 @@
+import heapq
+from itertools import islice
+
+from django.db.models import F, Q
+
+from apps.automation.models import Notification, Task
+from apps.deals.models import Deal, DealActivity
+from apps.leads.models import Lead, LeadActivity
+from .models import CustomerInteraction, CustomerNote
+
+
+def entry_key(entry):
+    """Merge order of (created_at, kind, id, row) entries"""
+    return entry[:3]
+
+
+class TimelineSource:
+    """One kind of timeline entry: how to select a customer's rows and render them"""
+    
+    def __init__(self, kind, model, customer_field, fields, render, visible=None):
+        self.kind = kind
+        self.model = model
+        self.customer_field = customer_field
+        self.fields = fields  # values() columns needed by render
+        self.render = render  # values row -> dict of title, summary, subtype, user
+        self.visible = visible  # user -> Q restricting the rows that user may see
+    
+    def queryset(self, lookup, user, after=None):
+        """The matching rows newest first, strictly past the cursor, as one indexed range scan"""
+        queryset = self.model._base_manager.filter(**lookup)
+        if self.visible is not None:
+            queryset = queryset.filter(self.visible(user))
+        if after is not None:
+            created_at, kind, pk = after
+            # Ties on created_at are broken by kind, then id, all descending
+            if self.kind < kind:
+                queryset = queryset.filter(created_at__lte=created_at)
+            elif self.kind > kind:
+                queryset = queryset.filter(created_at__lt=created_at)
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        return queryset.order_by('-created_at', '-pk').values('pk', 'created_at', *self.fields)
+    
+    def stream(self, customer, user, after, limit):
+        for row in self.queryset({self.customer_field: customer.pk}, user, after)[:limit].iterator():
+            yield row['created_at'], self.kind, row['pk'], row
+
+
+class ChildTimelineSource(TimelineSource):
+    """Entries hanging off another of the customer's records, such as a deal's activities
+    
+    One query joins through the parent. The rows are found per parent on the
+    (parent, created_at, id) index, so only the customer's own activities
+    are read, and they are sorted in that query rather than read in index order.
+    """
+    
+    def __init__(self, kind, model, parent_field, parent_customer_field, fields, render, parent_values=None, visible=None):
+        super().__init__(kind, model, f'{parent_field}__{parent_customer_field}', fields, render, visible=visible)
+        self.parent_field = parent_field
+        self.parent_values = parent_values or {}  # row key -> parent column copied onto each row
+    
+    def queryset(self, lookup, user, after=None):
+        parent_values = {key: F(f'{self.parent_field}__{column}') for key, column in self.parent_values.items()}
+        return super().queryset(lookup, user, after).values('pk', 'created_at', *self.fields, **parent_values)
+
+
+TIMELINE_SOURCES = [
+    TimelineSource('interaction', CustomerInteraction, 'customer', ['interaction_type', 'subject', 'outcome', 'user_id'],
+                   lambda row: {'title': row['subject'], 'summary': row['outcome'], 'subtype': row['interaction_type'], 'user': row['user_id']}),
+    TimelineSource('note', CustomerNote, 'customer', ['title', 'content', 'user_id'],
+                   lambda row: {'title': row['title'], 'summary': row['content'][:200], 'subtype': 'note', 'user': row['user_id']},
+                   visible=lambda user: Q(is_private=False) | Q(user=user.pk)),
+    TimelineSource('deal', Deal, 'customer', ['name', 'stage', 'value', 'assigned_to_id'],
+                   lambda row: {'title': row['name'], 'summary': f"{row['stage']} ({row['value']})", 'subtype': row['stage'], 'user': row['assigned_to_id']}),
+    ChildTimelineSource('deal_activity', DealActivity, 'deal', 'customer', ['activity_type', 'subject', 'outcome', 'user_id'],
+                        lambda row: {'title': row['subject'], 'summary': f"{row['deal_name']}: {row['outcome']}".rstrip(': '), 'subtype': row['activity_type'], 'user': row['user_id']},
+                        parent_values={'deal_name': 'name'}),
+    TimelineSource('lead', Lead, 'converted_to_customer', ['first_name', 'last_name', 'status', 'source', 'assigned_to_id'],
+                   lambda row: {'title': f"{row['first_name']} {row['last_name']}".strip(), 'summary': row['source'], 'subtype': row['status'], 'user': row['assigned_to_id']}),
+    ChildTimelineSource('lead_activity', LeadActivity, 'lead', 'converted_to_customer', ['activity_type', 'subject', 'outcome', 'user_id'],
+                        lambda row: {'title': row['subject'], 'summary': row['outcome'], 'subtype': row['activity_type'], 'user': row['user_id']}),
+    TimelineSource('task', Task, 'customer', ['title', 'status', 'task_type', 'assigned_to_id'],
+                   lambda row: {'title': row['title'], 'summary': row['status'], 'subtype': row['task_type'], 'user': row['assigned_to_id']}),
+    TimelineSource('notification', Notification, 'customer', ['title', 'message', 'notification_type', 'recipient_id'],
+                   lambda row: {'title': row['title'], 'summary': row['message'][:200], 'subtype': row['notification_type'], 'user': row['recipient_id']},
+                   visible=lambda user: Q(recipient=user.pk)),
+]
+
+TIMELINE_SOURCES_BY_KIND = {source.kind: source for source in TIMELINE_SOURCES}
+
+
+def customer_timeline(customer, user, page_size, after=None, kinds=None):
+    """One page of the customer's history across every source, newest first
+    
+    Each source contributes at most page_size + 1 rows from one query, so a
+    page costs one query per source however many deals or leads the customer
+    has. Direct sources read their (customer, created_at) index in order;
+    activity sources join through their deal or lead. The streams are k-way
+    merged on (created_at, kind, id). Notifications are limited to those
+    addressed to the user. Returns (entries, cursor of the last entry or None).
+    """
+    sources = [source for source in TIMELINE_SOURCES if kinds is None or source.kind in kinds]
+    streams = [source.stream(customer, user, after, page_size + 1) for source in sources]
+    merged = list(islice(heapq.merge(*streams, key=entry_key, reverse=True), page_size + 1))
+    
+    entries = [
+        {'type': kind, 'id': pk, 'created_at': created_at, **TIMELINE_SOURCES_BY_KIND[kind].render(row)}
+        for created_at, kind, pk, row in merged[:page_size]
+    ]
+    next_after = None
+    if len(merged) > page_size:
+        created_at, kind, pk, _ = merged[page_size - 1]
+        next_after = (created_at, kind, pk)
+    return entries, next_after
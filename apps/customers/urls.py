@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import CustomerViewSet, CustomerImportViewSet, CustomerSegmentViewSet
+
+router = DefaultRouter()
+router.register(r'customers', CustomerViewSet)
+router.register(r'customer-segments', CustomerSegmentViewSet)
+router.register(r'customer-imports', CustomerImportViewSet)
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
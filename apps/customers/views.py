@@ -0,0 +1,186 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import FileResponse
+from rest_framework import mixins, viewsets, status, permissions
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from apps.accounts.hierarchy import scope_to_user
+from apps.accounts.permissions import HasRolePermission
+from apps.core.exports import ExportMixin
+from apps.dedupe.views import DuplicateCheckMixin
+from .bitmaps import get_segment_bitmaps, segment_overlaps
+from .merge import merge_customers
+from .models import Customer, CustomerImport, CustomerSegment
+from .serializers import CustomerSerializer, CustomerImportSerializer, CustomerMergeSerializer, CustomerSegmentSerializer
+from .tasks import run_customer_import
+from .timeline import TIMELINE_SOURCES_BY_KIND, customer_timeline
+
+
+class CustomerViewSet(DuplicateCheckMixin, ExportMixin, viewsets.ModelViewSet):
+    """ViewSet for Customer model"""
+    
+    queryset = Customer.objects.all()
+    serializer_class = CustomerSerializer
+    permission_classes = [permissions.IsAuthenticated, HasRolePermission]
+    permission_model = 'customer'
+    dedupe_kind = 'customer'
+    required_permissions = {'merge': ['change_customer', 'delete_customer'], 'timeline': 'view_customer'}
+    filterset_fields = {
+        'status': ['exact'], 'customer_type': ['exact'], 'industry': ['exact'], 'assigned_to': ['exact'],
+        'last_contact_date': ['lt', 'gte', 'isnull'],
+    }
+    search_fields = ['first_name', 'last_name', 'email', 'company_name']
+    ordering_fields = ['last_name', 'created_at', 'lifetime_value', 'last_contact_date', 'interaction_count']
+    ordering = ['last_name', 'first_name']
+    MAX_TIMELINE_PAGE_SIZE = 100
+    
+    def get_queryset(self):
+        """Filter queryset based on user permissions"""
+        return scope_to_user(Customer.objects.all(), self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Merge the customer `source_id` into this one and delete it"""
+        target = self.get_object()
+        serializer = CustomerMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        source = self.get_queryset().filter(pk=serializer.validated_data['source_id']).first()
+        if source is None:
+            return Response({'error': 'Source customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            target, moved = merge_customers(target, source)
+        except DjangoValidationError as exc:
+            raise ValidationError({'source_id': exc.messages})
+        return Response({'customer': CustomerSerializer(target).data, 'moved': moved})
+    
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """The customer's interactions, notes, deals, leads, activities, tasks and notifications, newest first
+        
+        ?type= optional comma-separated entry types, ?page_size= up to
+        MAX_TIMELINE_PAGE_SIZE, ?cursor= the `next` value of the previous page.
+        """
+        customer = self.get_object()
+        kinds = None
+        if request.query_params.get('type'):
+            kinds = {kind.strip() for kind in request.query_params['type'].split(',') if kind.strip()}
+            unknown = sorted(kinds - set(TIMELINE_SOURCES_BY_KIND))
+            if unknown:
+                raise ValidationError({'type': f"Unknown type(s): {', '.join(unknown)}."})
+        try:
+            page_size = max(1, min(int(request.query_params.get('page_size', 20)), self.MAX_TIMELINE_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be an integer.'})
+        
+        entries, after = customer_timeline(
+            customer, request.user, page_size, after=self.decode_cursor(request.query_params.get('cursor')), kinds=kinds
+        )
+        return Response({'results': entries, 'next': self.encode_cursor(after) if after else None})
+    
+    def encode_cursor(self, after):
+        created_at, kind, pk = after
+        return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), kind, pk]).encode()).decode()
+    
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, kind, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = datetime.fromisoformat(created_at)
+            return created_at, str(kind), int(pk)
+        except (ValueError, TypeError, binascii.Error):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+class CustomerSegmentViewSet(viewsets.ModelViewSet):
+    """ViewSet for CustomerSegment model"""
+    
+    queryset = CustomerSegment.objects.all()
+    serializer_class = CustomerSegmentSerializer
+    permission_classes = [permissions.IsAuthenticated, HasRolePermission]
+    permission_model = 'customer'
+    required_permissions = {'analytics': 'view_customer'}
+    search_fields = ['name', 'description']
+    ordering_fields = ['name', 'created_at']
+    ordering = ['name']
+    MAX_ANALYTICS_SEGMENTS = 100
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+    
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Sizes for the whole page from one get_segment_bitmaps call, not one per row
+            segments = list(args[0])
+            bitmaps = get_segment_bitmaps([segment.pk for segment in segments])
+            kwargs['context'] = {
+                **self.get_serializer_context(),
+                'segment_sizes': {segment_id: len(bitmap) for segment_id, bitmap in bitmaps.items()},
+            }
+            args = (segments, *args[1:])
+        return super().get_serializer(*args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Sizes and pairwise overlaps of ?ids= (default: all segments) from the cached membership bitmaps"""
+        segments = CustomerSegment.objects.order_by('name')
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                ids = [int(segment_id) for segment_id in ids.split(',') if segment_id.strip()]
+            except ValueError:
+                raise ValidationError({'ids': 'Must be a comma-separated list of segment ids.'})
+            segments = segments.filter(pk__in=ids)
+        names = dict(segments.values_list('pk', 'name')[:self.MAX_ANALYTICS_SEGMENTS + 1])
+        if len(names) > self.MAX_ANALYTICS_SEGMENTS:
+            raise ValidationError({'ids': f'At most {self.MAX_ANALYTICS_SEGMENTS} segments at a time.'})
+        
+        sizes, overlaps = segment_overlaps(list(names))
+        return Response({
+            'segments': [{'id': pk, 'name': name, 'size': sizes[pk]} for pk, name in names.items()],
+            'overlaps': [
+                {
+                    'segments': [left, right],
+                    'overlap': overlap,
+                    'jaccard': round(overlap / (sizes[left] + sizes[right] - overlap), 4) if overlap else 0.0,
+                }
+                for (left, right), overlap in overlaps.items()
+            ],
+        })
+
+
+class CustomerImportViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                            viewsets.GenericViewSet):
+    """Upload a customer CSV to import in the background, then poll it for progress"""
+    
+    queryset = CustomerImport.objects.all()
+    serializer_class = CustomerImportSerializer
+    parser_classes = [MultiPartParser]
+    permission_classes = [permissions.IsAuthenticated, HasRolePermission]
+    required_permissions = {
+        action: ['add_customer', 'change_customer'] for action in ('list', 'retrieve', 'create', 'rejects')
+    }
+    filterset_fields = ['status']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        return scope_to_user(CustomerImport.objects.all(), self.request.user, field='created_by')
+    
+    def perform_create(self, serializer):
+        customer_import = serializer.save(created_by=self.request.user)
+        transaction.on_commit(lambda: run_customer_import.delay(customer_import.pk))
+    
+    @action(detail=True, methods=['get'])
+    def rejects(self, request, pk=None):
+        """The rejected rows as CSV, with their line number and reason"""
+        customer_import = self.get_object()
+        if not customer_import.rejects:
+            return Response({'error': 'No rejected rows'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(customer_import.rejects.open('rb'), as_attachment=True, filename=f'import-{pk}-rejects.csv')
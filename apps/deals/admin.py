@@ -7,7 +7,7 @@ class DealAdmin(admin.ModelAdmin):
     list_display = ('name', 'customer', 'stage', 'value', 'probability', 'expected_close_date', 'assigned_to')
     list_filter = ('stage', 'probability', 'expected_close_date', 'created_at')
     search_fields = ('name', 'customer__first_name', 'customer__last_name', 'customer__company_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'activity_count')
 
 
 @admin.register(DealActivity)
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='deal_customer_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealactivity',
+            index=models.Index(fields=['deal', '-created_at', '-id'], name='deal_activity_timeline_idx'),
+        ),
+    ]
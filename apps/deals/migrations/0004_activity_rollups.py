@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0003_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='activity_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='deal',
+            name='last_activity_date',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0004_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['-created_at'], name='deal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='deal_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['assigned_to', 'stage', '-created_at'], name='deal_owner_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['stage', '-created_at'], name='deal_stage_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('stage__in', ['closed_won', 'closed_lost']), _negated=True), fields=['assigned_to', 'expected_close_date'], name='deal_open_owner_close_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_owner_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_owner_stage_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_stage_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['-created_at', '-id'], name='deal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['assigned_to', '-created_at', '-id'], name='deal_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['assigned_to', 'stage', '-created_at', '-id'], name='deal_owner_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['stage', '-created_at', '-id'], name='deal_stage_created_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from apps.accounts.models import User
 from apps.customers.models import Customer
 from apps.leads.models import Lead
@@ -52,17 +52,37 @@ class Deal(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    last_activity_date = models.DateTimeField(null=True, blank=True)
+    # Latest activity and number of activities, kept current by apps.deals.signals
+    last_activity_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    activity_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         db_table = 'deals'
         verbose_name = 'Deal'
         verbose_name_plural = 'Deals'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='deal_customer_timeline_idx'),
+            models.Index(fields=['-created_at', '-id'], name='deal_created_idx'),
+            models.Index(fields=['assigned_to', '-created_at', '-id'], name='deal_owner_created_idx'),
+            models.Index(fields=['assigned_to', 'stage', '-created_at', '-id'], name='deal_owner_stage_idx'),
+            models.Index(fields=['stage', '-created_at', '-id'], name='deal_stage_created_idx'),
+            # The pipeline view: open deals per owner, closing soonest first
+            models.Index(
+                fields=['assigned_to', 'expected_close_date'], name='deal_open_owner_close_idx',
+                condition=~models.Q(stage__in=['closed_won', 'closed_lost']),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.customer.full_name}"
     
+    def save(self, *args, **kwargs):
+        # The lifetime value signals (apps.deals.signals) lock the stored row in pre_save
+        # and apply the delta in post_save; both must run in the transaction of the write
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
     @property
     def weighted_value(self):
         """Calculate weighted value based on probability"""
@@ -117,6 +137,9 @@ class DealActivity(models.Model):
         verbose_name = 'Deal Activity'
         verbose_name_plural = 'Deal Activities'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['deal', '-created_at', '-id'], name='deal_activity_timeline_idx'),
+        ]
     
     def __str__(self):
         return f"{self.deal.name} - {self.get_activity_type_display()} - {self.subject}"
@@ -0,0 +1,19 @@
+from rest_framework import serializers
+from .models import Deal
+
+
+class DealSerializer(serializers.ModelSerializer):
+    """Serializer for Deal model"""
+    
+    weighted_value = serializers.ReadOnlyField()
+    is_closed = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Deal
+        fields = [
+            'id', 'name', 'description', 'stage', 'priority', 'value', 'probability',
+            'weighted_value', 'is_closed', 'expected_close_date', 'actual_close_date',
+            'customer', 'lead', 'assigned_to', 'source', 'tags', 'notes',
+            'competitors', 'risks', 'created_at', 'updated_at', 'last_activity_date', 'activity_count'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at', 'activity_count']
@@ -0,0 +1,72 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.core.activity import ActivityRollup
+from apps.customers.lifetime_value import apply_lifetime_value_delta, won_value
+from apps.customers.models import Customer
+from .models import Deal, DealActivity
+
+
+# The fields a deal's contribution to lifetime value depends on
+WON_FIELDS = {'customer', 'customer_id', 'stage', 'value'}
+
+
+def touches_won_value(update_fields):
+    return update_fields is None or bool(WON_FIELDS & set(update_fields))
+
+
+def lock_stored_won(instance):
+    """(customer_id, stage, value) of the stored row, locked until the write commits"""
+    return Deal.objects.select_for_update().filter(pk=instance.pk).values_list('customer_id', 'stage', 'value').first()
+
+
+@receiver(pre_save, sender=Deal)
+def remember_won_value(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Read what the stored row contributes before it is overwritten
+    
+    The row is read under a lock rather than trusted from when the instance
+    was loaded, so concurrent saves of one deal each apply the delta against
+    what the other committed. Deal.save() supplies the transaction.
+    """
+    if raw or instance.pk is None or not touches_won_value(update_fields):
+        return
+    instance._stored_won = lock_stored_won(instance)
+
+
+@receiver(post_save, sender=Deal)
+def update_customer_lifetime_value(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Apply the change in won value as F() deltas on the old and new customer"""
+    if raw or not touches_won_value(update_fields):
+        return
+    before = instance.__dict__.pop('_stored_won', None)
+    old_customer_id, old_value = (before[0], won_value(before[1], before[2])) if before else (None, 0)
+    new_value = won_value(instance.stage, instance.value)
+    if old_customer_id == instance.customer_id:
+        apply_lifetime_value_delta(instance.customer_id, new_value - old_value)
+    else:
+        apply_lifetime_value_delta(old_customer_id, -old_value)
+        apply_lifetime_value_delta(instance.customer_id, new_value)
+
+
+def deleted_with_customer(origin):
+    return isinstance(origin, Customer) or (isinstance(origin, QuerySet) and origin.model is Customer)
+
+
+@receiver(pre_delete, sender=Deal)
+def remember_deleted_won_value(sender, instance, origin=None, **kwargs):
+    """Deletes run in the collector's transaction; lock the stored row like saves do"""
+    if not deleted_with_customer(origin):
+        instance._stored_won = lock_stored_won(instance)
+
+
+@receiver(post_delete, sender=Deal)
+def remove_deal_from_lifetime_value(sender, instance, origin=None, **kwargs):
+    if deleted_with_customer(origin):
+        return  # deleted along with its customer
+    before = instance.__dict__.pop('_stored_won', None)
+    if before:
+        apply_lifetime_value_delta(before[0], -won_value(before[1], before[2]))
+
+
+deal_activity_rollup = ActivityRollup(DealActivity, 'deal', 'last_activity_date', 'activity_count').connect()
@@ -0,0 +1,101 @@
+import io
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.customers.lifetime_value import lifetime_value_drift
+from apps.customers.models import Customer, CustomerSegment
+from .models import Deal
+
+
+class LifetimeValueTests(TestCase):
+    
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small = CustomerSegment.objects.create(
+                name='Small accounts', criteria={'field': 'lifetime_value', 'op': 'lte', 'value': 100}
+            )
+    
+    def make_deal(self, **fields):
+        fields = {'name': 'Licence', 'value': Decimal('500.00'), 'expected_close_date': timezone.now(), **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            return Deal.objects.create(customer=self.customer, **fields)
+    
+    def deal_reads(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'FROM "deals"' in query['sql']]
+    
+    def lifetime_value(self):
+        return Customer.objects.values_list('lifetime_value', flat=True).get(pk=self.customer.pk)
+    
+    def test_winning_and_reopening_a_deal(self):
+        deal = self.make_deal()
+        self.assertEqual(self.lifetime_value(), 0)
+        self.assertTrue(self.small.customers.filter(pk=self.customer.pk).exists())
+        
+        deal = Deal.objects.get(pk=deal.pk)
+        deal.stage = 'closed_won'
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            deal.save()
+        self.assertEqual(len(self.deal_reads(queries)), 1)  # the locked read of the stored row
+        self.assertEqual(self.lifetime_value(), Decimal('500.00'))
+        self.assertFalse(self.small.customers.filter(pk=self.customer.pk).exists())
+        
+        deal.stage = 'negotiation'
+        deal.save()
+        self.assertEqual(self.lifetime_value(), 0)
+    
+    def test_saving_unrelated_fields_leaves_lifetime_value_alone(self):
+        deal = self.make_deal(stage='closed_won')
+        with CaptureQueriesContext(connection) as queries:
+            deal.save(update_fields=['name'])
+        self.assertEqual(self.deal_reads(queries), [])
+        self.assertFalse([query for query in queries if 'UPDATE "customers"' in query['sql']])
+        self.assertEqual(self.lifetime_value(), Decimal('500.00'))
+    
+    def test_deal_built_by_hand_is_read_before_saving(self):
+        deal = self.make_deal(stage='closed_won')
+        Deal(pk=deal.pk, customer=self.customer, name='Licence', stage='closed_lost', value=deal.value,
+             expected_close_date=deal.expected_close_date, created_at=deal.created_at).save()
+        self.assertEqual(self.lifetime_value(), 0)
+    
+    def test_saves_from_stale_copies_apply_against_the_stored_row(self):
+        deal = self.make_deal()
+        first, second = Deal.objects.get(pk=deal.pk), Deal.objects.get(pk=deal.pk)
+        first.stage = 'closed_won'
+        first.save()
+        second.stage, second.value = 'closed_won', Decimal('600.00')
+        second.save()
+        self.assertEqual(self.lifetime_value(), Decimal('600.00'))
+        
+        first.delete()  # still thinks the value is 500
+        self.assertEqual(self.lifetime_value(), 0)
+    
+    def test_reconcile_repairs_drifted_lifetime_values(self):
+        self.make_deal(stage='closed_won')
+        self.make_deal(stage='closed_won', value=Decimal('250.00'))
+        Customer.objects.filter(pk=self.customer.pk).update(lifetime_value=Decimal('10.00'))
+        count, drift, samples = lifetime_value_drift()
+        self.assertEqual((count, drift), (1, Decimal('740.00')))
+        self.assertEqual(samples, [(self.customer.pk, Decimal('10.00'), Decimal('750.00'))])
+        
+        out = io.StringIO()
+        call_command('reconcile_lifetime_values', '--dry-run', stdout=out)
+        self.assertIn('1 customer(s) drifted', out.getvalue())
+        self.assertEqual(self.lifetime_value(), Decimal('10.00'))
+        
+        call_command('reconcile_lifetime_values', stdout=io.StringIO())
+        self.assertEqual(self.lifetime_value(), Decimal('750.00'))
+        self.assertEqual(lifetime_value_drift()[0], 0)
+    
+    def test_deleting_a_customer_with_a_won_deal(self):
+        self.make_deal(stage='closed_won', value=Decimal('50.00'))
+        self.assertTrue(self.small.customers.filter(pk=self.customer.pk).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.delete()
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(self.small.customers.exists())
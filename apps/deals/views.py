@@ -0,0 +1,26 @@
+from rest_framework import viewsets, permissions
+from apps.accounts.hierarchy import scope_to_user
+from apps.accounts.permissions import HasRolePermission
+from apps.core.exports import ExportMixin
+from .models import Deal
+from .serializers import DealSerializer
+
+
+class DealViewSet(ExportMixin, viewsets.ModelViewSet):
+    """ViewSet for Deal model"""
+    
+    queryset = Deal.objects.all()
+    serializer_class = DealSerializer
+    permission_classes = [permissions.IsAuthenticated, HasRolePermission]
+    permission_model = 'deal'
+    filterset_fields = {
+        'stage': ['exact'], 'priority': ['exact'], 'customer': ['exact'], 'assigned_to': ['exact'],
+        'last_activity_date': ['lt', 'gte', 'isnull'],
+    }
+    search_fields = ['name', 'customer__company_name']
+    ordering_fields = ['created_at', 'value', 'expected_close_date', 'last_activity_date', 'activity_count']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        """Filter queryset based on user permissions"""
+        return scope_to_user(Deal.objects.all(), self.request.user)
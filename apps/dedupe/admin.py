@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import DuplicateCandidate
+
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    list_display = ('left_kind', 'left_id', 'right_kind', 'right_id', 'email_match', 'phone_match', 'name_similarity', 'status')
+    list_filter = ('status', 'left_kind', 'right_kind', 'email_match', 'phone_match', 'name_match')
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,154 @@
+import heapq
+import logging
+from collections import defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.apps import apps
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Collate
+
+from .keys import KEY_FIELDS, similarity
+from .models import DuplicateCandidate
+
+logger = logging.getLogger(__name__)
+
+SOURCES = {'customer': 'customers.Customer', 'lead': 'leads.Lead'}
+
+KEY_FLAGS = {'email_canonical': 'email_match', 'phone_e164': 'phone_match', 'name_key': 'name_match'}
+
+# Name-only matches must be at least this similar to count
+NAME_SIMILARITY_THRESHOLD = 0.5
+
+# Blocks larger than this (a shared switchboard number, a very common
+# surname at one company) are skipped rather than compared pairwise
+MAX_BLOCK_SIZE = 50
+
+# Binary collation where the columns don't already sort that way, so both tables stream in the
+# order Python compares keys. On PostgreSQL the (key COLLATE "C", id) indexes from the dedupe
+# migrations serve it; SQLite columns already compare as BINARY and use the plain key indexes.
+BINARY_COLLATIONS = {'postgresql': 'C'}
+
+RECORD_FIELDS = ['pk', 'first_name', 'last_name', 'company_name']
+
+
+def source_model(kind):
+    return apps.get_model(SOURCES[kind])
+
+
+def display_name(first_name, last_name, company_name):
+    return f'{first_name} {last_name} {company_name}'
+
+
+def candidate(left, right, flags, name_similarity):
+    """Build a DuplicateCandidate for two (kind, id) records in canonical order"""
+    (left_kind, left_id), (right_kind, right_id) = sorted([left, right])
+    return DuplicateCandidate(
+        left_kind=left_kind, left_id=left_id, right_kind=right_kind, right_id=right_id,
+        name_similarity=name_similarity, **{flag: True for flag in flags}
+    )
+
+
+def save_candidates(candidates, update_fields):
+    """Upsert candidates; reviewed status is never overwritten"""
+    DuplicateCandidate.objects.bulk_create(
+        candidates, batch_size=1000, update_conflicts=True,
+        unique_fields=['left_kind', 'left_id', 'right_kind', 'right_id'],
+        update_fields=update_fields + ['name_similarity', 'updated_at'],
+    )
+
+
+def find_record_duplicates(kind, record):
+    """Candidates for one saved Customer or Lead, via indexed key lookups (one query per source table)"""
+    keys = {field: getattr(record, field) for field in KEY_FIELDS if getattr(record, field)}
+    if not keys:
+        return []
+    condition = Q()
+    for field, value in keys.items():
+        condition |= Q(**{field: value})
+    name = display_name(record.first_name, record.last_name, record.company_name)
+    
+    candidates = []
+    for other_kind in SOURCES:
+        matches = source_model(other_kind).objects.filter(condition)
+        if other_kind == kind:
+            matches = matches.exclude(pk=record.pk)
+        for row in matches.values(*RECORD_FIELDS, *KEY_FIELDS)[:MAX_BLOCK_SIZE]:
+            flags = [KEY_FLAGS[field] for field, value in keys.items() if row[field] == value]
+            score = similarity(name, display_name(row['first_name'], row['last_name'], row['company_name']))
+            if flags == ['name_match'] and score < NAME_SIMILARITY_THRESHOLD:
+                continue
+            candidates.append(candidate((kind, record.pk), (other_kind, row['pk']), flags, score))
+    return candidates
+
+
+def check_record(kind, record):
+    """Synchronous check at creation time: store and return the record's duplicate candidates"""
+    candidates = find_record_duplicates(kind, record)
+    # Write only the flags that matched, so evidence already stored for a pair is kept
+    by_flags = defaultdict(list)
+    for pair in candidates:
+        by_flags[tuple(flag for flag in KEY_FLAGS.values() if getattr(pair, flag))].append(pair)
+    for flags, pairs in by_flags.items():
+        save_candidates(pairs, list(flags))
+    return candidates
+
+
+def key_queryset(kind, field, using='default'):
+    """One table's rows with a `field` key, in binary key order"""
+    collation = BINARY_COLLATIONS.get(connections[using].vendor)
+    ordering = Collate(field, collation) if collation else field
+    return (
+        source_model(kind).objects.using(using).exclude(**{field: ''})
+        .order_by(ordering, 'pk')
+        .values_list(field, *RECORD_FIELDS)
+    )
+
+
+def _stream(kind, field, using, chunk_size):
+    rows = key_queryset(kind, field, using).iterator(chunk_size=chunk_size)
+    for value, pk, first_name, last_name, company_name in rows:
+        yield value, (kind, pk), display_name(first_name, last_name, company_name)
+
+
+def scan_key(field, using='default', chunk_size=5000, batch_size=1000):
+    """Stream both tables ordered by one blocking key and compare records within each block
+    
+    Memory is bounded by one block plus one batch of candidates, so this runs
+    over millions of rows. Yields the number of candidates saved per batch.
+    """
+    flag = KEY_FLAGS[field]
+    streams = [_stream(kind, field, using, chunk_size) for kind in SOURCES]
+    batch = []
+    for value, block in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+        block = list(block)
+        if len(block) < 2:
+            continue
+        if len(block) > MAX_BLOCK_SIZE:
+            logger.info('Skipping %s block %r with %d records', field, value, len(block))
+            continue
+        for (_, left, left_name), (_, right, right_name) in combinations(block, 2):
+            score = similarity(left_name, right_name)
+            if flag == 'name_match' and score < NAME_SIMILARITY_THRESHOLD:
+                continue
+            batch.append(candidate(left, right, [flag], score))
+        if len(batch) >= batch_size:
+            save_candidates(batch, [flag])
+            yield len(batch)
+            batch = []
+    if batch:
+        save_candidates(batch, [flag])
+        yield len(batch)
+
+
+def open_candidates(kind, pk):
+    """Open candidate pairs involving one record, as (other kind, other id, candidate)"""
+    pairs = DuplicateCandidate.objects.filter(
+        Q(left_kind=kind, left_id=pk) | Q(right_kind=kind, right_id=pk), status='open'
+    )
+    for pair in pairs:
+        if (pair.left_kind, pair.left_id) == (kind, pk):
+            yield pair.right_kind, pair.right_id, pair
+        else:
+            yield pair.left_kind, pair.left_id, pair
@@ -0,0 +1,123 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+
+
+# Providers that ignore dots in the local part
+DOTLESS_EMAIL_DOMAINS = {'gmail.com': 'gmail.com', 'googlemail.com': 'gmail.com'}
+
+COMPANY_SUFFIXES = {'inc', 'llc', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company', 'gmbh', 'plc', 'sa', 'bv', 'the'}
+
+
+def fold(value):
+    """Lower-case ASCII letters and digits only"""
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]', '', value.lower())
+
+
+def canonical_email(email):
+    """Lower-cased address without +tags, and without dots for providers that ignore them"""
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local:
+        return ''
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_EMAIL_DOMAINS:
+        local, domain = local.replace('.', ''), DOTLESS_EMAIL_DOMAINS[domain]
+    return f'{local}@{domain}'
+
+
+def e164_phone(phone):
+    """Best-effort E.164 form; numbers without a country code get settings.DEDUPE_DEFAULT_COUNTRY_CODE"""
+    phone = (phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    else:
+        digits = digits.lstrip('0')
+        country_code = settings.DEDUPE_DEFAULT_COUNTRY_CODE
+        if not digits.startswith(country_code) or len(digits) <= 10:
+            digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return f'+{digits}'
+
+
+def company_stem(company):
+    words = [fold(word) for word in (company or '').split()]
+    return ''.join(word for word in words if word and word not in COMPANY_SUFFIXES)
+
+
+def name_key(first_name, last_name, company_name):
+    """Surname plus the first three letters of the company (or the first name's initial)"""
+    surname = fold(last_name)
+    if not surname:
+        return ''
+    qualifier = company_stem(company_name)[:3] or fold(first_name)[:1]
+    return f'{surname}:{qualifier}'
+
+
+def trigrams(value):
+    value = f'  {" ".join(fold(word) for word in (value or "").split())} '
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def similarity(left, right):
+    """Trigram (Jaccard) similarity of two strings, 0-1"""
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def blocking_keys(record):
+    """The three key field values for a Customer or Lead"""
+    return {
+        'email_canonical': canonical_email(record.email),
+        'phone_e164': e164_phone(record.phone),
+        'name_key': name_key(record.first_name, record.last_name, record.company_name),
+    }
+
+
+KEY_FIELDS = ['email_canonical', 'phone_e164', 'name_key']
+SOURCE_FIELDS = ['email', 'phone', 'first_name', 'last_name', 'company_name']
+
+
+class BlockingKeysMixin:
+    """For models carrying the keys: a partial save of a source field saves the recomputed keys too"""
+    
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is not None and set(update_fields) & set(SOURCE_FIELDS):
+            update_fields = {*update_fields, *KEY_FIELDS}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+def refresh_blocking_keys(model, chunk_size=5000):
+    """Recompute the keys of every row whose stored keys are stale, in bulk_update batches; returns the count
+    
+    For bulk loads that bypassed save(), and for the migration that added the
+    keys; works on historical models as well.
+    """
+    rows = model._base_manager.order_by('pk').only('pk', *SOURCE_FIELDS, *KEY_FIELDS).iterator(chunk_size=chunk_size)
+    changed, updated = [], 0
+    for record in rows:
+        keys = blocking_keys(record)
+        if any(getattr(record, field) != value for field, value in keys.items()):
+            for field, value in keys.items():
+                setattr(record, field, value)
+            changed.append(record)
+        if len(changed) >= chunk_size:
+            updated += _save_keys(model, changed)
+            changed = []
+    return updated + _save_keys(model, changed)
+
+
+def _save_keys(model, records):
+    if records:
+        with transaction.atomic():
+            model._base_manager.bulk_update(records, KEY_FIELDS)
+    return len(records)
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.db import pin_to_primary
+from apps.dedupe.engine import SOURCES, scan_key, source_model
+from apps.dedupe.keys import KEY_FIELDS, refresh_blocking_keys
+
+
+class Command(BaseCommand):
+    help = 'Find duplicate Lead/Customer pairs by streaming over the indexed blocking keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh-keys', action='store_true',
+                            help='Recompute the blocking keys first (after bulk loads that bypassed save())')
+        parser.add_argument('--key', choices=KEY_FIELDS, action='append', help='Only scan these keys (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['refresh_keys']:
+            for kind in SOURCES:
+                updated = refresh_blocking_keys(source_model(kind), chunk_size)
+                self.stdout.write(f'{kind}: refreshed blocking keys on {updated} records')
+        
+        for field in options['key'] or KEY_FIELDS:
+            started = time.perf_counter()
+            found = 0
+            for saved in scan_key(field, chunk_size=chunk_size):
+                found += saved
+                self.stdout.write(f'{field}: {found} candidate pairs so far')
+            self.stdout.write(f'{field}: {found} candidate pairs in {time.perf_counter() - started:.1f}s')
+        self.stdout.write(self.style.SUCCESS('Duplicate scan finished'))
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('left_kind', models.CharField(choices=[('customer', 'Customer'), ('lead', 'Lead')], max_length=10)),
+                ('left_id', models.PositiveBigIntegerField()),
+                ('right_kind', models.CharField(choices=[('customer', 'Customer'), ('lead', 'Lead')], max_length=10)),
+                ('right_id', models.PositiveBigIntegerField()),
+                ('email_match', models.BooleanField(default=False)),
+                ('phone_match', models.BooleanField(default=False)),
+                ('name_match', models.BooleanField(default=False)),
+                ('name_similarity', models.FloatField(default=0)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('confirmed', 'Confirmed'), ('dismissed', 'Dismissed'), ('merged', 'Merged')], default='open', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Duplicate Candidate',
+                'verbose_name_plural': 'Duplicate Candidates',
+                'db_table': 'duplicate_candidates',
+                'indexes': [models.Index(fields=['right_kind', 'right_id'], name='duplicate_c_right_k_33d4f4_idx'), models.Index(fields=['status'], name='duplicate_c_status_fea611_idx')],
+                'unique_together': {('left_kind', 'left_id', 'right_kind', 'right_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+from apps.dedupe.keys import refresh_blocking_keys
+
+
+TABLES = {'customers.Customer': 'customers', 'leads.Lead': 'leads'}
+KEY_FIELDS = ['email_canonical', 'phone_e164', 'name_key']
+
+
+def backfill_blocking_keys(apps, schema_editor):
+    """Rows saved before the keys existed would otherwise never block with anything"""
+    for label in TABLES:
+        refresh_blocking_keys(apps.get_model(label))
+
+
+def create_binary_key_indexes(apps, schema_editor):
+    # The scan orders by key COLLATE "C"; the default-collation key indexes can't serve that
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES.values():
+        for field in KEY_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_{field}_c_idx ON {table} ({field} COLLATE "C", id)'
+            )
+
+
+def drop_binary_key_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES.values():
+        for field in KEY_FIELDS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{field}_c_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dedupe', '0001_initial'),
+        ('customers', '0008_keyset_tiebreak_indexes'),
+        ('leads', '0006_keyset_tiebreak_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_blocking_keys, migrations.RunPython.noop),
+        migrations.RunPython(create_binary_key_indexes, drop_binary_key_indexes),
+    ]
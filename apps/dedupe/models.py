@@ -0,0 +1,57 @@
+from django.db import models
+from apps.accounts.models import User
+
+
+class DuplicateCandidate(models.Model):
+    """A pair of Lead/Customer records that share a blocking key
+    
+    Pairs are stored in a canonical order ((left_kind, left_id) < (right_kind, right_id))
+    so each pair exists once whichever side it was found from.
+    """
+    
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('lead', 'Lead'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('confirmed', 'Confirmed'),
+        ('dismissed', 'Dismissed'),
+        ('merged', 'Merged'),
+    ]
+    
+    left_kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    left_id = models.PositiveBigIntegerField()
+    right_kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    right_id = models.PositiveBigIntegerField()
+    
+    # Evidence
+    email_match = models.BooleanField(default=False)
+    phone_match = models.BooleanField(default=False)
+    name_match = models.BooleanField(default=False)
+    name_similarity = models.FloatField(default=0)  # Trigram similarity of name + company, 0-1
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'duplicate_candidates'
+        verbose_name = 'Duplicate Candidate'
+        verbose_name_plural = 'Duplicate Candidates'
+        unique_together = ['left_kind', 'left_id', 'right_kind', 'right_id']
+        indexes = [
+            models.Index(fields=['right_kind', 'right_id']),
+            models.Index(fields=['status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.left_kind} {self.left_id} ~ {self.right_kind} {self.right_id} ({self.score:.2f})"
+    
+    @property
+    def score(self):
+        """Rough match confidence, 0-1"""
+        score = 0.6 * self.email_match + 0.3 * self.phone_match + 0.4 * self.name_similarity
+        return min(score, 1.0)
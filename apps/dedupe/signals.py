@@ -0,0 +1,35 @@
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from apps.customers.models import Customer
+from apps.customers.signals import customer_merged
+from apps.leads.models import Lead
+from .engine import check_record
+from .keys import blocking_keys
+from .models import DuplicateCandidate
+
+
+@receiver(pre_save, sender=Customer)
+@receiver(pre_save, sender=Lead)
+def set_blocking_keys(sender, instance, raw=False, **kwargs):
+    """Recompute the normalized keys from the current field values"""
+    if not raw:
+        for field, value in blocking_keys(instance).items():
+            setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Lead)
+def check_new_record_for_duplicates(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        check_record('customer' if sender is Customer else 'lead', instance)
+
+
+@receiver(customer_merged)
+def resolve_merged_candidates(sender, target, source_id, **kwargs):
+    """Close the merged pair and drop other pairs pointing at the deleted customer"""
+    source = Q(left_kind='customer', left_id=source_id) | Q(right_kind='customer', right_id=source_id)
+    target_side = Q(left_kind='customer', left_id=target.pk) | Q(right_kind='customer', right_id=target.pk)
+    DuplicateCandidate.objects.filter(source & target_side).update(status='merged')
+    DuplicateCandidate.objects.filter(source).exclude(target_side).delete()
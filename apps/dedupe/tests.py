@@ -0,0 +1,96 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+
+from apps.core.query_plans import PlanCheck
+from apps.customers.models import Customer
+from apps.leads.models import Lead
+from .engine import check_record, key_queryset, scan_key
+from .keys import refresh_blocking_keys
+from .models import DuplicateCandidate
+
+
+def make_customer(**fields):
+    fields = {'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann.lee@gmail.com', **fields}
+    return Customer.objects.create(**fields)
+
+
+class BlockingKeyTests(TestCase):
+    
+    def test_partial_save_of_a_source_field_saves_the_keys(self):
+        customer = make_customer()
+        customer.email = 'Ann+crm@Example.com'
+        customer.save(update_fields=['email'])
+        self.assertEqual(Customer.objects.values_list('email_canonical', flat=True).get(), 'ann@example.com')
+    
+    def test_refresh_fills_keys_of_rows_saved_without_them(self):
+        Customer.objects.bulk_create([Customer(first_name='Ann', last_name='Lee', email='A.nn+x@gmail.com')])
+        self.assertEqual(refresh_blocking_keys(Customer), 1)
+        self.assertEqual(Customer.objects.values_list('email_canonical', 'name_key').get(), ('ann@gmail.com', 'lee:a'))
+        self.assertEqual(refresh_blocking_keys(Customer), 0)
+    
+    def test_scan_pairs_records_across_tables(self):
+        customer = make_customer()
+        lead = Lead.objects.create(first_name='Anne', last_name='Lee', email='annlee@gmail.com')
+        self.assertEqual(sum(scan_key('email_canonical')), 1)
+        pair = DuplicateCandidate.objects.get()
+        self.assertEqual(
+            (pair.left_kind, pair.left_id, pair.right_kind, pair.right_id), ('customer', customer.pk, 'lead', lead.pk)
+        )
+        self.assertTrue(pair.email_match)
+    
+    def test_key_streams_read_an_index_in_order(self):
+        for kind in ('customer', 'lead'):
+            for field in ('email_canonical', 'phone_e164', 'name_key'):
+                plan, problems = PlanCheck(f'{kind} {field}', key_queryset(kind, field)).run()
+                self.assertEqual(problems, [], plan)
+
+
+class DuplicateCheckTests(TestCase):
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+    
+    def test_new_record_is_checked_against_both_tables(self):
+        customer = make_customer(phone='+1 555 010 0001')
+        lead = Lead.objects.create(first_name='Ann', last_name='Lee', email='a.nn.lee+x@gmail.com')
+        Customer.objects.create(first_name='Bob', last_name='Stone', email='bob@example.com')
+        pairs = {(pair.left_kind, pair.left_id, pair.right_kind, pair.right_id): pair for pair in DuplicateCandidate.objects.all()}
+        pair = pairs[('customer', customer.pk, 'lead', lead.pk)]
+        self.assertTrue(pair.email_match)
+        self.assertTrue(pair.name_match)
+        self.assertFalse(pair.phone_match)
+        self.assertEqual(len(pairs), 1)
+    
+    def test_a_later_check_keeps_earlier_evidence(self):
+        customer = make_customer(phone='+1 555 010 0001')
+        lead = Lead.objects.create(first_name='Zed', last_name='Moss', email='other@example.com', phone='+1 555 010 0001')
+        self.assertTrue(DuplicateCandidate.objects.get().phone_match)
+        
+        Lead.objects.filter(pk=lead.pk).update(phone='', phone_e164='', email='ann.lee@gmail.com', email_canonical='annlee@gmail.com')
+        lead.refresh_from_db()
+        [found] = check_record('lead', lead)
+        self.assertTrue(found.email_match)
+        self.assertFalse(found.phone_match)
+        pair = DuplicateCandidate.objects.get()
+        self.assertEqual((pair.left_id, pair.right_id), (customer.pk, lead.pk))
+        self.assertTrue(pair.email_match)
+        self.assertTrue(pair.phone_match)
+    
+    def test_create_response_lists_possible_duplicates(self):
+        customer = make_customer()
+        response = self.client.post('/api/leads/', {'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ANN.LEE@gmail.com', 'source': 'website'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        [duplicate] = response.data['possible_duplicates']
+        self.assertEqual((duplicate['type'], duplicate['id']), ('customer', customer.pk))
+        self.assertTrue(duplicate['email_match'])
+        self.assertFalse(duplicate['phone_match'])
+        self.assertGreaterEqual(duplicate['score'], 0.6)
+        
+        response = self.client.post('/api/leads/', {'first_name': 'Bob', 'last_name': 'Stone', 'email': 'bob@example.com', 'source': 'website'}, format='json')
+        self.assertEqual(response.data['possible_duplicates'], [])
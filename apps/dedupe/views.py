@@ -0,0 +1,25 @@
+from .engine import open_candidates
+
+
+class DuplicateCheckMixin:
+    """Adds `possible_duplicates` to create responses (found by the post_save check)
+    
+    Set `dedupe_kind` to 'customer' or 'lead'.
+    """
+    
+    dedupe_kind = None
+    
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['possible_duplicates'] = [
+            {
+                'type': other_kind,
+                'id': other_id,
+                'score': round(pair.score, 2),
+                'email_match': pair.email_match,
+                'phone_match': pair.phone_match,
+                'name_similarity': round(pair.name_similarity, 2),
+            }
+            for other_kind, other_id, pair in open_candidates(self.dedupe_kind, response.data['id'])
+        ]
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='integrationlog',
+            index=models.Index(fields=['integration', '-created_at'], name='integration_log_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='integrationlog',
+            index=models.Index(fields=['-created_at'], name='integration_log_created_idx'),
+        ),
+    ]
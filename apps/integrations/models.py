@@ -72,6 +72,10 @@ class IntegrationLog(models.Model):
         verbose_name = 'Integration Log'
         verbose_name_plural = 'Integration Logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['integration', '-created_at'], name='integration_log_idx'),
+            models.Index(fields=['-created_at'], name='integration_log_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.integration.name} - {self.status} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
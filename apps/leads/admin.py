@@ -7,7 +7,7 @@ class LeadAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'email', 'company_name', 'status', 'source', 'score', 'created_at')
     list_filter = ('status', 'source', 'created_at', 'assigned_to')
     search_fields = ('first_name', 'last_name', 'email', 'company_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'activity_count')
 
 
 @admin.register(LeadActivity)
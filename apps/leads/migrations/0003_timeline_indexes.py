@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0002_dedupe_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['converted_to_customer', '-created_at', '-id'], name='lead_converted_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadactivity',
+            index=models.Index(fields=['lead', '-created_at', '-id'], name='lead_activity_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_owner_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_owner_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lead',
+            name='lead_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['-created_at', '-id'], name='lead_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['assigned_to', '-created_at', '-id'], name='lead_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['assigned_to', 'status', '-created_at', '-id'], name='lead_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='lead_status_created_idx'),
+        ),
+    ]
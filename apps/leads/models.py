@@ -2,9 +2,10 @@ from django.db import models
 from django.core.validators import RegexValidator
 from apps.accounts.models import User
 from apps.customers.models import Customer
+from apps.dedupe.keys import BlockingKeysMixin
 
 
-class Lead(models.Model):
+class Lead(BlockingKeysMixin, models.Model):
     """Lead model for managing potential customers"""
     
     STATUS_CHOICES = [
@@ -73,14 +74,32 @@ class Lead(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    last_contact_date = models.DateTimeField(null=True, blank=True)
+    # Latest activity and number of activities, kept current by apps.leads.signals
+    last_contact_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    activity_count = models.PositiveIntegerField(default=0)
     next_follow_up = models.DateTimeField(null=True, blank=True)
     
+    # Duplicate detection blocking keys (maintained by apps.dedupe)
+    email_canonical = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+    phone_e164 = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    name_key = models.CharField(max_length=120, blank=True, db_index=True, editable=False)
+    
     class Meta:
         db_table = 'leads'
         verbose_name = 'Lead'
         verbose_name_plural = 'Leads'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['converted_to_customer', '-created_at', '-id'], name='lead_converted_timeline_idx'),
+            models.Index(fields=['-created_at', '-id'], name='lead_created_idx'),
+            models.Index(fields=['assigned_to', '-created_at', '-id'], name='lead_owner_created_idx'),
+            models.Index(fields=['assigned_to', 'status', '-created_at', '-id'], name='lead_owner_status_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='lead_status_created_idx'),
+            models.Index(
+                fields=['assigned_to', 'next_follow_up'], name='lead_owner_follow_up_idx',
+                condition=models.Q(next_follow_up__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         if self.company_name:
@@ -132,6 +151,9 @@ class LeadActivity(models.Model):
         verbose_name = 'Lead Activity'
         verbose_name_plural = 'Lead Activities'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', '-created_at', '-id'], name='lead_activity_timeline_idx'),
+        ]
     
     def __str__(self):
         return f"{self.lead.full_name} - {self.get_activity_type_display()} - {self.subject}"
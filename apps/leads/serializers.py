@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from .models import Lead
+
+
+class LeadSerializer(serializers.ModelSerializer):
+    """Serializer for Lead model"""
+    
+    full_name = serializers.ReadOnlyField()
+    is_hot = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Lead
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
+            'company_name', 'job_title', 'status', 'priority', 'source', 'assigned_to',
+            'score', 'is_hot', 'budget', 'timeline', 'industry', 'company_size', 'website',
+            'notes', 'tags', 'converted_to_customer', 'conversion_date',
+            'created_at', 'updated_at', 'last_contact_date', 'activity_count', 'next_follow_up'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at', 'activity_count']
@@ -0,0 +1,5 @@
+from apps.core.activity import ActivityRollup
+from .models import LeadActivity
+
+
+lead_activity_rollup = ActivityRollup(LeadActivity, 'lead', 'last_contact_date', 'activity_count').connect()
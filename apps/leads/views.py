@@ -0,0 +1,28 @@
+from rest_framework import viewsets, permissions
+from apps.accounts.hierarchy import scope_to_user
+from apps.accounts.permissions import HasRolePermission
+from apps.core.exports import ExportMixin
+from apps.dedupe.views import DuplicateCheckMixin
+from .models import Lead
+from .serializers import LeadSerializer
+
+
+class LeadViewSet(DuplicateCheckMixin, ExportMixin, viewsets.ModelViewSet):
+    """ViewSet for Lead model"""
+    
+    queryset = Lead.objects.all()
+    serializer_class = LeadSerializer
+    permission_classes = [permissions.IsAuthenticated, HasRolePermission]
+    permission_model = 'lead'
+    dedupe_kind = 'lead'
+    filterset_fields = {
+        'status': ['exact'], 'priority': ['exact'], 'source': ['exact'], 'assigned_to': ['exact'],
+        'last_contact_date': ['lt', 'gte', 'isnull'],
+    }
+    search_fields = ['first_name', 'last_name', 'email', 'company_name']
+    ordering_fields = ['created_at', 'score', 'next_follow_up', 'last_contact_date', 'activity_count']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        """Filter queryset based on user permissions"""
+        return scope_to_user(Lead.objects.all(), self.request.user)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(fields=['queued_notification', '-created_at'], name='notif_delivery_queued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(fields=['status', '-created_at'], name='notif_delivery_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationqueue',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['priority', 'scheduled_at', 'created_at'], name='notif_queue_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationqueue',
+            index=models.Index(fields=['recipient', 'status', '-created_at'], name='notif_queue_recipient_idx'),
+        ),
+    ]
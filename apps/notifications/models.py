@@ -151,6 +151,14 @@ class NotificationQueue(models.Model):
         verbose_name = 'Queued Notification'
         verbose_name_plural = 'Queued Notifications'
         ordering = ['priority', 'scheduled_at', 'created_at']
+        indexes = [
+            # What the dispatcher polls for; sent and failed rows never enter the index
+            models.Index(
+                fields=['priority', 'scheduled_at', 'created_at'], name='notif_queue_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(fields=['recipient', 'status', '-created_at'], name='notif_queue_recipient_idx'),
+        ]
     
     def __str__(self):
         return f"{self.template.name} -> {self.recipient.full_name}"
@@ -201,6 +209,10 @@ class NotificationDelivery(models.Model):
         verbose_name = 'Notification Delivery'
         verbose_name_plural = 'Notification Deliveries'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['queued_notification', '-created_at'], name='notif_delivery_queued_idx'),
+            models.Index(fields=['status', '-created_at'], name='notif_delivery_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.queued_notification.template.name} - {self.status}"
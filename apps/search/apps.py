@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.search'
+    
+    def ready(self):
+        from .signals import connect_search_documents, restore_search_triggers
+        connect_search_documents()
+        post_migrate.connect(restore_search_triggers, sender=self)
@@ -0,0 +1,97 @@
+from django.apps import apps
+from django.db.models import Subquery
+
+from .models import SearchDocument
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def _tags(tags):
+    return ' '.join(str(tag) for tag in tags) if isinstance(tags, list) else ''
+
+
+class DocumentType:
+    """How one model is flattened into SearchDocument rows"""
+    
+    def __init__(self, kind, model, build, select_related=(), permission=None):
+        self.kind = kind
+        self.model_label = model
+        self.build = build  # instance -> dict of title, subtitle, body, owner_id
+        self.select_related = select_related
+        self.permission = permission  # role permission needed to see these hits
+    
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+    
+    def queryset(self):
+        return self.model.objects.select_related(*self.select_related).order_by('pk')
+    
+    def document(self, instance):
+        return SearchDocument(kind=self.kind, object_id=instance.pk, **self.build(instance))
+
+
+DOCUMENT_TYPES = [
+    DocumentType('customer', 'customers.Customer', lambda customer: {
+        'title': customer.full_name,
+        'subtitle': customer.company_name or customer.email,
+        'body': _join(customer.email, customer.phone, customer.company_name, _tags(customer.tags), customer.general_notes),
+        'owner_id': customer.assigned_to_id,
+    }, permission='view_customer'),
+    DocumentType('contact', 'customers.CustomerContact', lambda contact: {
+        'title': f'{contact.first_name} {contact.last_name}'.strip(),
+        'subtitle': contact.customer.company_name or contact.customer.full_name,
+        'body': _join(contact.email, contact.phone, contact.job_title, contact.department),
+        'owner_id': contact.customer.assigned_to_id,
+    }, select_related=['customer'], permission='view_customer'),
+    DocumentType('lead', 'leads.Lead', lambda lead: {
+        'title': lead.full_name,
+        'subtitle': lead.company_name or lead.email,
+        'body': _join(lead.email, lead.phone, lead.company_name, _tags(lead.tags), lead.notes),
+        'owner_id': lead.assigned_to_id,
+    }, permission='view_lead'),
+    DocumentType('deal', 'deals.Deal', lambda deal: {
+        'title': deal.name,
+        'subtitle': deal.get_stage_display(),
+        'body': _join(deal.description, _tags(deal.tags), deal.notes),
+        'owner_id': deal.assigned_to_id,
+    }, permission='view_deal'),
+    DocumentType('task', 'automation.Task', lambda task: {
+        'title': task.title,
+        'subtitle': task.get_status_display(),
+        'body': task.description,
+        'owner_id': task.assigned_to_id,
+    }),
+]
+
+DOCUMENT_TYPES_BY_KIND = {document_type.kind: document_type for document_type in DOCUMENT_TYPES}
+
+UPSERT_FIELDS = ['title', 'subtitle', 'body', 'owner', 'updated_at']
+
+
+def upsert_documents(documents):
+    """Insert or refresh documents in one statement per batch"""
+    return SearchDocument.objects.bulk_create(
+        documents, batch_size=1000,
+        update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=UPSERT_FIELDS,
+    )
+
+
+def index_instance(document_type, instance):
+    upsert_documents([document_type.document(instance)])
+
+
+def remove_instance(document_type, pk):
+    SearchDocument.objects.filter(kind=document_type.kind, object_id=pk).delete()
+
+
+def sync_contact_documents(customer):
+    """Contact documents copy their customer's owner and name; refresh them in one UPDATE"""
+    CustomerContact = apps.get_model('customers', 'CustomerContact')
+    values = {'owner_id': customer.assigned_to_id, 'subtitle': customer.company_name or customer.full_name}
+    SearchDocument.objects.filter(
+        kind='contact',
+        object_id__in=Subquery(CustomerContact.objects.filter(customer=customer).values('pk')),
+    ).exclude(**values).update(**values)
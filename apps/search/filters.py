@@ -0,0 +1,32 @@
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .indexes import get_index
+
+
+class FullTextSearchFilter(SearchFilter):
+    """SearchFilter backed by the full-text index for indexed models
+    
+    Matches are annotated with `search_rank`. Models without an index (or
+    databases without full-text support) keep the icontains behaviour.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        index = get_index(queryset.model)
+        text = request.query_params.get(self.search_param, '')
+        if index is None or not text.strip():
+            return super().filter_queryset(request, queryset, view)
+        results = index.search(queryset, text)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """OrderingFilter that puts the best search matches first unless ?ordering= is given"""
+    
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        ranked = 'search_rank' in queryset.query.annotations or 'search_rank' in queryset.query.extra
+        if ranked and not request.query_params.get(self.ordering_param):
+            return queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
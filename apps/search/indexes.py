@@ -0,0 +1,198 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+
+# Postgres text search configuration; 'simple' neither stems nor drops stop
+# words, which suits names, emails and company names
+TS_CONFIG = 'simple'
+
+# Relative weight of the A-D columns in SQLite's bm25(); Postgres ts_rank uses
+# its own defaults (1.0, 0.4, 0.2, 0.1)
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+
+MAX_TERMS = 8
+
+
+class SearchIndex:
+    """Full-text index over some text columns of one table
+    
+    Postgres keeps a tsvector column with a GIN index, SQLite an external
+    content FTS5 table. Both are maintained by triggers, so every write path
+    (save, bulk_create, queryset.update) keeps the index current.
+    """
+    
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns  # [(column, weight 'A'-'D'), ...]
+    
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+    
+    def column_names(self):
+        return [column for column, _ in self.columns]
+    
+    def tsvector_sql(self, prefix):
+        # '@' and '.' split emails and domains into searchable words
+        return ' || '.join(
+            f"setweight(to_tsvector('{TS_CONFIG}', translate(coalesce({prefix}{column}::text, ''), '@.', '  ')), '{weight}')"
+            for column, weight in self.columns
+        )
+    
+    def postgres_create_sql(self):
+        table = self.table
+        return [
+            f'ALTER TABLE {table} ADD COLUMN search_vector tsvector',
+            f'UPDATE {table} SET search_vector = {self.tsvector_sql("")}',
+            f'CREATE INDEX {table}_search_vector_gin ON {table} USING GIN (search_vector)',
+            f'CREATE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$ '
+            f'BEGIN NEW.search_vector := {self.tsvector_sql("NEW.")}; RETURN NEW; END '
+            f'$$ LANGUAGE plpgsql',
+            f'CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF {", ".join(self.column_names())} '
+            f'ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()',
+        ]
+    
+    def postgres_drop_sql(self):
+        table = self.table
+        return [
+            f'DROP TRIGGER IF EXISTS {table}_search_vector ON {table}',
+            f'DROP FUNCTION IF EXISTS {table}_search_vector_update()',
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+        ]
+    
+    def sqlite_trigger_names(self):
+        return [f'{self.fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+    
+    def sqlite_trigger_sql(self):
+        table, fts = self.table, self.fts_table
+        columns = ', '.join(self.column_names())
+        new_values = ', '.join(f'new.{column}' for column in self.column_names())
+        old_values = ', '.join(f'old.{column}' for column in self.column_names())
+        insert = f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});'
+        delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+        after_insert, after_delete, after_update = self.sqlite_trigger_names()
+        return [
+            f'CREATE TRIGGER IF NOT EXISTS {after_insert} AFTER INSERT ON {table} BEGIN {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS {after_delete} AFTER DELETE ON {table} BEGIN {delete} END',
+            f'CREATE TRIGGER IF NOT EXISTS {after_update} AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END',
+        ]
+    
+    def sqlite_create_sql(self):
+        table, fts = self.table, self.fts_table
+        columns = ', '.join(self.column_names())
+        return [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            *self.sqlite_trigger_sql(),
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    
+    def sqlite_drop_sql(self):
+        return [f'DROP TRIGGER IF EXISTS {name}' for name in self.sqlite_trigger_names()] + [
+            f'DROP TABLE IF EXISTS {self.fts_table}'
+        ]
+    
+    def create_sql(self, vendor):
+        return {'postgresql': self.postgres_create_sql, 'sqlite': self.sqlite_create_sql}.get(vendor, list)()
+    
+    def drop_sql(self, vendor):
+        return {'postgresql': self.postgres_drop_sql, 'sqlite': self.sqlite_drop_sql}.get(vendor, list)()
+    
+    def rebuild_sql(self, vendor):
+        if vendor == 'postgresql':
+            return [f'UPDATE {self.table} SET search_vector = {self.tsvector_sql("")}']
+        if vendor == 'sqlite':
+            return [f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"]
+        return []
+    
+    def search(self, queryset, text, after=None):
+        """Filter `queryset` to rows matching every word of `text` (as prefixes), annotated with search_rank
+        
+        `after` is a (rank, id) keyset position: only rows ranked below it, or
+        tied with a higher id, are kept (order by -search_rank, id to page).
+        Returns None when the database has no full-text support here.
+        """
+        terms = search_terms(text)
+        if not terms:
+            return queryset
+        vendor = connections[queryset.db].vendor
+        table, fts = self.table, self.fts_table
+        if vendor == 'postgresql':
+            query = ' & '.join(f'{term}:*' for term in terms)
+            match = RawSQL(
+                f"{table}.search_vector @@ to_tsquery('{TS_CONFIG}', %s)", [query], output_field=BooleanField()
+            )
+            rank = RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('{TS_CONFIG}', %s))", [query], output_field=FloatField()
+            )
+            queryset = queryset.filter(match).annotate(search_rank=rank)
+            if after is not None:
+                after_rank, after_id = after
+                queryset = queryset.filter(Q(search_rank__lt=after_rank) | Q(search_rank=after_rank, pk__gt=after_id))
+            return queryset
+        if vendor == 'sqlite':
+            query = ' '.join(f'"{term}"*' for term in terms)
+            weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in self.columns)
+            # bm25() needs the FTS table in the same FROM clause as its MATCH; a
+            # correlated per-row subquery would re-run the match for every row
+            rank = f'-bm25({fts}, {weights})'
+            where, params = [f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'], [query]
+            if after is not None:
+                after_rank, after_id = after
+                where.append(f'({rank} < %s OR ({rank} = %s AND {table}.id > %s))')
+                params += [after_rank, after_rank, after_id]
+            return queryset.extra(select={'search_rank': rank}, tables=[fts], where=where, params=params)
+        return None
+
+
+def search_terms(text):
+    """Lower-cased words of a search box entry; punctuation is dropped so no query syntax leaks through"""
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+SEARCH_INDEXES = {
+    'customers.Customer': SearchIndex('customers', [
+        ('first_name', 'A'), ('last_name', 'A'), ('email', 'A'),
+        ('company_name', 'B'), ('tags', 'B'), ('general_notes', 'D'),
+    ]),
+    'leads.Lead': SearchIndex('leads', [
+        ('first_name', 'A'), ('last_name', 'A'), ('email', 'A'),
+        ('company_name', 'B'), ('tags', 'B'), ('notes', 'D'),
+    ]),
+    'deals.Deal': SearchIndex('deals', [
+        ('name', 'A'), ('tags', 'B'), ('description', 'C'), ('notes', 'D'),
+    ]),
+    'search.SearchDocument': SearchIndex('search_documents', [
+        ('title', 'A'), ('subtitle', 'B'), ('body', 'C'),
+    ]),
+}
+
+
+def get_index(model):
+    return SEARCH_INDEXES.get(model._meta.label)
+
+
+def restore_sqlite_triggers(using='default'):
+    """Re-create missing FTS5 triggers and rebuild those indexes; returns the labels restored
+    
+    SQLite's ALTER TABLE emulation copies the table and drops the original,
+    triggers included, so any migration that rebuilds an indexed table leaves
+    its index no longer following writes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    restored = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {name for (name,) in cursor.fetchall()}
+        for label, index in SEARCH_INDEXES.items():
+            if index.fts_table not in existing or existing.issuperset(index.sqlite_trigger_names()):
+                continue
+            for statement in index.sqlite_trigger_sql() + index.rebuild_sql('sqlite'):
+                cursor.execute(statement)
+            restored.append(label)
+    return restored
@@ -0,0 +1,75 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.customers.models import Customer
+from apps.search.indexes import get_index
+
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'Wei', 'Amara']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Nguyen', 'Okafor']
+COMPANY_WORDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay', 'Stark', 'Wayne', 'Tyrell', 'Soylent']
+
+
+class Command(BaseCommand):
+    help = 'Time full-text customer search against the icontains search it replaces'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Bulk create this many synthetic customers first')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--queries', nargs='+', default=['smith', 'acme wayne', 'jenn', 'okafor globex'])
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        
+        index = get_index(Customer)
+        total = Customer.objects.count()
+        self.stdout.write(f'{total} customers')
+        self.stdout.write(f'{"query":<18}{"mode":<10}{"matches":>10}{"p50 ms":>10}{"p95 ms":>10}')
+        for text in options['queries']:
+            def full_text():
+                queryset = index.search(Customer.objects.all(), text).order_by('-search_rank')
+                return queryset.count(), list(queryset[:20])
+            
+            def icontains():
+                condition = Q()
+                for term in text.split():
+                    condition &= (
+                        Q(first_name__icontains=term) | Q(last_name__icontains=term)
+                        | Q(email__icontains=term) | Q(company_name__icontains=term)
+                    )
+                queryset = Customer.objects.filter(condition)
+                return queryset.count(), list(queryset[:20])
+            
+            for mode, run in (('fts', full_text), ('icontains', icontains)):
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    matches, _ = run()
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(f'{text:<18}{mode:<10}{matches:>10}{statistics.median(timings):>10.1f}{p95:>10.1f}')
+
+    def seed(self, count):
+        rng = random.Random(42)
+        start = Customer.objects.count()
+        batch = []
+        for number in range(start, start + count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            batch.append(Customer(
+                first_name=first,
+                last_name=last,
+                email=f'{first}.{last}.{number}@example.com'.lower(),
+                company_name=f'{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {number % 9973}',
+                tags=rng.sample(['vip', 'enterprise', 'smb', 'renewal-q3', 'churn-risk'], 2),
+            ))
+            if len(batch) == 5000:
+                Customer.objects.bulk_create(batch)
+                batch = []
+        Customer.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {count} customers')
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.db import pin_to_primary
+from apps.search.documents import DOCUMENT_TYPES, DOCUMENT_TYPES_BY_KIND, upsert_documents
+from apps.search.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Backfill the global search documents from customers, contacts, leads, deals and tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(DOCUMENT_TYPES_BY_KIND), action='append',
+                            help='Only rebuild these kinds (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        kinds = options['kind'] or [document_type.kind for document_type in DOCUMENT_TYPES]
+        chunk_size = options['chunk_size']
+        for kind in kinds:
+            document_type = DOCUMENT_TYPES_BY_KIND[kind]
+            started = time.perf_counter()
+            indexed = 0
+            batch = []
+            for instance in document_type.queryset().iterator(chunk_size=chunk_size):
+                batch.append(document_type.document(instance))
+                if len(batch) >= chunk_size:
+                    indexed += self.flush(batch)
+                    batch = []
+            indexed += self.flush(batch)
+            
+            # Documents whose source row is gone (deleted while signals were bypassed)
+            removed, _ = SearchDocument.objects.filter(kind=kind).exclude(
+                object_id__in=document_type.model.objects.values('pk')
+            ).delete()
+            self.stdout.write(
+                f'{kind}: {indexed} indexed, {removed} removed in {time.perf_counter() - started:.1f}s'
+            )
+        self.stdout.write(self.style.SUCCESS('Search documents rebuilt'))
+
+    def flush(self, batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            upsert_documents(batch)
+        return len(batch)
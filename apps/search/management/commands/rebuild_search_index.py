@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.core.db import pin_to_primary
+from apps.search.indexes import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes from their source tables'
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        # Triggers keep the indexes current; this is for restores and raw loads that bypassed them
+        with transaction.atomic(), connection.cursor() as cursor:
+            for label, index in SEARCH_INDEXES.items():
+                for statement in index.rebuild_sql(connection.vendor):
+                    cursor.execute(statement)
+                self.stdout.write(f'Rebuilt {label}')
+        self.stdout.write(self.style.SUCCESS('Search indexes rebuilt'))
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+from apps.search.indexes import SearchIndex
+
+
+# Frozen copy of the index definitions at the time of this migration
+INDEXES = [
+    SearchIndex('customers', [
+        ('first_name', 'A'), ('last_name', 'A'), ('email', 'A'),
+        ('company_name', 'B'), ('tags', 'B'), ('general_notes', 'D'),
+    ]),
+    SearchIndex('leads', [
+        ('first_name', 'A'), ('last_name', 'A'), ('email', 'A'),
+        ('company_name', 'B'), ('tags', 'B'), ('notes', 'D'),
+    ]),
+    SearchIndex('deals', [
+        ('name', 'A'), ('tags', 'B'), ('description', 'C'), ('notes', 'D'),
+    ]),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    for index in INDEXES:
+        for statement in index.create_sql(schema_editor.connection.vendor):
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for index in INDEXES:
+        for statement in index.drop_sql(schema_editor.connection.vendor):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('leads', '0001_initial'),
+        ('deals', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.search.indexes import SearchIndex
+
+
+# Frozen copy of the index definition at the time of this migration
+INDEX = SearchIndex('search_documents', [('title', 'A'), ('subtitle', 'B'), ('body', 'C')])
+
+
+def create_search_index(apps, schema_editor):
+    for statement in INDEX.create_sql(schema_editor.connection.vendor):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in INDEX.drop_sql(schema_editor.connection.vendor):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('search', '0001_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('customer', 'Customer'), ('contact', 'Customer Contact'), ('lead', 'Lead'), ('deal', 'Deal'), ('task', 'Task')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'db_table': 'search_documents',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+from apps.accounts.models import User
+
+
+class SearchDocument(models.Model):
+    """Denormalized, full-text indexed copy of a CRM record for the global search box"""
+    
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('contact', 'Customer Contact'),
+        ('lead', 'Lead'),
+        ('deal', 'Deal'),
+        ('task', 'Task'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    # Whose record it is, for the same visibility rules as the source lists
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'search_documents'
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        unique_together = ['kind', 'object_id']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.customers.signals import customer_merged, customers_imported
+from .documents import DOCUMENT_TYPES, DOCUMENT_TYPES_BY_KIND, index_instance, remove_instance, sync_contact_documents, upsert_documents
+from .indexes import restore_sqlite_triggers
+
+
+def connect_search_documents():
+    """Keep SearchDocument rows in step with every indexed model"""
+    for document_type in DOCUMENT_TYPES:
+        post_save.connect(_saved(document_type), sender=document_type.model_label, weak=False)
+        post_delete.connect(_deleted(document_type), sender=document_type.model_label, weak=False)
+
+
+def _saved(document_type):
+    def update_search_document(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        index_instance(document_type, instance)
+        if document_type.kind == 'customer':
+            sync_contact_documents(instance)
+    return update_search_document
+
+
+def _deleted(document_type):
+    def delete_search_document(sender, instance, **kwargs):
+        remove_instance(document_type, instance.pk)
+    return delete_search_document
+
+
+def restore_search_triggers(sender, using='default', verbosity=1, **kwargs):
+    """Migrations that rebuilt an indexed SQLite table took its FTS triggers with it"""
+    for label in restore_sqlite_triggers(using):
+        if verbosity >= 1:
+            print(f'  Restored the full-text search triggers of {label} and rebuilt its index')
+
+
+@receiver(customer_merged)
+def refresh_merged_contact_documents(sender, target, source_id, **kwargs):
+    """Contacts moved to the target take its owner and name"""
+    sync_contact_documents(target)
+
+
+@receiver(customers_imported)
+def index_imported_customers(sender, customer_ids, **kwargs):
+    document_type = DOCUMENT_TYPES_BY_KIND['customer']
+    upsert_documents([document_type.document(customer) for customer in document_type.queryset().filter(pk__in=customer_ids)])
@@ -0,0 +1,175 @@
+import copy
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import Permission, RolePermission, User
+from apps.accounts.permissions import role_permission_matrix
+from apps.automation.models import Task
+from apps.customers.models import Customer, CustomerContact
+from apps.deals.models import Deal
+from apps.leads.models import Lead
+from .indexes import SEARCH_INDEXES
+from .models import SearchDocument
+
+
+def make_customer(first_name, last_name, **fields):
+    email = fields.pop('email', f'{first_name}.{last_name}@example.com'.lower())
+    return Customer.objects.create(first_name=first_name, last_name=last_name, email=email, **fields)
+
+
+class FullTextSearchFilterTests(TestCase):
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+    
+    def search(self, text, **params):
+        response = self.client.get('/api/customers/', {'search': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['email'] for row in response.data['results']]
+    
+    def test_every_word_must_match_as_a_prefix(self):
+        make_customer('Ada', 'Lovelace', company_name='Analytical Engines')
+        make_customer('Ada', 'Byron')
+        self.assertEqual(self.search('ada love'), ['ada.lovelace@example.com'])
+        self.assertEqual(self.search('analyt'), ['ada.lovelace@example.com'])
+        self.assertEqual(sorted(self.search('ada')), ['ada.byron@example.com', 'ada.lovelace@example.com'])
+        self.assertEqual(self.search('lovelace"*'), ['ada.lovelace@example.com'])  # no query syntax leaks through
+    
+    def test_name_matches_outrank_note_matches(self):
+        make_customer('Grace', 'Hopper', general_notes='Met through Turing')
+        make_customer('Alan', 'Turing')
+        self.assertEqual(self.search('turing'), ['alan.turing@example.com', 'grace.hopper@example.com'])
+        self.assertEqual(self.search('turing', ordering='last_name'), ['grace.hopper@example.com', 'alan.turing@example.com'])
+    
+    def test_bulk_writes_keep_the_index_current(self):
+        customer = make_customer('Ada', 'Lovelace', email='ada@example.com')
+        Customer.objects.filter(pk=customer.pk).update(last_name='King')
+        self.assertEqual(self.search('lovelace'), [])
+        self.assertEqual(self.search('king'), ['ada@example.com'])
+        
+        Customer.objects.bulk_create([Customer(first_name='Mary', last_name='Somerville', email='mary@example.com')])
+        self.assertEqual(self.search('somer'), ['mary@example.com'])
+
+
+
+@skipUnless(connection.vendor == 'sqlite', 'only SQLite rebuilds tables to alter them')
+class SearchTriggerTests(TransactionTestCase):
+    """Migrations that rebuild an indexed table must not leave its index behind"""
+    
+    def rebuild_table(self, model, field_name):
+        """Toggle a column's NULL constraint, which SQLite can only do by copying the table"""
+        old_field = model._meta.get_field(field_name)
+        new_field = copy.copy(old_field)
+        new_field.null = not old_field.null
+        with connection.schema_editor() as editor:
+            editor.alter_field(model, old_field, new_field)
+        with connection.schema_editor() as editor:
+            editor.alter_field(model, new_field, old_field)
+    
+    def triggers(self, label):
+        names = SEARCH_INDEXES[label].sqlite_trigger_names()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {name for (name,) in cursor.fetchall()} & set(names)
+    
+    def matches(self, label, text):
+        index = SEARCH_INDEXES[label]
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {index.fts_table} WHERE {index.fts_table} MATCH %s', [text])
+            return [rowid for (rowid,) in cursor.fetchall()]
+    
+    def test_post_migrate_restores_triggers_dropped_by_a_table_rebuild(self):
+        customer = make_customer('Ada', 'Lovelace')
+        self.rebuild_table(Customer, 'general_notes')
+        self.assertEqual(self.triggers('customers.Customer'), set())
+        self.rebuild_table(Lead, 'notes')
+        self.assertEqual(self.triggers('leads.Lead'), set())
+        # Written while the triggers were missing
+        grace = make_customer('Grace', 'Hopper')
+        
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(len(self.triggers('customers.Customer')), 3)
+        self.assertEqual(len(self.triggers('leads.Lead')), 3)
+        self.assertEqual(self.matches('customers.Customer', 'hopper'), [grace.pk])
+        Customer.objects.filter(pk=customer.pk).update(last_name='King')
+        self.assertEqual(self.matches('customers.Customer', 'king'), [customer.pk])
+    
+    def test_post_migrate_restores_the_deal_triggers(self):
+        customer = make_customer('Ada', 'Lovelace')
+        self.rebuild_table(Deal, 'source')
+        self.assertEqual(self.triggers('deals.Deal'), set())
+        deal = Deal.objects.create(name='Analytical engine', customer=customer, value=1000, expected_close_date=timezone.now())
+        
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(len(self.triggers('deals.Deal')), 3)
+        self.assertEqual(self.matches('deals.Deal', 'analytical'), [deal.pk])
+        Deal.objects.filter(pk=deal.pk).update(name='Difference engine')
+        self.assertEqual(self.matches('deals.Deal', 'difference'), [deal.pk])
+
+
+class GlobalSearchTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        role_permission_matrix.clear()
+        self.addCleanup(role_permission_matrix.clear)
+        view_customer = Permission.objects.create(codename='view_customer', name='View Customer', module='customers')
+        RolePermission.objects.create(role='sales', permission=view_customer)
+        self.rep = User.objects.create_user(email='rep@example.com', username='rep', password=None, role='sales')
+        self.other = User.objects.create_user(email='other@example.com', username='other', password=None, role='sales')
+        self.client = APIClient()
+        self.client.force_authenticate(self.rep)
+    
+    def search(self, text, **params):
+        response = self.client.get('/api/search/', {'q': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def hits(self, text, **params):
+        return [(hit['type'], hit['title']) for hit in self.search(text, **params)['results']]
+    
+    def test_documents_follow_saves_and_deletes(self):
+        customer = make_customer('Ada', 'Lovelace', assigned_to=self.rep)
+        CustomerContact.objects.create(customer=customer, first_name='Charles', last_name='Babbage', email='cb@example.com')
+        self.assertEqual(self.hits('babbage'), [('contact', 'Charles Babbage')])
+        
+        customer.assigned_to = self.other
+        customer.save()
+        self.assertEqual(self.hits('babbage'), [])  # the contact follows its customer's owner
+        
+        customer.assigned_to = self.rep
+        customer.first_name = 'Augusta'
+        customer.save()
+        self.assertEqual(self.hits('augusta'), [('customer', 'Augusta Lovelace'), ('contact', 'Charles Babbage')])
+        customer.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+    
+    def test_hits_are_scoped_by_owner_and_role_permission(self):
+        make_customer('Ada', 'Lovelace', assigned_to=self.rep)
+        make_customer('Ada', 'Byron', assigned_to=self.other)
+        Task.objects.create(title='Call Ada', task_type='call', assigned_to=self.rep, due_date=timezone.now())
+        Lead.objects.create(first_name='Ada', last_name='Lead', email='lead@example.com', assigned_to=self.rep)  # no view_lead
+        self.assertEqual(sorted(self.hits('ada')), [('customer', 'Ada Lovelace'), ('task', 'Call Ada')])
+        self.assertEqual(self.hits('ada', type='task'), [('task', 'Call Ada')])
+    
+    def test_cursor_walks_every_hit_once(self):
+        for n in range(7):
+            make_customer('Ada', f'Number{n}', assigned_to=self.rep, general_notes='ada ' * n)
+        seen, cursor = [], None
+        while True:
+            page = self.search('ada', page_size=3, **({'cursor': cursor} if cursor else {}))
+            seen += [hit['id'] for hit in page['results']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(Customer.objects.values_list('pk', flat=True)))
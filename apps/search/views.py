@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.accounts.hierarchy import scope_to_user
+from apps.accounts.permissions import user_has_role_permissions
+from .documents import DOCUMENT_TYPES
+from .indexes import get_index, search_terms
+from .models import SearchDocument
+
+
+class GlobalSearchView(APIView):
+    """Ranked hits across customers, contacts, leads, deals and tasks from the one search-document index
+    
+    ?q= the search box text, ?type= optional comma-separated kinds,
+    ?page_size= up to MAX_PAGE_SIZE, ?cursor= the `next` value of the previous page.
+    """
+    
+    permission_classes = [permissions.IsAuthenticated]
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    
+    def get(self, request):
+        text = request.query_params.get('q', '')
+        kinds = self.get_kinds(request)
+        page_size = self.get_page_size(request)
+        after = self.decode_cursor(request.query_params.get('cursor'))
+        if not search_terms(text) or not kinds:
+            return Response({'results': [], 'next': None})
+        
+        queryset = scope_to_user(SearchDocument.objects.filter(kind__in=kinds), request.user, field='owner')
+        hits = get_index(SearchDocument).search(queryset, text, after=after)
+        if hits is None:
+            raise ValidationError({'q': 'Full-text search is not available on this database.'})
+        rows = list(
+            hits.order_by('-search_rank', 'pk')
+            .values('pk', 'kind', 'object_id', 'title', 'subtitle', 'search_rank')[:page_size + 1]
+        )
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1]['search_rank'], rows[-1]['pk'])
+        return Response({
+            'results': [
+                {
+                    'type': row['kind'],
+                    'id': row['object_id'],
+                    'title': row['title'],
+                    'subtitle': row['subtitle'],
+                    'rank': row['search_rank'],
+                }
+                for row in rows
+            ],
+            'next': next_cursor,
+        })
+    
+    def get_kinds(self, request):
+        """Requested kinds the user's role may see"""
+        visible = [
+            document_type.kind for document_type in DOCUMENT_TYPES
+            if document_type.permission is None or user_has_role_permissions(request.user, [document_type.permission])
+        ]
+        requested = request.query_params.get('type')
+        if not requested:
+            return visible
+        requested = [kind.strip() for kind in requested.split(',') if kind.strip()]
+        unknown = sorted(set(requested) - {document_type.kind for document_type in DOCUMENT_TYPES})
+        if unknown:
+            raise ValidationError({'type': f"Unknown type(s): {', '.join(unknown)}."})
+        return [kind for kind in visible if kind in requested]
+    
+    def get_page_size(self, request):
+        try:
+            return max(1, min(int(request.query_params.get('page_size', self.PAGE_SIZE)), self.MAX_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be an integer.'})
+    
+    def encode_cursor(self, rank, pk):
+        return base64.urlsafe_b64encode(json.dumps([rank, pk]).encode()).decode()
+    
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            rank, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return float(rank), int(pk)
+        except (ValueError, TypeError, binascii.Error):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
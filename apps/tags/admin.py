@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import Tag, TaggedItem
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+
+
+@admin.register(TaggedItem)
+class TaggedItemAdmin(admin.ModelAdmin):
+    list_display = ('tag', 'kind', 'object_id')
+    list_filter = ('kind',)
+    raw_id_fields = ('tag',)
@@ -0,0 +1,129 @@
+from django.apps import apps
+from django.db import transaction
+
+from .models import Tag, TaggedItem
+
+
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+class TaggedType:
+    """A model whose `tags` JSON list is mirrored into TaggedItem rows"""
+    
+    def __init__(self, kind, model, permission=None, owner_field='assigned_to'):
+        self.kind = kind
+        self.model_label = model
+        self.permission = permission  # role permission needed to see these records
+        self.owner_field = owner_field
+    
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+
+TAGGED_TYPES = [
+    TaggedType('customer', 'customers.Customer', permission='view_customer'),
+    TaggedType('lead', 'leads.Lead', permission='view_lead'),
+    TaggedType('deal', 'deals.Deal', permission='view_deal'),
+    TaggedType('task', 'automation.Task'),
+]
+
+TAGGED_TYPES_BY_KIND = {tagged_type.kind: tagged_type for tagged_type in TAGGED_TYPES}
+
+
+def get_tagged_type(model):
+    """The TaggedType for a model class, or None if its tags aren't indexed"""
+    for tagged_type in TAGGED_TYPES:
+        if tagged_type.model_label == model._meta.label:
+            return tagged_type
+    return None
+
+
+def normalize_tag(value):
+    """Lower-cased, whitespace-collapsed tag name ('' for unusable values)"""
+    if value is None or isinstance(value, (dict, list)):
+        return ''
+    return ' '.join(str(value).split()).lower()[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(values):
+    if not isinstance(values, list):
+        return set()
+    return {name for name in map(normalize_tag, values) if name}
+
+
+def tag_ids(names, create=False):
+    """Map tag names to ids, optionally creating the missing tags in one statement"""
+    names = set(names)
+    if not names:
+        return {}
+    if create:
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def sync_tags(kind, records):
+    """Bring the TaggedItem rows of `records` ([(object_id, tags JSON)]) in line with their tags
+    
+    Reads the current pairs in one query and only writes the difference, so
+    saving a record with unchanged tags costs a single indexed read.
+    Returns (added, removed).
+    """
+    desired = {object_id: normalize_tags(tags) for object_id, tags in records}
+    if not desired:
+        return 0, 0
+    current = {}
+    for item_id, object_id, name in (
+        TaggedItem.objects.filter(kind=kind, object_id__in=list(desired))
+        .values_list('id', 'object_id', 'tag__name')
+    ):
+        current[(object_id, name)] = item_id
+    
+    wanted = {(object_id, name) for object_id, names in desired.items() for name in names}
+    missing = wanted - set(current)
+    stale = [item_id for pair, item_id in current.items() if pair not in wanted]
+    if not missing and not stale:
+        return 0, 0
+    
+    with transaction.atomic():
+        if stale:
+            TaggedItem.objects.filter(pk__in=stale).delete()
+        if missing:
+            ids = tag_ids({name for _, name in missing}, create=True)
+            TaggedItem.objects.bulk_create(
+                [TaggedItem(tag_id=ids[name], kind=kind, object_id=object_id) for object_id, name in missing],
+                batch_size=1000, ignore_conflicts=True,
+            )
+    return len(missing), len(stale)
+
+
+def remove_tags(kind, object_ids):
+    return TaggedItem.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()[0]
+
+
+def tagged_with(kind, names, match_all=True):
+    """Subquery filters selecting the ids of `kind` records tagged with `names`
+    
+    Returns a list of ``pk__in`` subqueries to AND together: one per tag when
+    every tag is required (each an index range scan on (tag, kind)), a single
+    one for any-of. None means an unknown tag made the result empty.
+    """
+    names = {name for name in map(normalize_tag, names) if name}
+    ids = tag_ids(names)
+    if not ids or (match_all and len(ids) < len(names)):
+        return None
+    items = TaggedItem.objects.filter(kind=kind)
+    if match_all:
+        return [items.filter(tag_id=tag_id).values('object_id') for tag_id in ids.values()]
+    return [items.filter(tag_id__in=list(ids.values())).values('object_id')]
+
+
+def filter_by_tags(queryset, names, match_all=True):
+    """Restrict a tagged model's queryset to records carrying all (or any) of `names`"""
+    tagged_type = get_tagged_type(queryset.model)
+    subqueries = tagged_with(tagged_type.kind, names, match_all=match_all)
+    if subqueries is None:
+        return queryset.none()
+    for subquery in subqueries:
+        queryset = queryset.filter(pk__in=subquery)
+    return queryset
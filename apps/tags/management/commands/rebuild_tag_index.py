@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.db import pin_to_primary
+from apps.tags.index import TAGGED_TYPES, TAGGED_TYPES_BY_KIND, sync_tags
+from apps.tags.models import Tag, TaggedItem
+
+
+class Command(BaseCommand):
+    help = 'Backfill the normalized tag index from the tags of customers, leads, deals and tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(TAGGED_TYPES_BY_KIND), action='append',
+                            help='Only rebuild these kinds (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--prune', action='store_true', help='Also delete tags no record uses any more')
+
+    @pin_to_primary()
+    def handle(self, *args, **options):
+        kinds = options['kind'] or [tagged_type.kind for tagged_type in TAGGED_TYPES]
+        chunk_size = options['chunk_size']
+        for kind in kinds:
+            tagged_type = TAGGED_TYPES_BY_KIND[kind]
+            started = time.perf_counter()
+            added = removed = 0
+            batch = []
+            for record in tagged_type.model.objects.order_by('pk').values_list('pk', 'tags').iterator(chunk_size=chunk_size):
+                batch.append(record)
+                if len(batch) >= chunk_size:
+                    added, removed = self.flush(kind, batch, added, removed)
+                    batch = []
+            added, removed = self.flush(kind, batch, added, removed)
+            
+            # Pairs whose record is gone (deleted while signals were bypassed)
+            orphans, _ = TaggedItem.objects.filter(kind=kind).exclude(
+                object_id__in=tagged_type.model.objects.values('pk')
+            ).delete()
+            self.stdout.write(
+                f'{kind}: {added} added, {removed + orphans} removed in {time.perf_counter() - started:.1f}s'
+            )
+        
+        if options['prune']:
+            pruned, _ = Tag.objects.filter(items__isnull=True).delete()
+            self.stdout.write(f'Pruned {pruned} unused tag(s)')
+        self.stdout.write(self.style.SUCCESS('Tag index rebuilt'))
+
+    def flush(self, kind, batch, added, removed):
+        batch_added, batch_removed = sync_tags(kind, batch)
+        return added + batch_added, removed + batch_removed
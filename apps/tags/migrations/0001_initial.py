@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'db_table': 'tags',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaggedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('customer', 'Customer'), ('lead', 'Lead'), ('deal', 'Deal'), ('task', 'Task')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='tags.tag')),
+            ],
+            options={
+                'verbose_name': 'Tagged Item',
+                'verbose_name_plural': 'Tagged Items',
+                'db_table': 'tagged_items',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='tagged_items_object_idx')],
+                'unique_together': {('tag', 'kind', 'object_id')},
+            },
+        ),
+    ]
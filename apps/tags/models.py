@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class Tag(models.Model):
+    """A normalized tag name shared by every tagged record"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'tags'
+        verbose_name = 'Tag'
+        verbose_name_plural = 'Tags'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class TaggedItem(models.Model):
+    """One (tag, record) pair, mirrored from the record's `tags` JSON list"""
+    
+    KIND_CHOICES = [
+        ('customer', 'Customer'),
+        ('lead', 'Lead'),
+        ('deal', 'Deal'),
+        ('task', 'Task'),
+    ]
+    
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='items')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    
+    class Meta:
+        db_table = 'tagged_items'
+        verbose_name = 'Tagged Item'
+        verbose_name_plural = 'Tagged Items'
+        # (tag, kind, object_id) answers "records of this kind with this tag";
+        # (kind, object_id) answers "tags of this record" for syncing and facets
+        unique_together = ['tag', 'kind', 'object_id']
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='tagged_items_object_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tag.name}: {self.get_kind_display()} {self.object_id}"
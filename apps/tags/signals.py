@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.customers.signals import customers_imported
+
+from .index import TAGGED_TYPES, remove_tags, sync_tags
+
+
+def connect_tag_index():
+    """Keep TaggedItem rows in step with the `tags` field of every tagged model"""
+    for tagged_type in TAGGED_TYPES:
+        post_save.connect(_saved(tagged_type), sender=tagged_type.model_label, weak=False)
+        post_delete.connect(_deleted(tagged_type), sender=tagged_type.model_label, weak=False)
+
+
+def _saved(tagged_type):
+    def update_tagged_items(sender, instance, created, raw=False, update_fields=None, **kwargs):
+        if raw or (update_fields is not None and 'tags' not in update_fields):
+            return
+        if created and not instance.tags:
+            return
+        sync_tags(tagged_type.kind, [(instance.pk, instance.tags)])
+    return update_tagged_items
+
+
+def _deleted(tagged_type):
+    def delete_tagged_items(sender, instance, **kwargs):
+        remove_tags(tagged_type.kind, [instance.pk])
+    return delete_tagged_items
+
+
+@receiver(customers_imported)
+def tag_imported_customers(sender, customer_ids, **kwargs):
+    sync_tags('customer', sender.objects.filter(pk__in=customer_ids).values_list('pk', 'tags'))
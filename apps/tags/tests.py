@@ -0,0 +1,53 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.customers.models import Customer
+from .models import TaggedItem
+
+
+def make_customer(email, tags):
+    return Customer.objects.create(first_name='Ada', last_name='Lovelace', email=email, tags=tags)
+
+
+class TagIndexTests(TestCase):
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret', first_name='Admin', last_name='User'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.both = make_customer('both@example.com', ['Enterprise', ' renewal  Q3 '])
+        self.enterprise = make_customer('enterprise@example.com', ['enterprise'])
+        self.untagged = make_customer('untagged@example.com', [])
+    
+    def emails(self, **params):
+        response = self.client.get('/api/customers/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['email'] for row in response.data['results'])
+    
+    def indexed(self, customer):
+        return set(TaggedItem.objects.filter(kind='customer', object_id=customer.pk).values_list('tag__name', flat=True))
+    
+    def test_saves_and_deletes_keep_the_index_in_step(self):
+        self.assertEqual(self.indexed(self.both), {'enterprise', 'renewal q3'})
+        self.both.tags = ['enterprise', 'churn risk']
+        self.both.save()
+        self.assertEqual(self.indexed(self.both), {'enterprise', 'churn risk'})
+        self.both.delete()
+        self.assertEqual(self.indexed(self.both), set())
+    
+    def test_all_and_any_filters(self):
+        self.assertEqual(self.emails(tags='enterprise,Renewal Q3'), ['both@example.com'])
+        self.assertEqual(self.emails(tags_any='renewal q3,enterprise'), ['both@example.com', 'enterprise@example.com'])
+        self.assertEqual(self.emails(tags='enterprise,unknown'), [])
+    
+    def test_facets_count_the_narrowed_records(self):
+        response = self.client.get('/api/tags/facets/', {'type': 'customer'})
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['results'], [{'tag': 'enterprise', 'count': 2}, {'tag': 'renewal q3', 'count': 1}])
+        
+        response = self.client.get('/api/tags/facets/', {'type': 'customer', 'tags': 'renewal q3'})
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(self.client.get('/api/tags/facets/', {'type': 'nope'}).status_code, 400)
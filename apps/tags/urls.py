@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import TagFacetView
+
+urlpatterns = [
+    path('facets/', TagFacetView.as_view(), name='tag-facets'),
+]
@@ -0,0 +1,60 @@
+from django.db.models import Count
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.accounts.hierarchy import scope_to_user
+from apps.accounts.permissions import user_has_role_permissions
+from .filters import tag_params
+from .index import TAGGED_TYPES_BY_KIND, filter_by_tags
+from .models import TaggedItem
+
+
+class TagFacetView(APIView):
+    """Tag counts over the records of one type the user can see
+    
+    ?type= customer, lead, deal or task; ?tags= / ?tags_any= narrow the records
+    first (e.g. the facets beside "tagged enterprise"); ?limit= up to MAX_LIMIT.
+    Counting is one GROUP BY over the tag index.
+    """
+    
+    permission_classes = [permissions.IsAuthenticated]
+    LIMIT = 20
+    MAX_LIMIT = 200
+    
+    def get(self, request):
+        tagged_type = self.get_tagged_type(request)
+        limit = self.get_limit(request)
+        
+        records = scope_to_user(tagged_type.model.objects.all(), request.user, field=tagged_type.owner_field)
+        names, match_all = tag_params(request)
+        if names:
+            records = filter_by_tags(records, names, match_all=match_all)
+        
+        facets = (
+            TaggedItem.objects.filter(kind=tagged_type.kind, object_id__in=records.values('pk'))
+            .values('tag__name')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'tag__name')[:limit]
+        )
+        return Response({
+            'type': tagged_type.kind,
+            'total': records.count(),
+            'results': [{'tag': row['tag__name'], 'count': row['count']} for row in facets],
+        })
+    
+    def get_tagged_type(self, request):
+        kind = request.query_params.get('type', '')
+        tagged_type = TAGGED_TYPES_BY_KIND.get(kind)
+        if tagged_type is None:
+            raise ValidationError({'type': f"Must be one of: {', '.join(TAGGED_TYPES_BY_KIND)}."})
+        if tagged_type.permission and not user_has_role_permissions(request.user, [tagged_type.permission]):
+            raise PermissionDenied()
+        return tagged_type
+    
+    def get_limit(self, request):
+        try:
+            return max(1, min(int(request.query_params.get('limit', self.LIMIT)), self.MAX_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
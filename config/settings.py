@@ -35,6 +35,7 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'apps.core',
     'apps.accounts',
     'apps.customers',
     'apps.leads',
@@ -43,6 +44,9 @@ LOCAL_APPS = [
     'apps.automation',
     'apps.integrations',
     'apps.notifications',
+    'apps.search',
+    'apps.dedupe',
+    'apps.tags',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -51,6 +55,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.core.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,13 +85,73 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = config('DB_ENGINE', default='django.db.backends.sqlite3')
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': config('DB_NAME', default='crm_db'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+        }
     }
+
+# Persistent connections: seconds a connection is reused across requests
+# (0 closes it after every request). Health checks ping a reused connection
+# before the first query of a request and reconnect if it has gone away.
+DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
+# Behind PgBouncer in transaction pooling mode consecutive queries may run on
+# different server connections, so server-side cursors (which outlive a
+# transaction) must be disabled. Django still keeps its client connection to
+# PgBouncer open per CONN_MAX_AGE.
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+if DB_PGBOUNCER:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Pragmas applied to every new SQLite connection (see apps.core.signals):
+# WAL lets readers run alongside the writer, NORMAL sync is safe with WAL, and
+# busy_timeout (ms) waits on locks instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
 }
 
+# Read replicas: comma-separated replica locations, i.e. database file paths
+# for SQLite or host[:port] for server databases. Reads are spread over the
+# replicas and writes go to the primary (see apps.core.db.ReplicaRouter).
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+
+DATABASE_REPLICAS = []
+for index, location in enumerate(DB_REPLICAS, start=1):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if replica['ENGINE'] == 'django.db.backends.sqlite3':
+        replica['NAME'] = location
+    else:
+        replica['HOST'], _, port = location.partition(':')
+        replica['PORT'] = port or replica.get('PORT', '')
+    DATABASES[f'replica{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['apps.core.db.ReplicaRouter']
+
+# Seconds a client's reads stay on the primary after it writes, so it doesn't
+# read its own changes back from a lagging replica
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'db_pin'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,20 +190,65 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
+AUTHENTICATION_BACKENDS = [
+    'apps.accounts.backends.RolePermissionBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Cache
+# Point CACHE_URL at Redis in multi-process deployments so cache-backed
+# invalidation (e.g. the role permission matrix version) is shared.
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a process trusts its in-memory role permission matrix before
+# re-reading the shared version key
+ROLE_PERMISSION_VERSION_CHECK_INTERVAL = config('ROLE_PERMISSION_VERSION_CHECK_INTERVAL', default=5, cast=int)
+
+# Build request.user from the role claims embedded in access tokens instead of
+# loading the users row on every request (see apps.accounts.authentication)
+JWT_STATELESS_AUTH = config('JWT_STATELESS_AUTH', default=False, cast=bool)
+
+# Country calling code assumed for phone numbers stored without one when
+# building duplicate-detection keys (see apps.dedupe.keys)
+DEDUPE_DEFAULT_COUNTRY_CODE = config('DEDUPE_DEFAULT_COUNTRY_CODE', default='1')
+
+# Monthly partitions / archival of the append-only activity and log tables
+# (see apps.core.partitions): months kept in the live tables, months of empty
+# partitions created ahead on PostgreSQL, and where archived months are written
+ARCHIVE_RETENTION_MONTHS = config('ARCHIVE_RETENTION_MONTHS', default=12, cast=int)
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=3, cast=int)
+ARCHIVE_ROOT = config('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive'))
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.StatelessJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'apps.accounts.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'apps.core.pagination.CursorPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
+        'apps.search.filters.FullTextSearchFilter',
+        'apps.tags.filters.TagFilter',
+        'apps.search.filters.RankedOrderingFilter',
     ],
 }
 
@@ -170,6 +280,8 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.accounts.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.serializers.RoleTokenRefreshSerializer',
 }
 
 # CORS Settings
@@ -8,6 +8,11 @@ from rest_framework_simplejwt.views import (
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.accounts.urls')),
+    path('api/', include('apps.customers.urls')),
+    path('api/', include('apps.leads.urls')),
+    path('api/', include('apps.deals.urls')),
+    path('api/search/', include('apps.search.urls')),
+    path('api/tags/', include('apps.tags.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
\ No newline at end of file